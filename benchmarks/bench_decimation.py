@@ -0,0 +1,112 @@
+"""接收处理各级在输入采样率与抽取后工作采样率下的CPU耗时对比，以及抽取滤波器实测的通带和阻带
+
+用法: python benchmarks/bench_decimation.py [音频采集带宽Hz]
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from morse_utils import MorseUtils
+from dsp import Decimator, choose_working_rate
+from spectrum import SpectrumEngine
+from tone_detector import ToneDetector
+from cw_decoder import CwDecoder
+from skimmer import CwSkimmer
+
+INPUT_RATE = 44100
+BLOCK_SIZE = 1024
+DURATION = 20.0
+
+
+def make_signal():
+    """生成带噪声的测试信号：700Hz的CW报文"""
+    morse = MorseUtils(INPUT_RATE)
+    audio = morse.morse_to_audio(morse.text_to_morse("CQ CQ DE BG7XYZ BG7XYZ K"), 700, 20)
+    signal = np.zeros(int(DURATION * INPUT_RATE), dtype=np.float32)
+    signal[:min(len(audio), len(signal))] = 0.5 * audio[:len(signal)]
+    signal += np.random.default_rng(1).normal(0, 0.05, len(signal)).astype(np.float32)
+    return signal
+
+
+def tone_gain_db(working_rate, frequency, duration=0.3):
+    """实测单音经抽取后的增益(dB)：跳过滤波器的起始瞬态，按输出有效值计算"""
+    decimator = Decimator(INPUT_RATE, working_rate)
+    t = np.arange(int(duration * INPUT_RATE)) / INPUT_RATE
+    output = decimator.process(np.sin(2 * np.pi * frequency * t).astype(np.float32))
+    output = output[len(output) // 3:]
+    return 20 * np.log10(np.sqrt(2 * np.mean(output.astype(np.float64) ** 2)) + 1e-12)
+
+
+def measure_filter(working_rate, bandwidth):
+    """返回(采集带宽边沿处的增益, 阻带最差衰减)：阻带从 工作采样率-采集带宽 到输入奈奎斯特频率，
+    这段的信号会折叠进采集带宽"""
+    edge = tone_gain_db(working_rate, bandwidth)
+    stop = np.arange(working_rate - bandwidth, INPUT_RATE / 2, 50.0)
+    worst = max(tone_gain_db(working_rate, frequency) for frequency in stop)
+    return edge, worst
+
+
+def split_blocks(signal, block_size):
+    return [signal[i:i + block_size] for i in range(0, len(signal) - block_size + 1, block_size)]
+
+
+def time_stage(stage, blocks):
+    """返回处理全部块的CPU时间（秒）"""
+    start = time.process_time()
+    for block in blocks:
+        stage.process(block)
+    return time.process_time() - start
+
+
+def make_stages(rate, bandwidth):
+    spectrum = SpectrumEngine(INPUT_RATE, bandwidth=bandwidth)
+    if rate != INPUT_RATE:
+        spectrum.configure(sample_rate=rate)
+    detector = ToneDetector(rate, 700, 150)
+    decoder = CwDecoder(detector.envelope_rate)
+    detector.on_envelope = decoder.process
+    skimmer = CwSkimmer(rate, bandwidth, workers=0)
+    return [('频谱', spectrum), ('音调检测+解码', detector), ('多信号解码', skimmer)]
+
+
+def main():
+    bandwidth = float(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    working_rate = choose_working_rate(bandwidth, INPUT_RATE)
+    signal = make_signal()
+    full_blocks = split_blocks(signal, BLOCK_SIZE)
+
+    decimator = Decimator(INPUT_RATE, working_rate)
+    start = time.process_time()
+    reduced = np.concatenate([decimator.process(block) for block in full_blocks])
+    decimation_time = time.process_time() - start
+    work_block = int(round(BLOCK_SIZE * working_rate / INPUT_RATE))
+    reduced_blocks = split_blocks(reduced, work_block)
+
+    print(f"音频采集带宽 {bandwidth:.0f} Hz，输入 {INPUT_RATE} Hz -> 工作采样率 {working_rate} Hz，"
+          f"信号时长 {DURATION:.0f} s")
+    print(f"{'处理级':<12}{'输入采样率(ms)':>16}{'工作采样率(ms)':>16}{'节省':>10}")
+    total_full = 0.0
+    total_reduced = decimation_time
+    full_stages = make_stages(INPUT_RATE, bandwidth)
+    reduced_stages = make_stages(working_rate, bandwidth)
+    for (name, full_stage), (_, reduced_stage) in zip(full_stages, reduced_stages):
+        full_time = time_stage(full_stage, full_blocks)
+        reduced_time = time_stage(reduced_stage, reduced_blocks)
+        total_full += full_time
+        total_reduced += reduced_time
+        saved = 1 - reduced_time / full_time if full_time else 0.0
+        print(f"{name:<12}{full_time * 1000:>16.1f}{reduced_time * 1000:>16.1f}{saved:>10.0%}")
+    print(f"{'多相抽取':<12}{'-':>16}{decimation_time * 1000:>16.1f}{'':>10}")
+    print(f"{'合计':<12}{total_full * 1000:>16.1f}{total_reduced * 1000:>16.1f}"
+          f"{1 - total_reduced / total_full:>10.0%}")
+    if working_rate != INPUT_RATE:
+        edge, worst = measure_filter(working_rate, bandwidth)
+        print(f"抽取滤波器（每相位 {decimator.taps} 个抽头）：{bandwidth:.0f} Hz处增益 {edge:+.2f} dB，"
+              f"{working_rate - bandwidth:.0f} ~ {INPUT_RATE / 2:.0f} Hz 阻带最差 {worst:.1f} dB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+"""发射 -> 接收环回测量：按键到解码出字符的延迟与发射时序精度
+
+使用进程内的虚拟声卡（virtual_audio.VirtualAudio）代替真实设备：AudioManager发送的音频
+经信道模型（噪声、QSB衰落、频率漂移）和其他虚拟电台的信号混合后送回接收链。
+虚拟时钟由本脚本推进，延迟和时序都按样本位置计算，不受机器快慢影响，相同参数结果相同。
+
+用法: python benchmarks/bench_loopback.py [--wpm 25] [--noise 0.1] [--qsb-depth 0.5]
+                                          [--drift 2] [--senders 2] [--no-denoise] [--json 结果.json]
+"""
+import argparse
+import difflib
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import audio_backend
+from audio_manager import AudioManager
+from virtual_audio import VirtualAudio, VirtualSender, ChannelModel, OUTPUT_DEVICE, INPUT_DEVICE
+
+SAMPLE_RATE = 44100
+FREQUENCY = 700
+STEP = 0.02          # 每次推进虚拟时钟的时长(秒)
+LEAD_IN = 0.5        # 开始发送前的静默时长(秒)
+TAIL = 3.0           # 发送完成后继续接收的时长(秒)，让解码器输出最后的字符
+OTHER_TEXTS = ("TEST DE BA1ABC", "QRL? DE JA1XYZ", "CQ TEST DL0ABC", "UR 599 5NN TU")
+
+
+def make_backend(args):
+    channel = ChannelModel(SAMPLE_RATE, offset=args.offset, drift=args.drift,
+                           qsb_depth=args.qsb_depth, qsb_rate=args.qsb_rate)
+    backend = VirtualAudio(SAMPLE_RATE, speed=None, noise=args.noise, channel=channel,
+                           seed=args.seed, record=True)
+    # 其他电台分布在CW频率两侧，速度各不相同，循环发送
+    for i in range(args.senders):
+        side = 1 if i % 2 == 0 else -1
+        frequency = FREQUENCY + side * 300 * (i // 2 + 1)
+        backend.add_sender(VirtualSender(SAMPLE_RATE, OTHER_TEXTS[i % len(OTHER_TEXTS)],
+                                         frequency=frequency, wpm=18 + 4 * i, amplitude=0.5,
+                                         start=0.1 * i, repeat=True))
+    return backend
+
+
+def run_loopback(args):
+    """发送一条报文并同时接收，返回(发射信号, 已发字符（含空格）, 解码字符[(样本位置, 字符)])"""
+    backend = make_backend(args)
+    audio_backend.use(backend)
+    try:
+        manager = AudioManager()
+        manager.devices.refresh()
+        manager.input_device = INPUT_DEVICE
+        manager.set_output_device(OUTPUT_DEVICE)
+        manager.set_monitor_device(OUTPUT_DEVICE)
+        manager.set_low_cpu_mode(True)
+        manager.set_noise_reduction(not args.no_denoise)
+        manager.set_cw_frequency(FREQUENCY)
+        manager.set_receive_speed_auto(False)
+        manager.set_receive_speed(args.wpm)
+        manager.set_receive_speed_auto(not args.fixed_speed)
+
+        decoded = []
+        engine = manager.receive_engine
+
+        def on_text(text):
+            # 在接收工作线程中调用：此时已读出的输入样本数就是解码出该字符的时刻
+            position = engine.stream.started_at + engine.ring.read_pos
+            decoded.extend((position, char) for char in text)
+
+        manager.text_received.connect(on_text)
+        done = threading.Event()
+        manager.send_completed.connect(done.set)
+
+        manager.start_receiving()
+        step = int(STEP * SAMPLE_RATE)
+        backend.advance(int(LEAD_IN * SAMPLE_RATE))
+        manager.send_cw(args.text, FREQUENCY, args.wpm)
+        # 等音频引擎处理完播放命令（已写入第一批样本）再推进时钟
+        manager.audio_engine.call(lambda: None, wait=True)
+        limit = backend.clock + int((len(args.text) * 3.0 + 10) * SAMPLE_RATE)
+        while not done.is_set() and backend.clock < limit:
+            backend.advance(step)
+            # 让出CPU：音频引擎补充输出缓冲区（2秒），接收线程处理输入
+            time.sleep(0.001)
+        tail_end = backend.clock + int(TAIL * SAMPLE_RATE)
+        while backend.clock < tail_end:
+            backend.advance(step)
+            time.sleep(0.001)
+        while engine.ring.available >= engine.block_size:
+            time.sleep(0.005)
+        manager.stop_receiving()
+        manager.close_output_streams()
+        return backend.transmitted(), manager.morse_utils.tokenize(args.text), decoded
+    finally:
+        audio_backend.use(None)
+
+
+def keying_edges(signal, threshold=0.5):
+    """发射信号的按键沿：返回(按下位置数组, 抬起位置数组)，在包络的50%处判定"""
+    # 解析信号的模即包络：去掉负频率、正频率加倍
+    count = len(signal)
+    weights = np.zeros(count)
+    weights[0] = 1
+    weights[1:(count + 1) // 2] = 2
+    if count % 2 == 0:
+        weights[count // 2] = 1
+    envelope = np.abs(np.fft.ifft(np.fft.fft(signal) * weights))
+    key = envelope > threshold * envelope.max()
+    edges = np.diff(key.astype(np.int8))
+    return np.flatnonzero(edges == 1) + 1, np.flatnonzero(edges == -1) + 1
+
+
+def _error_stats(errors):
+    # 平均值反映系统偏差（如键控包络的上升时间），标准差反映抖动
+    return {'mean': float(np.mean(errors)), 'std': float(np.std(errors)),
+            'max_abs': float(np.max(np.abs(errors)))}
+
+
+def analyze_timing(downs, ups, wpm):
+    """对比每个点划和间隔的实际长度与标准长度（点=1单位、划=3、字符内=1、字符间=3、词间=7）"""
+    unit = 60 / (50 * wpm) * SAMPLE_RATE
+    marks = (ups - downs) / unit
+    spaces = (downs[1:] - ups[:-1]) / unit
+    ideal_marks = np.where(marks < 2, 1, 3)
+    ideal_spaces = np.select([spaces < 2, spaces < 5], [1, 3], 7)
+    mark_error = (marks - ideal_marks) * unit / SAMPLE_RATE * 1000
+    space_error = (spaces - ideal_spaces) * unit / SAMPLE_RATE * 1000
+    # 字符边界：间隔不小于3单位处
+    boundary = np.flatnonzero(ideal_spaces >= 3)
+    char_starts = np.concatenate([[downs[0]], downs[boundary + 1]])
+    char_ends = np.concatenate([ups[boundary], [ups[-1]]])
+    return {
+        'unit_ms': unit / SAMPLE_RATE * 1000,
+        'mark_error_ms': _error_stats(mark_error),
+        'space_error_ms': _error_stats(space_error),
+    }, char_starts, char_ends
+
+
+def match_latency(sent, char_starts, char_ends, decoded):
+    """把解码出的字符与发出的字符（均不含空格）对齐，计算按下到解码、抬起到解码的延迟（毫秒）"""
+    matcher = difflib.SequenceMatcher(None, sent, [char for _, char in decoded], autojunk=False)
+    key_down, key_up = [], []
+    for block in matcher.get_matching_blocks():
+        for k in range(block.size):
+            i, j = block.a + k, block.b + k
+            if i >= len(char_starts):
+                continue
+            position = decoded[j][0]
+            key_down.append((position - char_starts[i]) / SAMPLE_RATE * 1000)
+            key_up.append((position - char_ends[i]) / SAMPLE_RATE * 1000)
+    return key_down, key_up
+
+
+def summarize(values):
+    if not values:
+        return None
+    return {'mean': statistics.fmean(values), 'median': statistics.median(values),
+            'min': min(values), 'max': max(values)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AutoMorse发射-接收环回测量（虚拟声卡）")
+    parser.add_argument('--text', default="CQ CQ DE BG7XYZ BG7XYZ PSE K", help="发送的报文")
+    parser.add_argument('--wpm', type=int, default=25, help="发送速度(WPM)")
+    parser.add_argument('--fixed-speed', action='store_true', help="接收端按--wpm固定速度解码")
+    parser.add_argument('--no-denoise', action='store_true', help="关闭弱信号增强，用于对比")
+    parser.add_argument('--noise', type=float, default=0.05, help="高斯噪声标准差（信号幅度为1）")
+    parser.add_argument('--qsb-depth', type=float, default=0.0, help="QSB衰落深度(0~1)")
+    parser.add_argument('--qsb-rate', type=float, default=0.2, help="QSB衰落频率(Hz)")
+    parser.add_argument('--offset', type=float, default=0.0, help="环回信号的固定频移(Hz)")
+    parser.add_argument('--drift', type=float, default=0.0, help="环回信号的频率漂移(Hz/秒)")
+    parser.add_argument('--senders', type=int, default=0, help="其他虚拟电台的数量")
+    parser.add_argument('--seed', type=int, default=0, help="噪声随机种子")
+    parser.add_argument('--json', metavar='PATH', help="把结果保存为JSON文件")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    transmitted, sent, decoded = run_loopback(args)
+    downs, ups = keying_edges(transmitted)
+    if len(downs) == 0:
+        print("没有检测到发射信号", file=sys.stderr)
+        return 1
+    timing, char_starts, char_ends = analyze_timing(downs, ups, args.wpm)
+    sent_chars = [token for token in sent if token != ' ']
+    key_down, key_up = match_latency(sent_chars, char_starts, char_ends,
+                                     [(position, char) for position, char in decoded if char != ' '])
+    # 正确率连同词间隔计算：字符间隔被拆开或合并、词间隔丢失都算错误
+    sent_text = ''.join(sent)
+    text = ''.join(char for _, char in decoded).strip()
+    accuracy = difflib.SequenceMatcher(None, sent_text, text, autojunk=False).ratio()
+
+    results = {
+        'config': {key: value for key, value in vars(args).items() if key != 'json'},
+        'transmit': dict(timing, characters=len(char_starts), expected_characters=len(sent_chars)),
+        'decoded_text': text,
+        'character_accuracy': accuracy,
+        'key_down_to_decode_ms': summarize(key_down),
+        'key_up_to_decode_ms': summarize(key_up),
+    }
+    # 运行耗时随机器负载变化，只打印，不写入结果，相同参数的JSON结果逐字节相同
+    wall_seconds = time.perf_counter() - started
+
+    print(f"发送: {sent_text}")
+    print(f"解码: {text}")
+    print(f"字符正确率（含词间隔） {accuracy:.1%}，发射 {len(char_starts)} 个字符（应为 {len(sent_chars)} 个）")
+    print(f"时间单位 {timing['unit_ms']:.1f} ms（在包络50%处测量）")
+    for name, error in (('点划长度', timing['mark_error_ms']), ('间隔长度', timing['space_error_ms'])):
+        print(f"{name}误差: 平均 {error['mean']:+.2f} ms，抖动(标准差) {error['std']:.2f} ms，"
+              f"最大 {error['max_abs']:.2f} ms")
+    for name, values in (('按下 -> 解码', results['key_down_to_decode_ms']),
+                         ('抬起 -> 解码', results['key_up_to_decode_ms'])):
+        if values is None:
+            print(f"{name}: 没有解码出匹配的字符")
+        else:
+            print(f"{name}: 平均 {values['mean']:.1f} ms，中位 {values['median']:.1f} ms，"
+                  f"范围 {values['min']:.1f} ~ {values['max']:.1f} ms")
+    print(f"运行耗时 {wall_seconds:.1f} 秒")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.json}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,276 @@
+"""合成、接收DSP和解码热点路径的基准测试
+
+测量内容：
+  - 5~60 WPM下 morse_to_audio 的合成耗时（首次调用与缓存模板后）
+  - 接收链各级（抽取、带通滤波、降噪、音调检测、解码、频谱）每个工作块的耗时和占实时的比例
+  - 完整解码链的吞吐量（实时倍数）与峰值内存
+
+无需声卡和图形界面。结果可保存为JSON，并与之前保存的结果对比。
+
+用法: python benchmarks/bench_suite.py [--quick] [--json 结果.json] [--compare 基准.json]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from morse_utils import MorseUtils
+from dsp import WorkBlocker, BandpassFilter, choose_working_rate
+from spectrum import SpectrumEngine
+from tone_detector import ToneDetector
+from noise_reduction import NoiseReducer
+from cw_decoder import CwDecoder
+
+INPUT_RATE = 44100
+BLOCK_SIZE = 1024            # 与ReceiveEngine的输入块长度一致
+AUDIO_BANDWIDTH = 3000
+FREQUENCY = 700
+BANDWIDTH = 150
+SYNTHESIS_WPM = (5, 10, 15, 20, 25, 30, 40, 50, 60)
+SYNTHESIS_TEXT = "CQ CQ DE BG7XYZ BG7XYZ PSE K"
+DECODE_TEXT = "CQ CQ DE BG7XYZ BG7XYZ K"
+DECODE_WPM = 20
+
+
+def _stats_us(samples):
+    """耗时列表（秒）的均值、中位数和95分位（微秒）"""
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+    return {
+        'mean_us': statistics.fmean(ordered) * 1e6,
+        'median_us': ordered[len(ordered) // 2] * 1e6,
+        'p95_us': p95 * 1e6,
+    }
+
+
+def make_signal(duration, wpm=DECODE_WPM, seed=1):
+    """生成带噪声的测试信号：重复的CW报文，返回(信号, 报文文本)"""
+    morse = MorseUtils(INPUT_RATE)
+    audio = morse.morse_to_audio(morse.text_to_morse(DECODE_TEXT + ' '), FREQUENCY, wpm)
+    repeats = int(np.ceil(duration * INPUT_RATE / len(audio)))
+    signal = np.tile(0.5 * audio, repeats)[:int(duration * INPUT_RATE)].astype(np.float32)
+    signal += np.random.default_rng(seed).normal(0, 0.05, len(signal)).astype(np.float32)
+    return signal, DECODE_TEXT
+
+
+def bench_synthesis(repeats):
+    """各速度下合成一段报文的耗时；首次调用包含元素模板的生成"""
+    results = []
+    for wpm in SYNTHESIS_WPM:
+        morse = MorseUtils(INPUT_RATE)
+        code = morse.text_to_morse(SYNTHESIS_TEXT)
+        start = time.perf_counter()
+        audio = morse.morse_to_audio(code, FREQUENCY, wpm)
+        cold = time.perf_counter() - start
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            morse.morse_to_audio(code, FREQUENCY, wpm)
+            timings.append(time.perf_counter() - start)
+        warm = min(timings)
+        seconds = len(audio) / INPUT_RATE
+        results.append({
+            'wpm': wpm,
+            'audio_seconds': seconds,
+            'cold_ms': cold * 1e3,
+            'warm_ms': warm * 1e3,
+            'realtime': seconds / warm,
+        })
+    return results
+
+
+def _time_blocks(process, blocks):
+    timings = []
+    for block in blocks:
+        start = time.perf_counter()
+        process(block)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_stages(signal):
+    """接收链各级处理每个工作块的耗时，与实时接收时的块划分相同"""
+    working_rate = choose_working_rate(AUDIO_BANDWIDTH, INPUT_RATE)
+    input_blocks = [signal[i:i + BLOCK_SIZE] for i in range(0, len(signal) - BLOCK_SIZE + 1, BLOCK_SIZE)]
+
+    # 抽取：输入块 -> 工作块，同时收集工作块供后续各级使用
+    blocker = WorkBlocker(INPUT_RATE, working_rate, BLOCK_SIZE)
+    work_blocks = []
+    decimation = _time_blocks(lambda block: work_blocks.extend(b.copy() for b in blocker.feed(block)),
+                              input_blocks)
+    block_seconds = blocker.block_size / working_rate
+
+    bandpass = BandpassFilter(working_rate, FREQUENCY, BANDWIDTH)
+    filtered = []
+    filtering = _time_blocks(lambda block: filtered.append(bandpass.process(block).copy()), work_blocks)
+
+    reducer = NoiseReducer(working_rate)
+    reduction = _time_blocks(reducer.process, filtered)
+
+    detector = ToneDetector(working_rate, FREQUENCY, BANDWIDTH)
+    envelopes = []
+    detection = _time_blocks(lambda block: envelopes.append(detector.detect(block).copy()), filtered)
+
+    decoder = CwDecoder(detector.envelope_rate, wpm=DECODE_WPM)
+    decoding = _time_blocks(decoder.process, envelopes)
+
+    spectrum = SpectrumEngine(working_rate, bandwidth=AUDIO_BANDWIDTH)
+    spectrum_timings = _time_blocks(spectrum.process, work_blocks)
+
+    results = []
+    for name, block_samples, rate, timings in (
+            ('decimation', BLOCK_SIZE, INPUT_RATE, decimation),
+            ('bandpass', blocker.block_size, working_rate, filtering),
+            ('denoise', blocker.block_size, working_rate, reduction),
+            ('detector', blocker.block_size, working_rate, detection),
+            ('decoder', blocker.block_size, working_rate, decoding),
+            ('spectrum', blocker.block_size, working_rate, spectrum_timings)):
+        entry = {'stage': name, 'block_samples': block_samples, 'sample_rate': rate, 'blocks': len(timings)}
+        entry.update(_stats_us(timings))
+        # 每块耗时占块时长的比例，即该级占用的实时CPU
+        entry['load'] = entry['mean_us'] / 1e6 / block_seconds
+        results.append(entry)
+    return results
+
+
+def _decode(signal):
+    """用与离线解码相同的处理链解码整个信号，返回文本"""
+    working_rate = choose_working_rate(AUDIO_BANDWIDTH, INPUT_RATE)
+    blocker = WorkBlocker(INPUT_RATE, working_rate, BLOCK_SIZE)
+    bandpass = BandpassFilter(working_rate, FREQUENCY, BANDWIDTH)
+    detector = ToneDetector(working_rate, FREQUENCY, BANDWIDTH)
+    decoder = CwDecoder(detector.envelope_rate, wpm=DECODE_WPM)
+    chars = []
+    for i in range(0, len(signal) - BLOCK_SIZE + 1, BLOCK_SIZE):
+        for block in blocker.feed(signal[i:i + BLOCK_SIZE]):
+            envelope = detector.detect(bandpass.process(block))
+            if len(envelope):
+                chars += decoder.process(envelope)
+    return ''.join(char for _, char in chars)
+
+
+def _peak_rss_mb():
+    """进程的峰值常驻内存(MB)，不支持的平台返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux以KB为单位，macOS以字节为单位
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def bench_decoder(signal, expected):
+    """解码吞吐量（实时倍数）与峰值内存；内存在单独一轮中用tracemalloc统计，不影响计时"""
+    seconds = len(signal) / INPUT_RATE
+    start = time.perf_counter()
+    text = _decode(signal)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    _decode(signal)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'audio_seconds': seconds,
+        'elapsed_s': elapsed,
+        'realtime': seconds / elapsed,
+        'peak_traced_mb': peak / (1024 * 1024),
+        'peak_rss_mb': _peak_rss_mb(),
+        # 连同词间隔比较：解码结果中至少有一遍完整的报文
+        'text_ok': f' {expected} ' in text,
+    }
+
+
+def run(quick=False):
+    duration = 45.0 if quick else 120.0
+    signal, expected = make_signal(duration)
+    return {
+        'meta': {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'quick': quick,
+        },
+        'synthesis': bench_synthesis(repeats=5 if quick else 20),
+        'stages': bench_stages(signal),
+        'decoder': bench_decoder(signal, expected),
+    }
+
+
+def _metrics(results):
+    """把结果展开为 {指标名: 数值}，用于对比"""
+    metrics = {}
+    for entry in results.get('synthesis', []):
+        metrics[f"合成 {entry['wpm']} WPM (ms)"] = entry['warm_ms']
+    for entry in results.get('stages', []):
+        metrics[f"{entry['stage']} 每块 (us)"] = entry['mean_us']
+    decoder = results.get('decoder', {})
+    if 'realtime' in decoder:
+        metrics['解码 实时倍数'] = decoder['realtime']
+    if decoder.get('peak_traced_mb') is not None:
+        metrics['解码 峰值内存 (MB)'] = decoder['peak_traced_mb']
+    return metrics
+
+
+def print_results(results):
+    print(f"{'合成速度':<10}{'音频(s)':>10}{'首次(ms)':>12}{'缓存后(ms)':>12}{'实时倍数':>12}")
+    for entry in results['synthesis']:
+        print(f"{entry['wpm']:>4} WPM  {entry['audio_seconds']:>10.1f}{entry['cold_ms']:>12.2f}"
+              f"{entry['warm_ms']:>12.2f}{entry['realtime']:>12.0f}")
+    print()
+    print(f"{'处理级':<12}{'块长':>8}{'均值(us)':>12}{'中位(us)':>12}{'P95(us)':>12}{'实时占用':>10}")
+    for entry in results['stages']:
+        print(f"{entry['stage']:<12}{entry['block_samples']:>8}{entry['mean_us']:>12.1f}"
+              f"{entry['median_us']:>12.1f}{entry['p95_us']:>12.1f}{entry['load']:>10.2%}")
+    print()
+    decoder = results['decoder']
+    rss = decoder['peak_rss_mb']
+    print(f"解码 {decoder['audio_seconds']:.0f} 秒音频用时 {decoder['elapsed_s']:.2f} 秒，"
+          f"{decoder['realtime']:.0f} 倍实时，峰值内存 {decoder['peak_traced_mb']:.1f} MB"
+          + (f"（进程峰值 {rss:.0f} MB）" if rss is not None else '')
+          + ('' if decoder['text_ok'] else '，解码文本与报文不符！'))
+
+
+def print_comparison(baseline, results):
+    """逐项对比两次结果，耗时类指标比值大于1表示变慢"""
+    old, new = _metrics(baseline), _metrics(results)
+    print()
+    print(f"{'指标':<24}{'基准':>12}{'本次':>12}{'变化':>10}")
+    for name, value in new.items():
+        if name not in old or not old[name]:
+            continue
+        print(f"{name:<24}{old[name]:>12.2f}{value:>12.2f}{value / old[name] - 1:>+10.1%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AutoMorse热点路径基准测试")
+    parser.add_argument('--quick', action='store_true', help="缩短测试信号和重复次数")
+    parser.add_argument('--json', metavar='PATH', help="把结果保存为JSON文件")
+    parser.add_argument('--compare', metavar='PATH', help="与之前保存的JSON结果对比")
+    args = parser.parse_args(argv)
+
+    results = run(quick=args.quick)
+    print_results(results)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print_comparison(json.load(f), results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.json}")
+    return 0 if results['decoder']['text_ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,39 @@
+# 音频后端：引擎通过 audio_backend.get() 取得音频接口，而不是直接导入sounddevice。
+# 默认后端是sounddevice（PortAudio），首次取用时才导入；测试和测量时可用 use() 换成
+# 进程内的虚拟声卡（virtual_audio.VirtualAudio）。后端需提供与sounddevice相同的
+# OutputStream、InputStream、query_devices、query_hostapis。
+
+_backend = None
+
+
+def get():
+    """返回当前音频后端，未指定时导入sounddevice（导入时初始化PortAudio）"""
+    global _backend
+    if _backend is None:
+        import sounddevice
+        _backend = sounddevice
+    return _backend
+
+
+def use(backend):
+    """指定音频后端，None表示恢复为sounddevice"""
+    global _backend
+    _backend = backend
+
+
+def reinitialize():
+    """重新初始化后端以发现新插入的设备，返回是否已重新初始化
+
+    sounddevice没有公开的重新扫描接口，这里依赖它的私有函数_terminate()/_initialize()
+    （即PortAudio的Pa_Terminate/Pa_Initialize）。升级sounddevice后这两个函数若不存在，
+    退回为不重新初始化：设备列表仍可刷新，但只包含PortAudio初始化时已存在的设备。
+    重新初始化会使已打开的音频流失效，调用方必须先关闭所有音频流，不能在有流打开时调用。
+    """
+    backend = get()
+    terminate = getattr(backend, '_terminate', None)
+    initialize = getattr(backend, '_initialize', None)
+    if not callable(terminate) or not callable(initialize):
+        return False
+    terminate()
+    initialize()
+    return True
@@ -0,0 +1,239 @@
+import queue
+import threading
+from collections import deque
+from output_channel import OutputChannel
+from tracing import trace
+
+class Playback:
+    """一次播放任务（测试音频或一条报文）
+
+    segments为可迭代对象，元素为(音频, 字符)：音频是样本数组或表示静音样本数的整数；
+    字符不为None时，该段实际从声卡播出后调用on_char(字符)。
+    segments在音频引擎线程中按需迭代，可以是生成器，字符音频在写入前才合成。
+    播放结束、被取消或出错时调用on_done(本任务)，同样在引擎线程中执行。
+    """
+
+    def __init__(self, device, segments, on_char=None, on_done=None):
+        self.device = device
+        self.segments = iter(segments)
+        self.on_char = on_char
+        self.on_done = on_done
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+        self.channel = None
+        self._current = None       # 正在写入的段：[音频, 已写入数, 字符]
+        self._pending = deque()    # 等待播出的字符：(字符结束的样本位置, 字符)
+        self._end = None           # 全部段写完后的结束位置
+
+    def cancel(self):
+        """请求停止，只设置事件，不等待"""
+        self.cancelled.set()
+
+
+class AudioEngine:
+    """音频引擎线程
+
+    唯一持有输出流的线程：打开和关闭输出通道、把播放任务的样本写入环形缓冲区、
+    按实际播放位置发出字符信号。其他线程通过命令队列提交play/stop/devices/call命令，
+    提交后立即返回，界面线程不会因音频I/O阻塞。停止通过任务上的事件和stop命令完成，
+    不获取任何锁；引擎线程被队列唤醒后立即清空尚未播放的样本，在下一个声卡回调块静音。
+    """
+
+    POLL_INTERVAL = 0.002  # 有播放任务时的写入/检查周期(秒)
+
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self._commands = queue.Queue()
+        self._channels = {}   # 设备 -> OutputChannel，仅在引擎线程中访问
+        self._jobs = []
+        self._monitor = None  # (设备, 监听音频源)，该设备的输出通道叠加监听音频
+        self._thread = threading.Thread(target=self._run, name='audio-engine', daemon=True)
+        self._thread.start()
+
+    def play(self, playback):
+        """提交播放任务"""
+        self._commands.put(('play', playback))
+
+    def stop(self, playback):
+        """停止播放任务，立即返回"""
+        playback.cancel()
+        self._commands.put(('stop', playback))
+
+    def set_devices(self, devices):
+        """预先打开这些设备的输出流，关闭其余的流"""
+        self._commands.put(('devices', set(devices)))
+
+    def call(self, function, *args, wait=False, timeout=2.0):
+        """在引擎线程中执行function(*args)；wait为True时等待执行完毕（最多timeout秒）"""
+        if threading.current_thread() is self._thread:
+            function(*args)
+            return True
+        done = threading.Event()
+        self._commands.put(('call', (function, args, done)))
+        return done.wait(timeout) if wait else True
+
+    def set_monitor(self, device, monitor):
+        """把接收监听音频叠加到设备的输出流上，monitor为None时停止监听"""
+        self.call(self._set_monitor, device, monitor)
+
+    def close_channels(self, wait=True):
+        """停止所有播放任务并关闭所有输出流"""
+        return self.call(self._close_channels, wait=wait)
+
+    def _run(self):
+        while True:
+            timeout = self.POLL_INTERVAL if self._jobs else None
+            try:
+                command = self._commands.get(timeout=timeout)
+            except queue.Empty:
+                command = None
+            # 先处理完积压的命令，再推进播放任务
+            while command is not None:
+                try:
+                    self._execute(*command)
+                except Exception as e:
+                    trace.exception("音频引擎命令 {} 出错: {}", command[0], e)
+                try:
+                    command = self._commands.get_nowait()
+                except queue.Empty:
+                    command = None
+            for job in list(self._jobs):
+                try:
+                    self._service(job)
+                except Exception as e:
+                    # 回调出错不能让引擎线程退出
+                    trace.exception("播放任务回调出错: {}", e)
+                    self._finish(job)
+
+    def _execute(self, name, argument):
+        if name == 'play':
+            self._start(argument)
+        elif name == 'stop':
+            if argument in self._jobs:
+                self._service(argument)
+        elif name == 'devices':
+            self._prewarm(argument)
+        elif name == 'call':
+            function, args, done = argument
+            try:
+                function(*args)
+            finally:
+                done.set()
+
+    def _channel(self, device):
+        """获取设备对应的常驻输出通道，不存在或已失效时才重新打开"""
+        channel = self._channels.get(device)
+        if channel is not None and channel.active and channel.sample_rate == self.sample_rate:
+            return channel
+        if channel is not None:
+            channel.close()
+        trace.info("打开输出音频流，使用设备: {}", device)
+        channel = OutputChannel(device, self.sample_rate)
+        try:
+            channel.open()
+        except Exception:
+            self._channels.pop(device, None)
+            raise
+        self._channels[device] = channel
+        channel.monitor = self._monitor_for(device)
+        return channel
+
+    def _monitor_for(self, device):
+        if self._monitor is not None and self._monitor[0] == device:
+            return self._monitor[1]
+        return None
+
+    def _set_monitor(self, device, monitor):
+        self._monitor = (device, monitor) if monitor is not None else None
+        for channel_device, channel in self._channels.items():
+            channel.monitor = self._monitor_for(channel_device)
+        if monitor is not None:
+            try:
+                self._channel(device)
+            except Exception as e:
+                trace.error("打开监听音频流失败: {}", e)
+
+    def _prewarm(self, devices):
+        for device in list(self._channels):
+            if device not in devices:
+                self._channels.pop(device).close()
+        for device in devices:
+            try:
+                self._channel(device)
+            except Exception as e:
+                trace.warning("预热输出音频流失败: {}", e)
+
+    def _close_channels(self):
+        for job in list(self._jobs):
+            job.cancel()
+            self._finish(job)
+        for channel in self._channels.values():
+            channel.close()
+        self._channels.clear()
+
+    def _start(self, job):
+        if job.cancelled.is_set():
+            self._finish(job)
+            return
+        try:
+            job.channel = self._channel(job.device)
+        except Exception as e:
+            trace.error("打开输出音频流失败: {}", e)
+            self._finish(job)
+            return
+        self._jobs.append(job)
+        self._service(job)
+
+    def _service(self, job):
+        """推进一个播放任务：写入缓冲区能容纳的样本，发出已播出字符的信号"""
+        channel = job.channel
+        if job.cancelled.is_set():
+            # 丢弃本任务写入、尚未播放的样本
+            channel.flush()
+            self._finish(job)
+            return
+        if not channel.active:
+            self._finish(job)
+            return
+        try:
+            while job._end is None:
+                if job._current is None:
+                    segment = next(job.segments, None)
+                    if segment is None:
+                        job._end = channel.written
+                        break
+                    job._current = [segment[0], 0, segment[1]]
+                audio, offset, char = job._current
+                if isinstance(audio, int):
+                    offset += channel.write_zeros(audio - offset)
+                    total = audio
+                else:
+                    offset += channel.write(audio[offset:])
+                    total = len(audio)
+                if offset < total:
+                    # 缓冲区已满，等播放腾出空间
+                    job._current[1] = offset
+                    trace.debug("输出缓冲区已满，已写入 {}/{}", offset, total)
+                    break
+                job._current = None
+                if char is not None:
+                    job._pending.append((channel.written, char))
+        except Exception as e:
+            trace.exception("播放任务出错: {}", e)
+            self._finish(job)
+            return
+        while job._pending and channel.reached(job._pending[0][0]):
+            _, char = job._pending.popleft()
+            if job.on_char is not None and not job.cancelled.is_set():
+                job.on_char(char)
+        if job._end is not None and not job._pending and channel.reached(job._end):
+            self._finish(job)
+
+    def _finish(self, job):
+        if job in self._jobs:
+            self._jobs.remove(job)
+        if job.finished.is_set():
+            return
+        job.finished.set()
+        if job.on_done is not None:
+            job.on_done(job)
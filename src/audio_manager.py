@@ -1,210 +1,422 @@
-import sounddevice as sd
 import numpy as np
 import threading
-import time
 from morse_utils import MorseUtils
-from PyQt6.QtCore import QObject, pyqtSignal
-
-class AudioManager(QObject):
+from audio_engine import AudioEngine, Playback
+from receive_engine import ReceiveEngine
+from spectrum import SpectrumEngine
+from tone_detector import ToneDetector
+from cw_decoder import CwDecoder
+from dsp import choose_working_rate, BandpassFilter
+from events import Signal
+from device_registry import DeviceRegistry
+from monitor import AudioMonitor
+from noise_reduction import NoiseReducer
+from tracing import trace
+
+class AudioManager:
+    """音频、DSP与摩尔斯引擎，不依赖Qt
+
+    通过events.Signal通知事件，回调在引擎的工作线程中执行；
+    图形界面经qt_adapter转发到界面线程，无界面程序可直接连接回调或EventQueue。
+    """
     # 定义信号
-    test_completed = pyqtSignal()  # 测试音频播放完成信号
-    send_completed = pyqtSignal()  # 发送音频播放完成信号
-    character_sent = pyqtSignal(str) # 新增：发送单个字符完成信号
+    test_completed = Signal()  # 测试音频播放完成信号
+    send_completed = Signal()  # 发送音频播放完成信号
+    character_sent = Signal(str) # 新增：发送单个字符完成信号
+    receive_overrun = Signal(int) # 接收缓冲区溢出信号，参数为累计次数
+    spectrum_ready = Signal(object, object) # 频谱帧信号：(频率数组, 功率dB数组)
+    text_received = Signal(str) # CW频率上解码出的文本
+    skimmer_text = Signal(float, str) # 多信号解码文本：(载波频率, 文本)
+    receive_speed_changed = Signal(int) # 自动测速得到的接收速度(WPM)
+    file_decode_text = Signal(str)      # 音频文件解码出的文本
+    file_decode_progress = Signal(float) # 音频文件解码进度(0~1)
+    file_decode_finished = Signal(float) # 音频文件解码完成，参数为实时倍数（失败时为0）
+    devices_ready = Signal(object, object) # 后台设备扫描完成：(输入设备列表, 输出设备列表)
+
+    RECEIVE_BLOCK_SIZE = 1024   # 接收输入块长度（约23ms）
+    MONITOR_BLOCK_SIZE = 256    # 监听时的输入块长度（约6ms），降低监听延迟
     
     def __init__(self):
-        super().__init__()  # 调用父类初始化
         self.input_device = None
         self.output_device = None
         self.monitor_device = None
+        # 设备注册表：缓存设备枚举，按稳定标识记录所选设备，设备号随插拔变化时重新解析
+        self.devices = DeviceRegistry()
+        self._device_identities = {'input': None, 'output': None, 'monitor': None}
         self.sample_rate = 44100
         self.audio_bandwidth = 3000  # 默认音频采集带宽
         self.cw_frequency = 700      # 默认CW编码频率
         self.cw_bandwidth = 150      # 默认CW模式截取带宽
-        self.is_testing = False      # 测试音频状态
-        self.test_thread = None      # 测试音频线程
-        self.test_stream = None      # 测试音频流
-        self.is_sending = False      # 发送状态
-        self.send_thread = None      # 发送线程
-        self.send_stream = None      # 发送音频流
+        self._test_job = None        # 正在播放的测试音频任务
+        self._send_job = None        # 正在发送的报文任务
         self.morse_utils = MorseUtils(self.sample_rate)
+        # 只保护开始测试/发送时的状态检查，持有期间不做任何音频I/O
         self._lock = threading.Lock()
+        # 音频引擎线程：持有测试与发送共用的常驻输出流，经命令队列播放和停止
+        self.audio_engine = AudioEngine(self.sample_rate)
+        # 接收引擎：输入回调写入环形缓冲区，工作线程按块抽取到工作采样率后处理
+        self.receive_engine = ReceiveEngine(self.sample_rate)
+        self.receive_engine.on_overrun = self.receive_overrun.emit
+        # 频谱引擎在接收工作线程中运行，按限定帧率输出绘图数据
+        self.spectrum_engine = SpectrumEngine(self.sample_rate, bandwidth=self.audio_bandwidth)
+        self.spectrum_engine.on_frame = self.spectrum_ready.emit
+        # 低CPU模式：只运行CW频率附近的音调检测器组，不计算频谱
+        self.low_cpu_mode = False
+        self.receive_cw_speed = 26       # 手动模式下的接收速度WPM
+        self.receive_speed_auto = True   # 自动测速
+        self.noise_reduction = True      # 弱信号增强（带通滤波后的谱减法降噪）
+        self._reported_speed = None
+        # 接收监听：带通滤波后的CW音频经监听设备的输出流播放
+        self.monitor_audio = False
+        self.monitor_latency = 20        # 监听缓冲的目标延迟(ms)
+        self.monitor = AudioMonitor(self.sample_rate, latency=self.monitor_latency / 1000)
+        self._create_cw_stages(self.sample_rate)
+        self._apply_working_rate()
+        # 多信号解码：在整个采集带宽内发现并解码多个载波
+        self.skimmer_mode = False
+        self.skimmer = None
         self.send_cw_speed = 26      # 默认发送速度WPM
+        self.file_decode_thread = None  # 音频文件解码线程
 
     def get_audio_devices(self):
-        """获取所有音频设备"""
-        devices = sd.query_devices()
-        input_devices = []
-        output_devices = []
-        
-        for i, device in enumerate(devices):
-            if device['max_input_channels'] > 0:
-                input_devices.append({
-                    'index': i,
-                    'name': device['name'],
-                    'channels': device['max_input_channels']
-                })
-            if device['max_output_channels'] > 0:
-                output_devices.append({
-                    'index': i,
-                    'name': device['name'],
-                    'channels': device['max_output_channels']
-                })
-        
-        return input_devices, output_devices
+        """获取所有音频设备（使用注册表缓存的枚举结果）"""
+        return self.devices.devices()
+
+    def scan_devices_async(self):
+        """在后台线程中枚举音频设备，完成后发出devices_ready并预热输出流"""
+        threading.Thread(target=self._scan_devices, daemon=True).start()
+
+    def _scan_devices(self):
+        try:
+            self.devices.refresh()
+        except Exception as e:
+            trace.error("枚举音频设备失败: {}", e)
+        self._apply_device_identities()
+        # 系统设备列表变化（插拔声卡）时自动刷新
+        self.devices.watch(self._on_devices_changed)
+
+    def refresh_devices(self):
+        """重新扫描设备（可发现新插入的设备），按保存的标识重新定位所选设备
+
+        重新初始化PortAudio前需关闭所有音频流，因此接收、发送或测试时不刷新，返回False。
+        """
+        if self.is_receiving or self.is_sending or self.is_testing:
+            return False
+        # 在音频引擎线程中关闭输出流并重新扫描，调用方不等待
+        self.audio_engine.call(self._reinitialize_devices)
+        return True
+
+    def _reinitialize_devices(self):
+        if self.is_receiving or self.is_sending or self.is_testing:
+            # 排队期间已开始接收、发送或测试，有音频流打开时不能重新初始化，由watch稍后重试
+            self.devices.invalidate()
+            return
+        self.audio_engine.close_channels()
+        self.devices.refresh(reinitialize=True)
+        self._apply_device_identities()
+
+    def _on_devices_changed(self):
+        trace.info("音频设备列表已变化，重新扫描")
+        # 返回值供watch判断是否需要稍后重试
+        return self.refresh_devices()
+
+    def _apply_device_identities(self):
+        """按标识解析当前的设备号，通知界面并预热输出流"""
+        for role, kind in (('input', 'input'), ('output', 'output'), ('monitor', 'output')):
+            identity = self._device_identities[role]
+            index = self.devices.resolve(identity, kind)
+            if isinstance(identity, int):
+                # 旧配置保存的是设备号，首次解析后改为稳定标识
+                self._device_identities[role] = self.devices.identity_of(index, kind)
+            setattr(self, role + '_device', index)
+        input_devices, output_devices = self.devices.inputs, self.devices.outputs
+        self.devices_ready.emit(input_devices, output_devices)
+        if output_devices:
+            self.prewarm_output_streams()
+
+    def device_identity(self, role):
+        """所选设备的稳定标识（role为'input'、'output'或'monitor'），用于保存配置"""
+        return self._device_identities[role]
 
     def set_input_device(self, device_index):
         """设置输入设备"""
-        self.input_device = device_index
+        self._device_identities['input'] = self.devices.identity_of(device_index, 'input')
+        if device_index != self.input_device:
+            self.input_device = device_index
+            if self.is_receiving:
+                # 接收中切换设备时重新打开输入流
+                self.stop_receiving()
+                self.start_receiving()
+
+    @property
+    def is_receiving(self):
+        return self.receive_engine.running
+
+    def start_receiving(self):
+        """开始接收：打开输入设备并启动接收处理线程"""
+        if self.is_receiving:
+            return
+        trace.info("打开输入音频流，使用设备: {}", self.input_device)
+        block_size = self.MONITOR_BLOCK_SIZE if self.monitor_audio else self.RECEIVE_BLOCK_SIZE
+        if block_size != self.receive_engine.block_size:
+            self.receive_engine.set_block_size(block_size)
+        self._apply_working_rate()
+        if self.skimmer_mode:
+            self._open_skimmer()
+        self.receive_engine.set_stages(self._build_receive_chain())
+        self.receive_engine.start(self.input_device)
+
+    def _create_cw_stages(self, working_rate):
+        """按工作采样率创建CW频率上的带通滤波器、检测器和解码器"""
+        # 按cw_bandwidth截取CW频率附近的信号，送给检测器
+        self.cw_filter = BandpassFilter(working_rate, self.cw_frequency, self.cw_bandwidth)
+        # 弱信号增强：压低通带内只有噪声的时频点，解码和监听都使用增强后的信号
+        self.noise_reducer = NoiseReducer(working_rate)
+        self.tone_detector = ToneDetector(working_rate, self.cw_frequency, self.cw_bandwidth)
+        # CW频率上的解码器，由检测器输出的包络驱动
+        self.cw_decoder = CwDecoder(self.tone_detector.envelope_rate, wpm=self.receive_cw_speed,
+                                    auto_speed=self.receive_speed_auto)
+        self.tone_detector.on_envelope = self._on_envelope
+
+    def _apply_working_rate(self):
+        """按当前采集带宽确定工作采样率，各处理级随之重建（仅在未接收时调用）"""
+        working_rate = choose_working_rate(self.audio_bandwidth, self.sample_rate)
+        if working_rate == self.receive_engine.working_rate:
+            return
+        self.receive_engine.set_working_rate(working_rate)
+        self.spectrum_engine.configure(sample_rate=working_rate)
+        self.monitor.configure(input_rate=working_rate)
+        self._create_cw_stages(working_rate)
+
+    def _build_receive_chain(self):
+        """构建接收处理级列表"""
+        stages = []
+        if not self.low_cpu_mode:
+            stages.append(self.spectrum_engine)
+        if self.skimmer is not None:
+            # 多信号解码需要完整带宽，放在带通滤波之前
+            stages.append(self.skimmer)
+        stages.append(self.cw_filter)
+        if self.noise_reduction:
+            stages.append(self.noise_reducer)
+        if self.monitor_audio:
+            # 监听增强后的信号，与检测器听到的相同
+            stages.append(self.monitor)
+        stages.append(self.tone_detector)
+        return stages
+
+    def _on_envelope(self, envelope):
+        """检测器包络回调：解码并发出新文本（在接收工作线程中）"""
+        chars = self.cw_decoder.process(envelope)
+        if chars:
+            self.text_received.emit(''.join(char for _, char in chars))
+            if self.receive_speed_auto:
+                # 速度取整后有变化才通知界面
+                wpm = int(round(self.cw_decoder.wpm))
+                if wpm != self._reported_speed:
+                    self._reported_speed = wpm
+                    self.receive_speed_changed.emit(wpm)
+
+    def _open_skimmer(self):
+        """创建多信号解码器（启动解码进程）"""
+        if self.skimmer is None:
+            from skimmer import CwSkimmer  # 多进程解码器仅在启用时加载
+            self.skimmer = CwSkimmer(self.receive_engine.working_rate, self.audio_bandwidth)
+            self.skimmer.on_text = self.skimmer_text.emit
+
+    def _close_skimmer(self):
+        """关闭多信号解码器"""
+        skimmer = self.skimmer
+        self.skimmer = None
+        if skimmer is not None:
+            skimmer.close()
+
+    def set_skimmer_mode(self, enabled):
+        """设置多信号解码模式，接收中立即生效"""
+        self.skimmer_mode = enabled
+        if not self.is_receiving:
+            return
+        if enabled:
+            self._open_skimmer()
+            self.receive_engine.set_stages(self._build_receive_chain())
+        else:
+            skimmer = self.skimmer
+            self.skimmer = None
+            self.receive_engine.set_stages(self._build_receive_chain())
+            if skimmer is not None:
+                skimmer.close()
+
+    def set_noise_reduction(self, enabled):
+        """设置弱信号增强，接收中立即切换处理级"""
+        if enabled and not self.noise_reduction:
+            self.noise_reducer.reset()
+        self.noise_reduction = enabled
+        if self.is_receiving:
+            self.receive_engine.set_stages(self._build_receive_chain())
+
+    def set_low_cpu_mode(self, enabled):
+        """设置低CPU模式，接收中立即切换处理级"""
+        self.low_cpu_mode = enabled
+        if self.is_receiving:
+            self.receive_engine.set_stages(self._build_receive_chain())
+
+    def set_monitor_audio(self, enabled):
+        """设置接收监听，接收中立即生效；监听设备与输出设备相同而无法监听时返回False"""
+        self.monitor_audio = enabled
+        self.monitor.reset()
+        routed = self._route_monitor()
+        if self.is_receiving:
+            block_size = self.MONITOR_BLOCK_SIZE if enabled else self.RECEIVE_BLOCK_SIZE
+            if block_size != self.receive_engine.block_size:
+                # 输入块长度改变时重新启动接收
+                self.stop_receiving()
+                self.start_receiving()
+            else:
+                self.receive_engine.set_stages(self._build_receive_chain())
+        return routed or not enabled
+
+    def set_monitor_latency(self, latency_ms):
+        """设置监听缓冲的目标延迟(ms)"""
+        self.monitor_latency = latency_ms
+        self.monitor.configure(latency=latency_ms / 1000)
+
+    def get_monitor_stats(self):
+        """监听状态：延迟(ms)、欠载次数、溢出次数、时钟修正(ppm)"""
+        return self.monitor.stats()
+
+    def _route_monitor(self):
+        """把监听音频接到监听设备的输出流上，返回是否已接上"""
+        enabled = self.monitor_audio
+        if enabled and self.monitor_device == self.output_device:
+            # 输出设备接发射机，接收音频不能混入发射音频
+            trace.info("监听设备与输出设备相同，不播放接收监听音频")
+            enabled = False
+        self.audio_engine.set_monitor(self.monitor_device, self.monitor if enabled else None)
+        return enabled
+
+    def stop_receiving(self):
+        """停止接收"""
+        self.receive_engine.stop()
+        self._close_skimmer()
 
     def set_output_device(self, device_index):
         """设置输出设备"""
-        self.output_device = device_index
+        self._device_identities['output'] = self.devices.identity_of(device_index, 'output')
+        if device_index != self.output_device:
+            self.output_device = device_index
+            self.prewarm_output_streams()
 
     def set_monitor_device(self, device_index):
         """设置监听设备"""
-        self.monitor_device = device_index
+        self._device_identities['monitor'] = self.devices.identity_of(device_index, 'output')
+        if device_index != self.monitor_device:
+            self.monitor_device = device_index
+            self.prewarm_output_streams()
+
+    def prewarm_output_streams(self):
+        """预先打开输出设备和监听设备的输出流，并关闭不再使用的流（在音频引擎线程中进行）"""
+        self.audio_engine.set_devices({self.output_device, self.monitor_device})
+        self._route_monitor()
+
+    def close_output_streams(self):
+        """关闭所有常驻输出流（程序退出时调用），最多等待音频引擎线程2秒"""
+        self.audio_engine.close_channels()
 
     def set_audio_bandwidth(self, bandwidth):
         """设置音频采集带宽"""
         self.audio_bandwidth = bandwidth
+        self.spectrum_engine.configure(bandwidth=bandwidth)
+        if self.is_receiving and choose_working_rate(bandwidth, self.sample_rate) != self.receive_engine.working_rate:
+            # 工作采样率改变时重新启动接收，使各处理级按新采样率重建
+            self.stop_receiving()
+            self.start_receiving()
 
     def set_cw_frequency(self, frequency):
         """设置CW编码频率"""
+        if frequency != self.cw_frequency:
+            # 字符缓存只在音频引擎线程中使用，清空也交给该线程
+            self.audio_engine.call(self.morse_utils.char_cache.clear)
         self.cw_frequency = frequency
+        self.cw_filter.retune(center=frequency)
+        self.tone_detector.retune(frequency=frequency)
 
     def set_cw_bandwidth(self, bandwidth):
         """设置CW模式截取带宽"""
         self.cw_bandwidth = bandwidth
+        self.cw_filter.retune(bandwidth=bandwidth)
+        self.tone_detector.retune(bandwidth=bandwidth)
 
     def set_send_cw_speed(self, wpm):
+        if wpm != self.send_cw_speed:
+            self.audio_engine.call(self.morse_utils.char_cache.clear)
         self.send_cw_speed = wpm
 
+    def set_receive_speed(self, wpm):
+        """设置手动模式下的接收速度"""
+        self.receive_cw_speed = wpm
+        self.cw_decoder.set_speed(wpm=wpm)
+
+    def set_receive_speed_auto(self, enabled):
+        """切换自动测速；关闭时解码器按手动速度设置门限"""
+        self.receive_speed_auto = enabled
+        self._reported_speed = None
+        self.cw_decoder.set_speed(wpm=self.receive_cw_speed, auto=enabled)
+
     def get_send_cw_speed(self):
         return self.send_cw_speed
 
+    def get_char_cache_stats(self):
+        """获取单字符波形缓存的命中统计"""
+        return self.morse_utils.char_cache.stats()
+
     def generate_test_tone(self, frequency, duration=1.0):
         """生成测试音频"""
         t = np.linspace(0, duration, int(self.sample_rate * duration), False)
         tone = np.sin(2 * np.pi * frequency * t)
         return tone
 
+    @property
+    def is_testing(self):
+        return self._test_job is not None
+
+    @property
+    def is_sending(self):
+        return self._send_job is not None
+
     def play_test_tone(self, frequency, wpm=26):
         """播放测试音频，支持速度wpm"""
-        print(f"play_test_tone: frequency={frequency}, wpm={wpm}")  # 调试信息
+        trace.debug("play_test_tone: frequency={}, wpm={}", frequency, wpm)
         with self._lock:
             # 如果正在测试或发送，则不开始新的测试
             if self.is_testing or self.is_sending:
-                print("已经在测试或发送中，不开始新的测试")  # 调试信息
+                trace.debug("已经在测试或发送中，不开始新的测试")
                 return
-            print("开始新的测试")  # 调试信息
-            self.is_testing = True
-            self.test_thread = threading.Thread(target=self._test_tone_loop, args=(frequency, wpm))
-            self.test_thread.start()
+            job = Playback(self.monitor_device, self._test_segments(frequency, wpm),
+                           on_done=self._on_test_done)
+            self._test_job = job
+        self.audio_engine.play(job)
 
     def stop_test_tone(self):
-        """停止测试音频"""
-        print("stop_test_tone 被调用")  # 调试信息
-        with self._lock:
-            if not self.is_testing:
-                print("当前没有在测试中")  # 调试信息
-                return
-            print("停止测试音频")  # 调试信息
-            self.is_testing = False
-            # 中断测试音频流
-            if self.test_stream is not None:
-                try:
-                    print("尝试中止测试音频流")  # 调试信息
-                    self.test_stream.abort()  # 先尝试中止
-                    print("尝试停止测试音频流")  # 调试信息
-                    self.test_stream.stop()   # 再尝试停止
-                    print("尝试关闭测试音频流")  # 调试信息
-                    self.test_stream.close()  # 最后关闭
-                except Exception as e:
-                    print(f"停止测试音频流时出错: {e}")  # 调试信息
-                finally:
-                    self.test_stream = None
-            if self.test_thread:
-                print("等待测试线程结束")  # 调试信息
-                # 使用较短的超时，避免GUI卡死
-                self.test_thread.join(timeout=0.1)
-                self.test_thread = None
-
-    def _test_tone_loop(self, frequency, wpm):
-        """测试音频播放一次"""
-        print(f"_test_tone_loop: frequency={frequency}, wpm={wpm}")  # 调试信息
-        try:
-            # 生成CQ CQ CQ的摩尔斯码音频 (生成完整的音频)
-            audio = self.morse_utils.generate_cq_audio(frequency, wpm)
-            audio_len = len(audio)
-            print(f"生成了音频数据，长度: {audio_len}")  # 调试信息
-
-            # 创建音频流
-            print(f"创建测试音频流，使用设备: {self.monitor_device}")  # 调试信息
-            stream = sd.OutputStream(
-                samplerate=self.sample_rate,
-                channels=1,
-                device=self.monitor_device,
-                dtype=np.float32,
-                blocksize=1024
-            )
-            
-            with self._lock:
-                if not self.is_testing:
-                    print("测试已被停止，不播放音频")  # 调试信息
-                    return
-                self.test_stream = stream
-                self.test_stream.start()
-                print("测试音频流已启动")  # 调试信息
-
-            # 分块播放音频，以便及时响应停止信号
-            chunk_size = 1024 # 每次写入的音频帧数
-            for i in range(0, audio_len, chunk_size):
-                with self._lock:
-                    if not self.is_testing: # 在写入前检查停止信号
-                        print("检测到停止信号，中断播放")  # 调试信息
-                        break
-                    chunk = audio[i:i + chunk_size]
-                    # 确保chunk是二维的 (samples, channels)
-                    if chunk.ndim == 1:
-                        chunk = chunk.reshape(-1, 1)
-
-                    if self.test_stream is not None and self.test_stream.active:
-                        try:
-                            # 使用write方法播放音频块
-                            self.test_stream.write(chunk)
-                        except Exception as e:
-                            print(f"测试音频写入流失败: {e}")
-                            break # 写入失败，中断播放
-                    else:
-                        print("测试音频流非活动或不存在，中断播放")  # 调试信息
-                        break
-
-                # 在每次写入后检查停止信号
-                if not self.is_testing:
-                    print("检测到停止信号，中断播放")  # 调试信息
-                    break
-
-        except Exception as e:
-            print(f"测试音频播放循环错误: {e}")
-        finally:
-            with self._lock:
-                # 确保is_testing状态最终被设置为False
-                if self.is_testing:
-                     print("设置is_testing为False")  # 调试信息
-                     self.is_testing = False
-                if self.test_stream is not None:
-                    try:
-                        print("尝试停止测试音频流")  # 调试信息
-                        self.test_stream.stop()
-                        print("尝试关闭测试音频流")  # 调试信息
-                        self.test_stream.close()
-                    except Exception as e:
-                        print(f"关闭测试音频流失败: {e}")  # 调试信息
-                    finally:
-                        self.test_stream = None
-                # 发出测试完成信号
-                print("发出测试完成信号")  # 调试信息
-                self.test_completed.emit()
+        """停止测试音频，立即返回，尚未播放的样本在下一个声卡回调块中丢弃"""
+        job = self._test_job
+        if job is None:
+            trace.debug("当前没有在测试中")
+            return
+        trace.debug("停止测试音频")
+        self._test_job = None
+        self.audio_engine.stop(job)
+
+    def _test_segments(self, frequency, wpm):
+        """测试音频：CQ CQ CQ（在音频引擎线程中合成）"""
+        audio = self.morse_utils.generate_cq_audio(frequency, wpm)
+        trace.debug("生成了音频数据，长度: {}", len(audio))
+        yield audio, None
+
+    def _on_test_done(self, job):
+        if self._test_job is job:
+            self._test_job = None
+        trace.debug("发出测试完成信号")
+        self.test_completed.emit()
 
     def send_cw(self, text, frequency, wpm):
         """发送CW报文"""
@@ -212,148 +424,115 @@ class AudioManager(QObject):
             # 如果正在发送或测试，则不开始新的发送
             if self.is_sending or self.is_testing:
                 return
-            self.is_sending = True
-            # 将整个文本传递给发送循环，由循环按字符处理
-            self.send_thread = threading.Thread(target=self._send_loop, args=(text, frequency, wpm))
-            self.send_thread.start()
+            job = Playback(self.output_device, self._send_segments(text, frequency, wpm),
+                           on_char=self._on_character_played, on_done=self._on_send_done)
+            self._send_job = job
+        self.audio_engine.play(job)
 
     def stop_sending_cw(self):
-        """停止发送CW报文"""
-        with self._lock:
-            if not self.is_sending:
-                return
-            self.is_sending = False
-            if self.send_stream is not None:
-                try:
-                    print("尝试中止发送音频流")  # 调试信息
-                    self.send_stream.abort()  # 先尝试中止
-                    print("尝试停止发送音频流")  # 调试信息
-                    self.send_stream.stop()   # 再尝试停止
-                    print("尝试关闭发送音频流")  # 调试信息
-                    self.send_stream.close()  # 最后关闭
-                except Exception as e:
-                    print(f"停止发送音频流时出错: {e}")  # 调试信息
-                finally:
-                    self.send_stream = None
-            if self.send_thread:
-                print("等待发送线程结束")  # 调试信息
-                # 使用较短的超时，避免GUI卡死
-                self.send_thread.join(timeout=0.1)
-                self.send_thread = None
-
-    def _send_loop(self, text, frequency, wpm):
-        """发送CW报文循环，按字符发送"""
+        """停止发送CW报文，立即返回，尚未播放的样本在下一个声卡回调块中丢弃"""
+        job = self._send_job
+        if job is None:
+            return
+        self._send_job = None
+        self.audio_engine.stop(job)
+
+    def _send_segments(self, text, frequency, wpm):
+        """报文的音频段（在音频引擎线程中按需合成）
+
+        字符音频自带1单位的元素间隔，补足到字符间隔(3单位)和词间隔(7单位)，
+        字符在其后的间隔写完时标记为已发送。
+        """
+        unit = self.morse_utils.wpm_to_durations(wpm)[0]
+        char_gap = int(2 * unit * self.sample_rate)
+        word_gap = int(4 * unit * self.sample_rate)
+        for char in self.morse_utils.tokenize(text):
+            if char == ' ':
+                yield word_gap, char
+                continue
+            if self.morse_utils.encode_token(char) is None:
+                trace.warning("发送CW：跳过无法编码的字符 {!r}", char)
+                continue
+            # 从缓存获取单个字符的音频，未缓存时才合成
+            audio = self.morse_utils.char_cache.get(char, frequency, wpm)
+            if len(audio) == 0:
+                continue
+            trace.debug("发送字符 {!r}", char)
+            yield audio, None
+            yield char_gap, char
+
+    def _on_character_played(self, char):
+        if self._send_job is not None:
+            self.character_sent.emit(char)
+
+    def _on_send_done(self, job):
+        if self._send_job is job:
+            self._send_job = None
+        trace.debug("发出发送完成信号")
+        self.send_completed.emit()
+
+    @property
+    def is_decoding_file(self):
+        return self.file_decode_thread is not None and self.file_decode_thread.is_alive()
+
+    def start_file_decode(self, path):
+        """在后台线程中解码WAV文件，使用当前的CW频率、带宽、接收速度和弱信号增强设置"""
+        if self.is_decoding_file:
+            return
+        options = dict(frequency=self.cw_frequency, bandwidth=self.cw_bandwidth,
+                       audio_bandwidth=self.audio_bandwidth, wpm=self.receive_cw_speed,
+                       denoise=self.noise_reduction)
+        self.file_decode_thread = threading.Thread(target=self._file_decode_loop, args=(path, options),
+                                                   daemon=True)
+        self.file_decode_thread.start()
+
+    def _file_decode_loop(self, path, options):
+        """文件解码线程"""
+        speed = 0.0
         try:
-            for char in text:
-                if not self.is_sending: # 在发送每个字符前检查停止信号
-                    print("发送CW：检测到停止信号，中断发送")  # 调试信息
-                    break
-
-                # 转换为摩尔斯码并生成音频
-                morse_code = self.morse_utils.text_to_morse(char) # 转换为单个字符的摩尔斯码
-                audio = self.morse_utils.morse_to_audio(morse_code, frequency, wpm) # 生成单个字符的音频
-
-                if len(audio) == 0: # 如果是无法转换的字符（如中文），跳过
-                     continue
-
-                # 创建音频流（如果不存在）
-                with self._lock:
-                    if not self.is_sending: # 再次检查停止信号
-                         break
-                    if self.send_stream is None or not self.send_stream.active:
-                         # 使用 output_device 播放CW报文
-                         print(f"创建发送音频流，使用设备: {self.output_device}") # 调试信息
-                         self.send_stream = sd.OutputStream(
-                             samplerate=self.sample_rate,
-                             channels=1,
-                             device=self.output_device,
-                             dtype=np.float32,
-                             blocksize=1024
-                         )
-                         self.send_stream.start()
-                         print("发送音频流已启动") # 调试信息
-
-                # 分块播放单个字符的音频
-                chunk_size = 1024 # 每次写入的音频帧数
-                audio_len = len(audio)
-                for i in range(0, audio_len, chunk_size):
-                    with self._lock:
-                        if not self.is_sending: # 在写入前检查停止信号
-                            print("发送CW：检测到停止信号，中断播放")  # 调试信息
-                            break
-                        chunk = audio[i:i + chunk_size]
-                        # 确保音频数据是二维的 (samples, channels)
-                        if chunk.ndim == 1:
-                            chunk = chunk.reshape(-1, 1)
-
-                        if self.send_stream is not None and self.send_stream.active:
-                            try:
-                                # 使用write方法，如果stream停止会抛异常
-                                self.send_stream.write(chunk)
-                            except Exception as e:
-                                print(f"发送CW写入流失败: {e}")
-                                break # 写入失败或停止信号
-                        else:
-                            print("发送CW：音频流非活动或不存在，中断播放")  # 调试信息
-                            break
-
-                    # 在每次写入后检查停止信号
-                    if not self.is_sending:
-                         print("发送CW：检测到停止信号，中断播放") # 调试信息
-                         break
-
-                # 等待单个字符的音频播放完成
-                if self.send_stream is not None and self.send_stream.active:
-                     try:
-                          self.send_stream.wait() # 等待当前字符音频播放完毕
-                          print(f"字符 '{char}' 音频播放完成") # 调试信息
-                     except Exception as e:
-                          print(f"等待字符音频播放完成失败: {e}") # 调试信息
-                          if not self.is_sending: # 如果是停止导致的异常，中断循环
-                               break
-
-                # 发送单个字符完成信号
-                if self.is_sending: # 只有在没有被停止的情况下才发送信号
-                     print(f"发出字符 '{char}' 发送完成信号") # 调试信息
-                     self.character_sent.emit(char)
-
+            from file_decoder import decode_file  # 依赖scipy.io，仅在解码文件时加载
+            _, speed = decode_file(path, on_text=self.file_decode_text.emit,
+                                   on_progress=self.file_decode_progress.emit, **options)
         except Exception as e:
-            print(f"发送CW音频播放循环错误: {e}")
-        finally:
-            with self._lock:
-                self.is_sending = False # 发送循环结束，设置状态为False
-                if self.send_stream is not None:
-                    try:
-                        print("尝试停止发送音频流")  # 调试信息
-                        self.send_stream.stop()
-                        print("尝试关闭发送音频流")  # 调试信息
-                        self.send_stream.close()
-                    except Exception as e:
-                        print(f"关闭发送音频流失败: {e}")  # 调试信息
-                    finally:
-                        self.send_stream = None
-            # 发送完成信号
-            print("发出发送完成信号")  # 调试信息
-            self.send_completed.emit()
+            trace.error("音频文件解码失败: {}", e)
+        self.file_decode_finished.emit(speed)
 
     def get_current_settings(self):
         """获取当前设置"""
         return {
-            'input_device': self.input_device,
-            'output_device': self.output_device,
-            'monitor_device': self.monitor_device,
+            'input_device': self._device_identities['input'],
+            'output_device': self._device_identities['output'],
+            'monitor_device': self._device_identities['monitor'],
             'audio_bandwidth': self.audio_bandwidth,
             'cw_frequency': self.cw_frequency,
             'cw_bandwidth': self.cw_bandwidth,
-            'send_cw_speed': self.send_cw_speed
+            'send_cw_speed': self.send_cw_speed,
+            'receive_cw_speed': self.receive_cw_speed,
+            'receive_cw_speed_auto': self.receive_speed_auto,
+            'low_cpu_mode': self.low_cpu_mode,
+            'noise_reduction': self.noise_reduction,
+            'skimmer_mode': self.skimmer_mode,
+            'monitor_audio': self.monitor_audio,
+            'monitor_latency': self.monitor_latency
         }
 
     def load_settings(self, settings):
         """加载设置"""
-        self.input_device = settings.get('input_device')
-        self.output_device = settings.get('output_device')
-        self.monitor_device = settings.get('monitor_device')
-        self.audio_bandwidth = settings.get('audio_bandwidth', 3000)
-        self.cw_frequency = settings.get('cw_frequency', 700)
-        self.cw_bandwidth = settings.get('cw_bandwidth', 150)
-        self.send_cw_speed = settings.get('send_cw_speed', 26) 
\ No newline at end of file
+        # 只记录设备标识（旧配置为设备号），设备扫描完成后解析为当前设备号并预热输出流
+        self._device_identities = {
+            'input': settings.get('input_device'),
+            'output': settings.get('output_device'),
+            'monitor': settings.get('monitor_device'),
+        }
+        self.set_audio_bandwidth(settings.get('audio_bandwidth', 3000))
+        self.set_cw_frequency(settings.get('cw_frequency', 700))
+        self.set_cw_bandwidth(settings.get('cw_bandwidth', 150))
+        self.send_cw_speed = settings.get('send_cw_speed', 26)
+        self.set_receive_speed(settings.get('receive_cw_speed', 26))
+        self.set_receive_speed_auto(settings.get('receive_cw_speed_auto', True))
+        self.set_low_cpu_mode(settings.get('low_cpu_mode', False))
+        self.set_noise_reduction(settings.get('noise_reduction', True))
+        self.set_skimmer_mode(settings.get('skimmer_mode', False))
+        self.set_monitor_latency(settings.get('monitor_latency', 20))
+        # 监听在设备解析后由prewarm_output_streams接到监听设备上
+        self.monitor_audio = settings.get('monitor_audio', False) 
\ No newline at end of file
@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+import time
+from tracing import trace
+
+class ConfigStore:
+    """配置文件存储
+
+    save()只记录最新的配置，由后台线程在最后一次修改后等待delay秒再写入，
+    连续修改（如逐字输入呼号）只写一次。写入时先写临时文件再原子替换，
+    写到一半崩溃也不会损坏原文件；内容与上次写入相同时跳过。
+    程序退出前调用close()写出尚未保存的修改。
+    """
+
+    def __init__(self, path='config.json', delay=0.5):
+        self.path = path
+        self.delay = delay
+        self.writes = 0            # 实际写入文件的次数
+        self._pending = None       # 待写入的配置
+        self._changed_at = 0.0     # 最近一次save()的时间
+        self._last_text = None     # 上次写入（或读取）的文件内容
+        self._closed = False
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def load(self):
+        """读取配置，文件不存在时返回None，文件损坏时备份后返回None"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            config = json.loads(text)
+        except ValueError as e:
+            trace.warning("配置文件已损坏，使用默认设置: {}", e)
+            try:
+                os.replace(self.path, self.path + '.bad')
+            except OSError:
+                pass
+            return None
+        self._last_text = text
+        return config
+
+    def save(self, config):
+        """记录新的配置，稍后在后台写入"""
+        with self._condition:
+            self._pending = dict(config)
+            self._changed_at = time.monotonic()
+            self._condition.notify()
+
+    def flush(self):
+        """立即写出尚未保存的配置"""
+        with self._condition:
+            config = self._pending
+            self._pending = None
+        if config is not None:
+            self._write(config)
+
+    def close(self):
+        """写出尚未保存的配置并结束后台线程"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
+
+    def _write_loop(self):
+        while True:
+            with self._condition:
+                # 等到有修改且距最后一次修改已超过delay
+                while not self._closed:
+                    if self._pending is not None:
+                        remaining = self._changed_at + self.delay - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._condition.wait()
+                if self._closed:
+                    return
+                config = self._pending
+                self._pending = None
+            self._write(config)
+
+    def _write(self, config):
+        """序列化并原子替换配置文件，内容未变化时不写"""
+        text = json.dumps(config, ensure_ascii=False, indent=4)
+        with self._write_lock:
+            if text == self._last_text:
+                return
+            temp_path = self.path + '.tmp'
+            try:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    f.write(text)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, self.path)
+            except OSError as e:
+                trace.error("保存配置失败: {}", e)
+                return
+            self._last_text = text
+            self.writes += 1
@@ -0,0 +1,206 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from morse_utils import MorseDecoder
+from speed_estimator import SpeedEstimator
+
+class CwDecoder:
+    """基于音调包络的流式CW解码器
+
+    对包络做自适应门限得到按键通断，按连续段长度区分点划和间隔，
+    当前间隔超过字符间隔门限时立即输出字符，不必等到下一个按键。
+    点划和间隔的门限由在线速度估计器给出，随发报速度变化自动调整。
+
+    静噪按最近一段时间的持续信噪比开关：信号电平取包络持续SQUELCH_SUSTAIN以上的电平
+    （最小值滤波后的高分位数），只有按键能维持，噪声的随机尖峰维持不住；噪声电平取整段包络
+    的低分位数，即按键间隙中的噪声。信噪比达到min_snr时打开，低于其80%并持续
+    SQUELCH_HOLD后关闭；关闭期间不输出任何字符，打开时回放之前的一段包络，不丢第一个字符。
+    """
+
+    SQUELCH_WINDOW = 1.5    # 统计信号和噪声电平的时长(秒)
+    SQUELCH_SUSTAIN = 0.03  # 信号电平要求的持续时长(秒)，短于60 WPM的划
+    SQUELCH_HOLD = 2.0      # 信噪比降到关闭门限以下后保持打开的时长(秒)
+    SQUELCH_LOOKBACK = 1.0  # 静噪打开时回放的包络时长(秒)
+    SIGNAL_QUANTILE = 0.95
+    NOISE_QUANTILE = 0.3    # CW占空比一般不超过50%，此分位数落在按键间隙中
+
+    def __init__(self, envelope_rate, wpm=20, min_snr=4.5, auto_speed=True):
+        self.envelope_rate = envelope_rate
+        self.min_snr = min_snr      # 静噪打开所需的持续信噪比
+        self.snr = 0.0              # 当前的持续信噪比
+        self.position = 0           # 已处理的包络样本数
+        self.min_dot = self._wpm_to_dot(60)   # 速度估计范围 5~60 WPM
+        self.max_dot = self._wpm_to_dot(5)
+        # 短于60 WPM点长70%的按键视为毛刺；门限不随估计速度变化，
+        # 估计值还停留在慢速时，快速发报的点也不会被当成毛刺滤掉
+        self.min_mark = 0.7 * self.min_dot
+        self.speed = SpeedEstimator(self._wpm_to_dot(wpm), auto=auto_speed)
+        window = max(1, int(round(self.SQUELCH_WINDOW * envelope_rate)))
+        self._sustain = max(1, int(round(self.SQUELCH_SUSTAIN * envelope_rate)))
+        self._envelope = np.zeros(window)   # 最近的包络
+        self._sustained = np.zeros(window)  # 对应的持续电平（最近_sustain个样本的最小值）
+        self._filled = 0                    # 以上两个缓冲区中的有效样本数
+        self._signal = 0.0          # 判决用的信号电平
+        self._noise = 0.0           # 噪声电平
+        self._open = False          # 静噪是否打开
+        self._hold = 0              # 静噪关闭前剩余的保持样本数
+        self._state = False         # 当前是否按下
+        self._run = 0               # 当前通/断段的长度（包络样本）
+        self._last_space = 0        # 最近一个完整间隔的长度，用于合并毛刺
+        self._morse = MorseDecoder() # 当前字符的逐元素解码状态
+        self._char_done = True      # 当前间隔是否已输出字符
+        self._word_done = True      # 当前间隔是否已输出词间隔
+        self._space_pending = False # 最近的完整间隔是否待计入速度估计
+        self._output = []           # 本次调用输出的(时间, 字符)
+
+    def _wpm_to_dot(self, wpm):
+        """速度转换为点长度（包络样本数）"""
+        return 1.2 / wpm * self.envelope_rate
+
+    @property
+    def wpm(self):
+        """当前估计的速度"""
+        return 1.2 * self.envelope_rate / self.speed.dot
+
+    def set_speed(self, wpm=None, auto=None):
+        """设置固定速度或切换自动测速"""
+        if auto is not None:
+            self.speed.auto = auto
+        if wpm is not None and not self.speed.auto:
+            self.speed.reset(self._wpm_to_dot(wpm))
+
+    @property
+    def squelched(self):
+        """静噪是否关闭（没有检测到载波）"""
+        return not self._open
+
+    def process(self, envelope):
+        """处理一段包络，返回新解码的[(时间秒, 字符), ...]"""
+        self._output = []
+        if len(envelope) == 0:
+            return self._output
+        opening = self._update_squelch(envelope)
+        position = self.position
+        if opening:
+            # 打开前的按键已被静噪掉，回放最近一段包络重新判决；回放部分属于当前的间隔
+            lookback = min(int(self.SQUELCH_LOOKBACK * self.envelope_rate), self._run,
+                           self._filled - len(envelope))
+            lookback = max(lookback, 0)
+            if lookback:
+                envelope = self._envelope[-(lookback + len(envelope)):]
+                position -= lookback
+                self._run -= lookback
+        keyed = self._slice(envelope)
+        # 按通断状态切分为连续段
+        changes = np.flatnonzero(keyed[1:] != keyed[:-1]) + 1
+        starts = np.concatenate(([0], changes))
+        lengths = np.diff(np.concatenate((starts, [len(keyed)])))
+        for start, length in zip(starts, lengths):
+            self._advance(bool(keyed[start]), int(length), position + start)
+        self.position = position + len(envelope)
+        if not self._state:
+            self._check_gap(self.position)
+        return self._output
+
+    def _update_squelch(self, envelope):
+        """更新信号和噪声电平及静噪状态，返回静噪是否在本段打开"""
+        window = len(self._envelope)
+        count = min(len(envelope), window)
+        sustain = self._sustain
+        # 持续电平：每个样本及其之前共sustain个样本的最小值
+        extended = np.concatenate((self._envelope[window - sustain + 1:], envelope)) \
+            if sustain > 1 else envelope
+        sustained = sliding_window_view(extended, sustain).min(axis=1)
+        for buffer, fresh in ((self._envelope, envelope), (self._sustained, sustained)):
+            buffer[:window - count] = buffer[count:]
+            buffer[window - count:] = fresh[len(fresh) - count:]
+        self._filled = min(self._filled + len(envelope), window)
+        filled = self._filled
+        noise = np.partition(self._envelope[-filled:], int(self.NOISE_QUANTILE * (filled - 1)))
+        noise = max(float(noise[int(self.NOISE_QUANTILE * (filled - 1))]), 1e-6)
+        signal = np.partition(self._sustained[-filled:], int(self.SIGNAL_QUANTILE * (filled - 1)))
+        signal = float(signal[int(self.SIGNAL_QUANTILE * (filled - 1))])
+        self.snr = signal / noise
+        was_open = self._open
+        if filled < window // 3:
+            # 刚开始接收时统计量不可靠（处理链的启动延迟会送来全零的包络）
+            self.snr = 0.0
+        elif self.snr >= (self.min_snr * 0.8 if self._open else self.min_snr):
+            self._open = True
+            self._hold = int(self.SQUELCH_HOLD * self.envelope_rate)
+        elif self._open:
+            self._hold -= len(envelope)
+            if self._hold <= 0:
+                self._open = False
+                # 静噪期间速度估计冻结，重新打开后的第一个按键不与之前的按键配对
+                self.speed.interrupt()
+                self._space_pending = False
+        # 判决用的信号电平快升慢降（半衰期为保持时长）：信号结束、移出统计窗口的过程中
+        # 电平估计逐渐下降，直接跟随会把门限降到噪声中
+        decay = 0.5 ** (len(envelope) / (self.SQUELCH_HOLD * self.envelope_rate))
+        self._signal = signal if not was_open else max(signal, self._signal * decay)
+        # 噪声电平下降时立即跟随，上升时每秒最多一倍：慢速发报的长划可能占满大半个统计窗口，
+        # 此时低分位数落在按键上，直接使用会把门限抬到信号电平
+        rise = 2.0 ** (len(envelope) / self.envelope_rate)
+        self._noise = noise if not was_open else min(noise, self._noise * rise)
+        return self._open and not was_open
+
+    def _slice(self, envelope):
+        """静噪打开时以信号和噪声电平的中点为门限"""
+        if not self._open:
+            return np.zeros(len(envelope), dtype=bool)
+        threshold = self._noise + 0.5 * (self._signal - self._noise)
+        return envelope > threshold
+
+    def _advance(self, state, length, position):
+        """处理一个连续段"""
+        if state == self._state:
+            self._run += length
+            return
+        if self._state:
+            # 按键结束
+            if self._run < self.min_mark:
+                # 过短的按键视为毛刺，并入前后的间隔
+                self._state = False
+                self._run = self._last_space + self._run + length
+                return
+            self._on_mark(self._run)
+        else:
+            # 间隔结束，等后面的按键确认不是毛刺后再计入速度估计
+            self._check_gap(position)
+            self._last_space = self._run
+            self._space_pending = True
+        self._state = state
+        self._run = length
+
+    def _on_mark(self, length):
+        """记录一个点或划，静噪打开时更新速度估计"""
+        if self._open:
+            if self._space_pending:
+                self.speed.add_space(self._last_space)
+            is_dash = self.speed.add_mark(length)
+            if self.speed.revised is not None:
+                # 速度突变时上一个按键被改判；已输出的字符不再修改
+                self._morse.revise(self.speed.revised)
+            if not self.min_dot <= self.speed.dot <= self.max_dot:
+                self.speed.reset(min(max(self.speed.dot, self.min_dot), self.max_dot))
+        else:
+            # 静噪刚关闭时结束的按键被截断，不计入速度估计
+            is_dash = length > self.speed.dash_threshold
+        self._space_pending = False
+        self._morse.push(is_dash)
+        self._char_done = False
+        self._word_done = False
+
+    def _check_gap(self, position):
+        """间隔超过门限时输出字符或词间隔"""
+        if self._state:
+            return
+        if not self._char_done and self._run >= self.speed.char_threshold:
+            self._char_done = True
+            self._emit(position, self._morse.end_char())
+        if self._char_done and not self._word_done and self._run >= self.speed.word_threshold:
+            self._word_done = True
+            self._emit(position, ' ')
+
+    def _emit(self, position, char):
+        self._output.append((position / self.envelope_rate, char))
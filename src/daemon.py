@@ -0,0 +1,159 @@
+import argparse
+import socket
+import sys
+import threading
+import time
+from audio_manager import AudioManager
+from events import EventQueue
+from tracing import trace
+
+class TextServer:
+    """TCP文本广播服务：解码文本发送给所有已连接的客户端"""
+
+    def __init__(self, host, port):
+        self._socket = socket.create_server((host, port))
+        self._clients = []
+        self._lock = threading.Lock()
+        self.address = self._socket.getsockname()
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                client, address = self._socket.accept()
+            except OSError:
+                break
+            print(f"客户端已连接: {address[0]}:{address[1]}", file=sys.stderr)
+            with self._lock:
+                self._clients.append(client)
+
+    def send(self, text):
+        data = text.encode('utf-8')
+        with self._lock:
+            for client in list(self._clients):
+                try:
+                    client.sendall(data)
+                except OSError:
+                    # 客户端已断开
+                    self._clients.remove(client)
+                    client.close()
+
+    def close(self):
+        self._socket.close()
+        with self._lock:
+            for client in self._clients:
+                client.close()
+            self._clients = []
+
+
+def _parse_address(text):
+    """解析 HOST:PORT 或 PORT"""
+    host, _, port = text.rpartition(':')
+    return host or '0.0.0.0', int(port)
+
+
+def _find_input_device(manager, name):
+    """按设备号或名称（部分匹配）查找输入设备，找不到时返回None"""
+    input_devices, _ = manager.get_audio_devices()
+    if name.isdigit():
+        index = int(name)
+        return index if any(d['index'] == index for d in input_devices) else None
+    for device in input_devices:
+        if name.lower() in device['name'].lower():
+            return device['index']
+    return None
+
+
+def main(argv=None):
+    """无界面解码：从输入设备接收CW并把文本输出到标准输出或TCP连接"""
+    parser = argparse.ArgumentParser(description="AutoMorse无界面CW解码服务")
+    parser.add_argument('--device', help="输入设备号或名称（部分匹配），默认为系统默认输入设备")
+    parser.add_argument('--list-devices', action='store_true', help="列出输入设备后退出")
+    parser.add_argument('--frequency', type=float, default=700, help="CW频率(Hz)")
+    parser.add_argument('--bandwidth', type=float, default=150, help="CW截取带宽(Hz)")
+    parser.add_argument('--audio-bandwidth', type=int, default=3000, help="音频采集带宽(Hz)")
+    parser.add_argument('--wpm', type=int, default=20, help="初始接收速度(WPM)")
+    parser.add_argument('--fixed-speed', action='store_true', help="关闭自动测速，按--wpm固定速度解码")
+    parser.add_argument('--skimmer', action='store_true', help="多信号解码，每行输出一个载波的文本")
+    parser.add_argument('--listen', metavar='HOST:PORT', help="同时在TCP端口上广播解码文本")
+    parser.add_argument('--quiet', action='store_true', help="不输出到标准输出（配合--listen使用）")
+    parser.add_argument('--trace', metavar='LEVEL', nargs='?', const='debug',
+                        help="把不低于LEVEL（debug/info/warning/error）的跟踪事件输出到标准错误，默认debug")
+    args = parser.parse_args(argv)
+    if args.trace:
+        try:
+            trace.configure(level=args.trace, echo_level=args.trace)
+        except ValueError as e:
+            parser.error(str(e))
+    started = time.perf_counter()
+
+    manager = AudioManager()
+    if args.list_devices:
+        input_devices, _ = manager.get_audio_devices()
+        for device in input_devices:
+            print(f"{device['index']}: {device['name']}")
+        return 0
+    if args.device is not None:
+        device = _find_input_device(manager, args.device)
+        if device is None:
+            print(f"找不到输入设备: {args.device}", file=sys.stderr)
+            return 1
+        manager.input_device = device
+
+    # 无界面时不计算频谱
+    manager.set_low_cpu_mode(True)
+    manager.set_audio_bandwidth(args.audio_bandwidth)
+    manager.set_cw_frequency(args.frequency)
+    manager.set_cw_bandwidth(args.bandwidth)
+    # 先以手动模式设置初始速度，使解码器门限从--wpm开始
+    manager.set_receive_speed_auto(False)
+    manager.set_receive_speed(args.wpm)
+    manager.set_receive_speed_auto(not args.fixed_speed)
+    manager.set_skimmer_mode(args.skimmer)
+
+    server = None
+    if args.listen:
+        try:
+            server = TextServer(*_parse_address(args.listen))
+        except (OSError, ValueError) as e:
+            print(f"无法监听 {args.listen}: {e}", file=sys.stderr)
+            return 1
+        print(f"文本广播端口: {server.address[0]}:{server.address[1]}", file=sys.stderr)
+
+    # 事件在接收线程中产生，经队列交给主线程输出
+    events = EventQueue(manager, ['text_received', 'skimmer_text', 'receive_overrun'])
+    manager.start_receiving()
+    print(f"开始接收，启动用时 {time.perf_counter() - started:.2f} 秒", file=sys.stderr)
+
+    def output(text):
+        if not args.quiet:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+        if server is not None:
+            server.send(text)
+
+    try:
+        while manager.is_receiving:
+            event = events.get(timeout=0.5)
+            if event is None:
+                continue
+            name, values = event
+            if name == 'text_received':
+                output(values[0])
+            elif name == 'skimmer_text':
+                output(f"[{values[0]:.0f} Hz] {values[1]}\n")
+            elif name == 'receive_overrun':
+                print(f"接收缓冲区溢出（累计{values[0]}次）", file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        manager.stop_receiving()
+        if server is not None:
+            server.close()
+        if not args.quiet:
+            print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+import sys
+import threading
+import time
+import audio_backend
+from tracing import trace
+
+def device_fingerprint():
+    """操作系统层面的音频设备列表签名，用于低成本地检测热插拔；不支持的平台返回None"""
+    if sys.platform.startswith('linux'):
+        try:
+            with open('/proc/asound/cards', 'r', encoding='utf-8', errors='replace') as f:
+                return f.read()
+        except OSError:
+            return None
+    if sys.platform == 'win32':
+        import winreg
+        signature = []
+        for flow in ('Render', 'Capture'):
+            path = rf"SOFTWARE\Microsoft\Windows\CurrentVersion\MMDevices\Audio\{flow}"
+            try:
+                with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, path) as root:
+                    for i in range(winreg.QueryInfoKey(root)[0]):
+                        name = winreg.EnumKey(root, i)
+                        with winreg.OpenKey(root, name) as key:
+                            state = winreg.QueryValueEx(key, 'DeviceState')[0]
+                        signature.append((flow, name, state))
+            except OSError:
+                return None
+        return tuple(signature)
+    return None
+
+
+class DeviceRegistry:
+    """音频设备注册表
+
+    缓存PortAudio的设备枚举结果，界面和引擎查询设备时不再重复扫描。
+    设备以(名称, 主机API, 通道数, 同名序号)作为稳定标识保存到配置中：
+    插拔USB声卡后设备号会变化，标识不会，加载配置时按标识重新找到设备号。
+    """
+
+    def __init__(self):
+        self.inputs = []
+        self.outputs = []
+        self.enumerated = False
+        self._lock = threading.Lock()
+        self._fingerprint = None
+        self._watching = False
+
+    def refresh(self, reinitialize=False):
+        """重新枚举设备，返回(输入设备列表, 输出设备列表)
+
+        PortAudio只在初始化时扫描设备，reinitialize为True时重新初始化以发现新插入的设备，
+        调用方需保证此时没有打开的音频流。
+        """
+        backend = audio_backend.get()
+        fingerprint = device_fingerprint()
+        with self._lock:
+            if reinitialize and not audio_backend.reinitialize():
+                trace.info("音频后端不支持重新初始化，只能列出启动时已存在的设备")
+            devices = backend.query_devices()
+            hostapis = backend.query_hostapis()
+            inputs = self._collect(devices, hostapis, 'max_input_channels')
+            outputs = self._collect(devices, hostapis, 'max_output_channels')
+            self.inputs, self.outputs = inputs, outputs
+            self.enumerated = True
+            self._fingerprint = fingerprint
+        return inputs, outputs
+
+    @staticmethod
+    def _collect(devices, hostapis, channels_field):
+        """提取一类设备，并为每个设备生成稳定标识"""
+        result = []
+        seen = {}
+        for index, device in enumerate(devices):
+            channels = device[channels_field]
+            if channels <= 0:
+                continue
+            hostapi = hostapis[device['hostapi']]['name']
+            identity = (device['name'], hostapi, channels)
+            # 同一型号的多块声卡名称相同，按出现顺序区分
+            ordinal = seen.get(identity, 0)
+            seen[identity] = ordinal + 1
+            result.append({
+                'index': index,
+                'name': device['name'],
+                'channels': channels,
+                'hostapi': hostapi,
+                'key': {'name': device['name'], 'hostapi': hostapi,
+                        'channels': channels, 'ordinal': ordinal},
+            })
+        return result
+
+    def devices(self):
+        """返回缓存的(输入设备列表, 输出设备列表)，尚未枚举时先枚举"""
+        if not self.enumerated:
+            return self.refresh()
+        return self.inputs, self.outputs
+
+    def _list(self, kind):
+        # 只使用缓存，不在查询标识时触发扫描
+        return self.inputs if kind == 'input' else self.outputs
+
+    def identity_of(self, index, kind):
+        """设备号对应的稳定标识，kind为'input'或'output'；None表示系统默认设备"""
+        if index is None:
+            return None
+        for device in self._list(kind):
+            if device['index'] == index:
+                return dict(device['key'])
+        return None
+
+    def resolve(self, identity, kind):
+        """按稳定标识查找当前的设备号，找不到时返回None（使用系统默认设备）
+
+        依次尝试完全一致、名称和主机API一致、仅名称一致；
+        兼容旧配置中直接保存的设备号。
+        """
+        if identity is None:
+            return None
+        devices = self._list(kind)
+        if isinstance(identity, int):
+            return identity if any(d['index'] == identity for d in devices) else None
+        rules = (
+            lambda key: key == identity,
+            lambda key: key['name'] == identity.get('name') and key['hostapi'] == identity.get('hostapi'),
+            lambda key: key['name'] == identity.get('name'),
+        )
+        for rule in rules:
+            for device in devices:
+                if rule(device['key']):
+                    return device['index']
+        return None
+
+    def invalidate(self):
+        """丢弃记录的设备列表签名，watch在下次检查时重新触发刷新"""
+        self._fingerprint = None
+
+    def watch(self, on_change, interval=2.0):
+        """在后台线程中定时检查系统设备列表签名，变化时调用on_change()
+
+        on_change返回False表示暂时无法刷新（如正在使用音频流），下次检查时重试。
+        不支持签名的平台上不启动检查，只能手动刷新。
+        """
+        if self._watching or device_fingerprint() is None:
+            return False
+        self._watching = True
+        threading.Thread(target=self._watch_loop, args=(on_change, interval), daemon=True).start()
+        return True
+
+    def _watch_loop(self, on_change, interval):
+        while True:
+            time.sleep(interval)
+            fingerprint = device_fingerprint()
+            if fingerprint != self._fingerprint:
+                try:
+                    if on_change():
+                        # 刷新已安排（可能异步完成），在此之前不再重复触发
+                        self._fingerprint = fingerprint
+                except Exception as e:
+                    trace.exception("刷新音频设备失败: {}", e)
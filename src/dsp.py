@@ -0,0 +1,296 @@
+from fractions import Fraction
+from functools import lru_cache
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from ring_buffer import RingBuffer
+
+# 接收处理可选的工作采样率（从低到高）
+WORKING_RATES = (8000, 11025, 12000, 16000, 22050, 24000, 32000, 44100, 48000)
+# 工作采样率的奈奎斯特频率至少为音频采集带宽的这个倍数，余下的部分作为抽取滤波器的过渡带
+BANDWIDTH_MARGIN = 1.2
+
+def lowpass_fir(numtaps, cutoff, beta=8.0):
+    """Kaiser窗设计的线性相位低通FIR，cutoff为相对奈奎斯特频率的截止频率，直流增益归一为1"""
+    m = np.arange(numtaps) - (numtaps - 1) / 2
+    taps = cutoff * np.sinc(cutoff * m) * np.kaiser(numtaps, beta)
+    return taps / taps.sum()
+
+
+def choose_working_rate(bandwidth, input_rate):
+    """根据音频采集带宽选择工作采样率：奈奎斯特频率留出20%的过渡带"""
+    for rate in WORKING_RATES:
+        if rate >= input_rate:
+            break
+        if rate / 2 >= bandwidth * BANDWIDTH_MARGIN:
+            return rate
+    return input_rate
+
+
+class Decimator:
+    """流式多相重采样器（有理数比 up/down）
+
+    原型低通滤波器按up个相位分解，每个输出样本只计算所需相位的taps次乘加；
+    跨块保留输入历史，块边界处输出与整段处理完全一致。
+
+    通带为选用该工作采样率的最大采集带宽（奈奎斯特频率/BANDWIDTH_MARGIN），阻带从
+    工作采样率减去通带处开始，衰减不少于attenuation(dB)：采集带宽内平坦，
+    折叠进采集带宽的混叠都来自阻带。每相位的抽头数按Kaiser窗公式由过渡带宽和衰减确定。
+    """
+
+    def __init__(self, input_rate, output_rate, attenuation=60.0):
+        ratio = Fraction(int(output_rate), int(input_rate)).limit_denominator(1000)
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.up = ratio.numerator
+        self.down = ratio.denominator
+        rate = min(input_rate, output_rate)
+        self.passband = rate / (2 * BANDWIDTH_MARGIN)
+        self.stopband = rate - self.passband
+        # 原型滤波器工作在up倍输入采样率上，每相位的抽头数只与按输入采样率计的过渡带宽有关
+        transition = (self.stopband - self.passband) / input_rate
+        self.taps = int(np.ceil((attenuation - 7.95) / (14.36 * transition)))
+        beta = 0.1102 * (attenuation - 8.7)
+        cutoff = (self.passband + self.stopband) / (self.up * input_rate)
+        prototype = lowpass_fir(self.taps * self.up, cutoff, beta) * self.up
+        # 相位p的系数为prototype[p + k*up]，反转后可直接与按时间顺序排列的输入帧做点积
+        self._bank = prototype.reshape(self.taps, self.up).T[:, ::-1].astype(np.float32)
+        self._history = np.zeros(self.taps - 1, dtype=np.float32)
+        self._received = 0   # 已输入的样本总数
+        self._produced = 0   # 已输出的样本总数
+        self._buffer = np.zeros(0, dtype=np.float32)
+
+    def process(self, block):
+        """输入一块样本，返回本块可以得到的全部输出样本"""
+        length = len(block)
+        history = self.taps - 1
+        if len(self._buffer) != history + length:
+            # 块长不变时复用缓冲区及其滑动窗口视图
+            self._buffer = np.zeros(history + length, dtype=np.float32)
+            self._frames = sliding_window_view(self._buffer, self.taps)
+        data = self._buffer
+        data[:history] = self._history
+        data[history:] = block
+        self._history[:] = data[length:]
+        start = self._received
+        self._received += length
+
+        # 第n个输出对应输入位置 n*down/up，需要该位置之前的taps个输入样本
+        last = (self.up * self._received - 1) // self.down
+        if last < self._produced:
+            return np.zeros(0, dtype=np.float32)
+        n = np.arange(self._produced, last + 1)
+        self._produced = last + 1
+        position = n * self.down
+        base = position // self.up - start       # 在本块中的输入下标
+        phase = position % self.up
+        return np.einsum('ij,ij->i', self._frames[base], self._bank[phase]).astype(np.float32)
+
+
+class WorkBlocker:
+    """把输入块抽取到工作采样率，再重新切分为固定长度的工作块
+
+    工作块与输入块时长相同，各处理级看到的块长固定不变。
+    工作采样率等于输入采样率时不做抽取，输入块直接作为工作块。
+    """
+
+    def __init__(self, input_rate, working_rate, input_block_size):
+        self.input_rate = input_rate
+        self.working_rate = working_rate
+        if working_rate == input_rate:
+            self.decimator = None
+            self.block_size = input_block_size
+        else:
+            self.decimator = Decimator(input_rate, working_rate)
+            self.block_size = max(1, int(round(input_block_size * working_rate / input_rate)))
+        self._reduced = RingBuffer(4 * (self.block_size + input_block_size))
+        self._block = np.zeros(self.block_size, dtype=np.float32)
+
+    def reset(self):
+        """清空滤波器历史和未凑满的样本"""
+        self._reduced.skip(self._reduced.available)
+        if self.decimator is not None:
+            self.decimator = Decimator(self.input_rate, self.working_rate)
+
+    def feed(self, block):
+        """输入一块样本，依次产出凑满的工作块（复用同一缓冲区，需在下一次产出前用完）"""
+        if self.decimator is None:
+            yield block
+            return
+        self._reduced.write(self.decimator.process(block))
+        while self._reduced.available >= self.block_size:
+            self._reduced.read_into(self._block)
+            yield self._block
+
+
+@lru_cache(maxsize=64)
+def design_bandpass(center, bandwidth, sample_rate, order=4):
+    """设计Butterworth CW带通滤波器（二阶节形式，每行为b0 b1 b2 a0 a1 a2）
+
+    模拟原型极点经带通变换和双线性变换得到数字极点，每个二阶节取一对共轭极点，
+    零点位于z=±1，增益在中心频率处归一为1。结果按(中心频率, 带宽, 采样率, 阶数)缓存。
+    """
+    nyquist = sample_rate / 2
+    low = min(max(center - bandwidth / 2, 1.0), nyquist * 0.98)
+    high = min(max(center + bandwidth / 2, low + 1.0), nyquist * 0.99)
+    # 预畸变到模拟频率
+    fs2 = 2.0 * sample_rate
+    warped_low = fs2 * np.tan(np.pi * low / sample_rate)
+    warped_high = fs2 * np.tan(np.pi * high / sample_rate)
+    width = warped_high - warped_low
+    center2 = warped_low * warped_high
+    # 低通原型极点，带通变换后每个原型极点得到两个极点，双线性变换到z平面
+    prototype = np.exp(1j * np.pi * (2 * np.arange(order) + order + 1) / (2 * order))
+    root = np.sqrt((prototype * width) ** 2 - 4 * center2)
+    analog = np.concatenate(((prototype * width + root) / 2, (prototype * width - root) / 2))
+    poles = (fs2 + analog) / (fs2 - analog)
+    poles = poles[poles.imag > 0]
+    sos = np.zeros((order, 6))
+    sos[:, 0] = 1.0
+    sos[:, 2] = -1.0
+    sos[:, 3] = 1.0
+    sos[:, 4] = -2.0 * poles.real
+    sos[:, 5] = np.abs(poles) ** 2
+    # 各节平分中心频率处的增益
+    z = np.exp(-1j * 2 * np.arctan(np.sqrt(center2) / fs2))
+    gain = np.abs((1 - z * z) / (1 + sos[:, 4] * z + sos[:, 5] * z * z))
+    sos[:, 0] /= gain
+    sos[:, 2] /= gain
+    # 缓存的系数数组由多个滤波器共享，调用方不得修改
+    sos.flags.writeable = False
+    return sos
+
+
+def _state_space(sos):
+    """二阶节级联（转置直接II型）的状态空间矩阵A, B, C, D，每节两个状态"""
+    n = 2 * len(sos)
+    A = np.zeros((n, n))
+    B = np.zeros(n)
+    C = np.zeros(n)
+    D = 1.0
+    for i, (b0, b1, b2, _, a1, a2) in enumerate(sos):
+        k = 2 * i
+        # 本节输入 = 前面各节的输出 C·s + D·u
+        A[k, :k] = (b1 - a1 * b0) * C[:k]
+        A[k + 1, :k] = (b2 - a2 * b0) * C[:k]
+        A[k:k + 2, k:k + 2] = [[-a1, 1.0], [-a2, 0.0]]
+        B[k:k + 2] = [(b1 - a1 * b0) * D, (b2 - a2 * b0) * D]
+        C[:k] *= b0
+        C[k] = 1.0
+        D *= b0
+    return A, B, C, D
+
+
+@lru_cache(maxsize=32)
+def _block_matrices(sos_key, length):
+    """长度为length的块的滤波矩阵，按(系数, 块长)缓存
+
+    y = T·x + G·s，s' = P·s + K·x。T为冲激响应构成的下三角Toeplitz矩阵，
+    整块滤波只需几次矩阵乘法，不再逐样本递推。
+    """
+    sos = np.frombuffer(sos_key).reshape(-1, 6)
+    A, B, C, D = _state_space(sos)
+    n = len(B)
+    G = np.zeros((length, n))
+    impulse = np.zeros(length)
+    powers_b = np.zeros((length, n))   # A^k·B
+    power = np.eye(n)
+    for k in range(length):
+        G[k] = C @ power
+        powers_b[k] = power @ B
+        power = A @ power
+    impulse[0] = D
+    impulse[1:] = (G[:-1] @ B)
+    lag = np.subtract.outer(np.arange(length), np.arange(length))
+    T = np.where(lag >= 0, impulse[np.maximum(lag, 0)], 0.0)
+    K = powers_b[::-1].T.copy()
+    return T, G, power, K
+
+
+class SosFilter:
+    """流式二阶节级联滤波器，块之间保存状态
+
+    按块做矩阵运算，每块代价固定，与逐样本递推的结果一致（浮点误差内）；
+    长块拆成不超过max_chunk的小段，限制矩阵大小。
+    """
+
+    def __init__(self, sos, max_chunk=128):
+        self.sos = sos
+        self.max_chunk = max_chunk
+        self._key = np.ascontiguousarray(sos, dtype=np.float64).tobytes()
+        self.state = np.zeros(2 * len(sos))
+
+    def reset(self):
+        self.state[:] = 0.0
+
+    def process(self, block, out=None):
+        """滤波一块样本，out给出时写入out并返回"""
+        length = len(block)
+        if out is None:
+            out = np.zeros(length, dtype=np.float32)
+        for start in range(0, length, self.max_chunk):
+            chunk = block[start:start + self.max_chunk]
+            T, G, P, K = _block_matrices(self._key, len(chunk))
+            out[start:start + len(chunk)] = T @ chunk + G @ self.state
+            self.state = P @ self.state + K @ chunk
+        return out
+
+
+class BandpassFilter:
+    """流式CW带通滤波处理级
+
+    二阶节滤波器在块之间保存状态，块边界不产生瞬态。
+    重新调谐时取缓存的系数，用最近一段输入预热新滤波器的状态，
+    再在一个块内从旧滤波器输出淡入新滤波器输出，避免咔嗒声。
+    """
+
+    def __init__(self, sample_rate, center=700, bandwidth=150, order=4, history_time=0.05):
+        self.sample_rate = sample_rate
+        self.order = order
+        self.center = center
+        self.bandwidth = bandwidth
+        self._filter = SosFilter(design_bandpass(float(center), float(bandwidth), sample_rate, order))
+        self._history = np.zeros(max(1, int(sample_rate * history_time)), dtype=np.float32)
+        self._pending_tuning = None
+        self._output = np.zeros(0, dtype=np.float32)
+        self._fade = np.zeros(0, dtype=np.float32)
+
+    def retune(self, center=None, bandwidth=None):
+        """修改中心频率或带宽，在下一块处理时平滑切换"""
+        self._pending_tuning = (
+            center if center is not None else self.center,
+            bandwidth if bandwidth is not None else self.bandwidth,
+        )
+
+    def process(self, block):
+        """接收引擎处理级接口：返回滤波后的数据"""
+        length = len(block)
+        if len(self._output) != length:
+            self._output = np.zeros(length, dtype=np.float32)
+            self._fade = np.linspace(0.0, 1.0, length, dtype=np.float32)
+        output = self._output
+        if self._pending_tuning is not None:
+            tuning = self._pending_tuning
+            self._pending_tuning = None
+            if tuning != (self.center, self.bandwidth):
+                self._crossfade(output, block, *tuning)
+            else:
+                self._filter.process(block, output)
+        else:
+            self._filter.process(block, output)
+        # 保存最近的输入，供重新调谐时预热新滤波器
+        if length >= len(self._history):
+            self._history[:] = block[-len(self._history):]
+        else:
+            self._history[:-length] = self._history[length:]
+            self._history[-length:] = block
+        return output
+
+    def _crossfade(self, output, block, center, bandwidth):
+        """切换到新系数：新滤波器先在历史输入上预热，本块内线性淡入"""
+        old_output = self._filter.process(block)
+        self.center = center
+        self.bandwidth = bandwidth
+        self._filter = SosFilter(design_bandpass(float(center), float(bandwidth), self.sample_rate, self.order))
+        self._filter.process(self._history)
+        new_output = self._filter.process(block, output)
+        output[:] = old_output + self._fade * (new_output - old_output)
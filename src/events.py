@@ -0,0 +1,81 @@
+import queue
+import threading
+from tracing import trace
+
+class Signal:
+    """不依赖Qt的事件信号，在类中声明，用法与pyqtSignal相同
+
+        class Engine:
+            text_received = Signal(str)
+
+        engine.text_received.connect(callback)
+        engine.text_received.emit('CQ')
+
+    回调在调用emit的线程中同步执行；需要切换线程时由调用方处理
+    （例如连接到EventQueue，或经Qt适配器转发到界面线程）。
+    """
+
+    def __init__(self, *types):
+        self.types = types
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        bound = instance.__dict__.get(self.name)
+        if bound is None:
+            bound = instance.__dict__.setdefault(self.name, BoundSignal(self.name))
+        return bound
+
+
+class BoundSignal:
+    """某个对象上的信号实例，保存已连接的回调"""
+
+    def __init__(self, name):
+        self.name = name
+        self._callbacks = ()
+        self._lock = threading.Lock()
+
+    def connect(self, callback):
+        with self._lock:
+            self._callbacks = self._callbacks + (callback,)
+
+    def disconnect(self, callback=None):
+        """断开指定回调，不指定时断开全部"""
+        with self._lock:
+            if callback is None:
+                self._callbacks = ()
+            else:
+                self._callbacks = tuple(c for c in self._callbacks if c != callback)
+
+    def emit(self, *args):
+        # 回调列表整体替换，emit时无需加锁；单个回调出错不影响其他回调
+        for callback in self._callbacks:
+            try:
+                callback(*args)
+            except Exception:
+                trace.exception("事件 {} 的回调出错", self.name)
+
+
+class EventQueue:
+    """把一个对象上的若干信号汇集到线程安全队列中，队列元素为(信号名, 参数元组)"""
+
+    def __init__(self, source, names, maxsize=0):
+        self.queue = queue.Queue(maxsize)
+        for name in names:
+            getattr(source, name).connect(self._make_handler(name))
+
+    def _make_handler(self, name):
+        def handler(*args):
+            self.queue.put((name, args))
+        return handler
+
+    def get(self, timeout=None):
+        """取出下一个事件，超时返回None"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
@@ -0,0 +1,201 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+import numpy as np
+from scipy.io import wavfile
+from dsp import WorkBlocker, BandpassFilter, choose_working_rate
+from noise_reduction import NoiseReducer
+from tone_detector import ToneDetector
+from cw_decoder import CwDecoder
+
+BLOCK_SIZE = 4096          # 每次从文件读取的样本数
+SEGMENT_SECONDS = 120.0    # 多进程解码时每段的长度
+OVERLAP_SECONDS = 10.0     # 每段之前多处理的时长，用于门限和速度估计的预热
+TAIL_SECONDS = 5.0         # 每段之后多处理的时长，保证段尾的字符能输出
+SEAM_TOLERANCE = 1.0       # 接缝处两段的词间隔时间相差不超过此值（秒）时视为同一间隔
+
+
+def open_wav(path):
+    """以内存映射方式打开WAV文件，返回(采样率, 样本数组)，不把整个文件读入内存"""
+    sample_rate, data = wavfile.read(path, mmap=True)
+    return sample_rate, data
+
+
+def _to_float(chunk):
+    """把一段样本转换为单声道float32"""
+    if chunk.ndim > 1:
+        chunk = chunk.mean(axis=1)
+    if chunk.dtype == np.uint8:
+        return (chunk.astype(np.float32) - 128.0) / 128.0
+    if np.issubdtype(chunk.dtype, np.integer):
+        return chunk.astype(np.float32) / float(np.iinfo(chunk.dtype).max)
+    return chunk.astype(np.float32)
+
+
+class FileDecoder:
+    """单段音频的解码链：抽取 -> CW带通滤波 -> 弱信号增强 -> 音调检测 -> 解码，与实时接收一致
+
+    denoise为False时不做弱信号增强（对应界面中关闭该选项）。增强级的固定延迟从字符时间中扣除。
+    """
+
+    def __init__(self, sample_rate, frequency=700, bandwidth=150, audio_bandwidth=3000, wpm=20,
+                 denoise=True):
+        working_rate = choose_working_rate(audio_bandwidth, sample_rate)
+        self.blocker = WorkBlocker(sample_rate, working_rate, BLOCK_SIZE)
+        self.filter = BandpassFilter(working_rate, frequency, bandwidth)
+        self.reducer = NoiseReducer(working_rate) if denoise else None
+        self.delay = self.reducer.delay / working_rate if denoise else 0.0
+        self.detector = ToneDetector(working_rate, frequency, bandwidth)
+        self.decoder = CwDecoder(self.detector.envelope_rate, wpm=wpm)
+
+    def process(self, samples):
+        """处理一块float32样本，返回[(相对时间秒, 字符), ...]"""
+        output = []
+        for block in self.blocker.feed(samples):
+            block = self.filter.process(block)
+            if self.reducer is not None:
+                block = self.reducer.process(block)
+            envelope = self.detector.detect(block)
+            if len(envelope):
+                output += [(t - self.delay, char) for t, char in self.decoder.process(envelope)]
+        return output
+
+
+def decode_range(path, start, stop, keep_from=None, keep_until=None, **options):
+    """解码文件中[start, stop)样本范围，返回时间在[keep_from, keep_until)秒内的(时间秒, 字符)
+
+    按块从内存映射中读取，内存占用与文件长度无关。
+    """
+    sample_rate, data = open_wav(path)
+    decoder = FileDecoder(sample_rate, **options)
+    offset = start / sample_rate
+    result = []
+    for position in range(start, stop, BLOCK_SIZE):
+        chunk = _to_float(data[position:min(position + BLOCK_SIZE, stop)])
+        if len(chunk) < BLOCK_SIZE:
+            chunk = np.concatenate([chunk, np.zeros(BLOCK_SIZE - len(chunk), dtype=np.float32)])
+        result += decoder.process(chunk)
+    if stop == len(data):
+        # 文件结尾补一段静音，让最后一个字符和词间隔能够输出
+        silence = np.zeros(BLOCK_SIZE, dtype=np.float32)
+        for _ in range(int(TAIL_SECONDS * sample_rate / BLOCK_SIZE)):
+            result += decoder.process(silence)
+    return [(t + offset, char) for t, char in result
+            if (keep_from is None or t + offset >= keep_from)
+            and (keep_until is None or t + offset < keep_until)]
+
+
+def _decode_segment(job):
+    """进程池任务：解码一段（含前后重叠部分）"""
+    path, start, stop, keep_from, keep_until, options = job
+    return decode_range(path, start, stop, keep_from, keep_until, **options)
+
+
+def _stitch(previous, current, seam):
+    """拼接相邻两段在接缝附近的输出
+
+    两段在接缝前后都处理了同一段音频，各自都会输出接缝附近的字符。
+    在前一段中找接缝之后的第一个词间隔，在后一段中找到时间最接近的词间隔，
+    前一段保留到该词间隔为止，后一段从其后开始，避免字符重复或丢失；
+    找不到对应的词间隔时按接缝时刻切分。
+    """
+    for t, char in previous:
+        if char == ' ' and t >= seam:
+            matches = [i for i, (u, c) in enumerate(current)
+                       if c == ' ' and abs(u - t) <= SEAM_TOLERANCE]
+            if matches:
+                best = min(matches, key=lambda i: abs(current[i][0] - t))
+                return [item for item in previous if item[0] <= t], current[best + 1:]
+            break
+    return ([item for item in previous if item[0] < seam],
+            [item for item in current if item[0] >= seam])
+
+
+def decode_file(path, workers=None, on_text=None, on_progress=None, **options):
+    """解码整个WAV文件，返回(文本, 实时倍数)
+
+    长文件按段分配给多个进程并行解码，各段前后多处理一段重叠音频，
+    在接缝处按词间隔拼接。on_text(文本)按顺序收到已确定的文本，
+    on_progress(已完成比例)报告进度。
+    """
+    started = time.perf_counter()
+    sample_rate, data = open_wav(path)
+    total = len(data)
+    duration = total / sample_rate
+    del data
+    segment = int(SEGMENT_SECONDS * sample_rate)
+    overlap = int(OVERLAP_SECONDS * sample_rate)
+    tail = int(TAIL_SECONDS * sample_rate)
+    if workers is None:
+        workers = max(1, multiprocessing.cpu_count() - 1)
+
+    # 每段解码 [起点-重叠, 终点+尾部)，保留段内及接缝附近的字符供拼接
+    jobs = []
+    for start in range(0, total, segment):
+        stop = min(start + segment, total)
+        jobs.append((path, max(0, start - overlap), min(total, stop + tail),
+                     None if start == 0 else start / sample_rate - SEAM_TOLERANCE,
+                     None if stop == total else stop / sample_rate + TAIL_SECONDS, options))
+
+    text = []
+
+    def deliver(items):
+        chunk = ''.join(char for _, char in items)
+        if chunk:
+            text.append(chunk)
+            if on_text is not None:
+                on_text(chunk)
+
+    if workers > 1 and len(jobs) > 1:
+        pool = multiprocessing.Pool(workers)
+        results = pool.imap(_decode_segment, jobs)
+    else:
+        pool = None
+        results = map(_decode_segment, jobs)
+    try:
+        pending = None
+        for index, items in enumerate(results):
+            if pending is not None:
+                seam = index * segment / sample_rate
+                done, items = _stitch(pending, items, seam)
+                deliver(done)
+            pending = items
+            if on_progress is not None:
+                on_progress((index + 1) / len(jobs))
+        if pending:
+            deliver(pending)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    elapsed = time.perf_counter() - started
+    return ''.join(text), duration / max(elapsed, 1e-9)
+
+
+def main(argv=None):
+    """命令行入口：解码WAV文件并输出文本"""
+    parser = argparse.ArgumentParser(description="离线解码WAV录音中的CW信号")
+    parser.add_argument('path', help="WAV文件路径")
+    parser.add_argument('--frequency', type=float, default=700, help="CW频率(Hz)")
+    parser.add_argument('--bandwidth', type=float, default=150, help="CW截取带宽(Hz)")
+    parser.add_argument('--wpm', type=float, default=20, help="初始速度估计(WPM)")
+    parser.add_argument('--no-denoise', action='store_true', help="关闭弱信号增强")
+    parser.add_argument('--workers', type=int, default=None, help="解码进程数，默认为CPU核数-1")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.path):
+        print(f"文件不存在: {args.path}", file=sys.stderr)
+        return 1
+    _, speed = decode_file(
+        args.path, workers=args.workers,
+        on_text=lambda chunk: print(chunk, end='', flush=True),
+        frequency=args.frequency, bandwidth=args.bandwidth, wpm=args.wpm, denoise=not args.no_denoise
+    )
+    print()
+    print(f"解码速度: {speed:.1f} 倍实时", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,20 +1,53 @@
+import time
+_process_started = time.perf_counter()
 import sys
-import json
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QComboBox, QCheckBox, QPushButton, 
                             QLabel, QGroupBox, QTextEdit, QSpinBox, QDialog,
-                            QFormLayout, QDialogButtonBox, QLineEdit)
-from PyQt6.QtCore import Qt, QTimer, QObject, pyqtSignal
+                            QFormLayout, QDialogButtonBox, QLineEdit, QFileDialog)
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QTextCursor
-import pyqtgraph as pg
-import numpy as np
 from audio_manager import AudioManager
-import PyQt6.QtGui
+from morse_utils import MorseUtils
+from qt_adapter import qt_signals
+from config_store import ConfigStore
+from send_queue import SendQueue
+from tracing import trace
+# pyqtgraph和瀑布图在第一次需要绘制频谱时才导入（见 AutoMorseMainWindow._ensure_plots）
+
+class StartupProfiler:
+    """启动计时：记录各阶段距进程启动的耗时
+
+    以 --startup-time 启动时，窗口首次绘制且设备扫描完成后输出各阶段耗时并退出，
+    便于发现启动时间的退化。
+    """
+
+    STAGES = ('模块导入', '窗口创建', '首次绘制', '设备扫描完成')
+
+    def __init__(self):
+        self.enabled = False
+        self.marks = {}
+
+    def mark(self, stage):
+        if stage not in self.marks:
+            self.marks[stage] = time.perf_counter() - _process_started
+        if self.enabled and all(s in self.marks for s in self.STAGES):
+            self.report()
+            QApplication.instance().quit()
+
+    def report(self):
+        for stage in self.STAGES:
+            print(f"{stage}: {self.marks[stage] * 1000:.0f} ms", file=sys.stderr)
+
+
+startup = StartupProfiler()
+startup.mark('模块导入')
 
 class SettingsDialog(QDialog):
-    def __init__(self, audio_manager, parent=None):
+    def __init__(self, audio_manager, parent=None, waterfall_depth=300):
         super().__init__(parent)
         self.audio_manager = audio_manager
+        self.waterfall_depth_value = waterfall_depth
         self.setWindowTitle("音频设置")
         self.setup_ui()
 
@@ -39,6 +72,28 @@ class SettingsDialog(QDialog):
         self.cw_bandwidth.setValue(self.audio_manager.cw_bandwidth)
         layout.addRow("CW模式截取带宽 (Hz):", self.cw_bandwidth)
         
+        # 瀑布图历史深度设置
+        self.waterfall_depth = QSpinBox()
+        self.waterfall_depth.setRange(50, 2000)
+        self.waterfall_depth.setValue(self.waterfall_depth_value)
+        layout.addRow("瀑布图历史行数:", self.waterfall_depth)
+        
+        # 监听延迟设置
+        self.monitor_latency = QSpinBox()
+        self.monitor_latency.setRange(5, 200)
+        self.monitor_latency.setValue(self.audio_manager.monitor_latency)
+        layout.addRow("监听延迟目标 (ms):", self.monitor_latency)
+        
+        # 低CPU模式设置
+        self.low_cpu_mode = QCheckBox("仅检测CW频率附近的音调，不计算频谱")
+        self.low_cpu_mode.setChecked(self.audio_manager.low_cpu_mode)
+        layout.addRow("低CPU模式:", self.low_cpu_mode)
+        
+        # 弱信号增强设置
+        self.noise_reduction = QCheckBox("对CW通带降噪，解码和监听都使用增强后的信号")
+        self.noise_reduction.setChecked(self.audio_manager.noise_reduction)
+        layout.addRow("弱信号增强:", self.noise_reduction)
+        
         # 按钮
         buttons = QDialogButtonBox(
             QDialogButtonBox.StandardButton.Ok | 
@@ -54,19 +109,42 @@ class SettingsDialog(QDialog):
         return {
             'audio_bandwidth': self.audio_bandwidth.value(),
             'cw_frequency': self.cw_frequency.value(),
-            'cw_bandwidth': self.cw_bandwidth.value()
+            'cw_bandwidth': self.cw_bandwidth.value(),
+            'waterfall_depth': self.waterfall_depth.value(),
+            'monitor_latency': self.monitor_latency.value(),
+            'low_cpu_mode': self.low_cpu_mode.isChecked(),
+            'noise_reduction': self.noise_reduction.isChecked()
         }
 
 class AutoMorseMainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.audio_manager = AudioManager()
+        # 引擎事件经Qt适配器转发到界面线程
+        self.audio_signals = qt_signals(self.audio_manager, self)
         # 连接测试完成信号
-        self.audio_manager.test_completed.connect(self.on_test_completed)
+        self.audio_signals.test_completed.connect(self.on_test_completed)
         # 连接发送完成信号
-        self.audio_manager.send_completed.connect(self.on_send_completed)
+        self.audio_signals.send_completed.connect(self.on_send_completed)
         # 连接发送单个字符完成信号
-        self.audio_manager.character_sent.connect(self.on_character_sent)
+        self.audio_signals.character_sent.connect(self.on_character_sent)
+        # 连接接收缓冲区溢出信号
+        self.audio_signals.receive_overrun.connect(self.on_receive_overrun)
+        # 连接频谱帧信号
+        self.audio_signals.spectrum_ready.connect(self.on_spectrum_ready)
+        # 连接解码文本信号
+        self.audio_signals.text_received.connect(self.on_text_received)
+        self.audio_signals.skimmer_text.connect(self.on_skimmer_text)
+        # 连接音频文件解码信号
+        self.audio_signals.file_decode_text.connect(self.on_file_decode_text)
+        self.audio_signals.file_decode_progress.connect(self.on_file_decode_progress)
+        self.audio_signals.file_decode_finished.connect(self.on_file_decode_finished)
+        # 连接自动测速信号
+        self.audio_signals.receive_speed_changed.connect(self.on_receive_speed_estimated)
+        # 连接设备扫描完成信号
+        self.audio_signals.devices_ready.connect(self.on_devices_ready)
+        # 多信号解码时各载波的文本：频率 -> 文本
+        self.skimmer_lines = {}
         self.setWindowTitle("AutoMorse - CW自动收发系统")
         self.setGeometry(100, 100, 1200, 800)
         
@@ -76,11 +154,22 @@ class AutoMorseMainWindow(QMainWindow):
         self.auto_send_timer.setSingleShot(True) # 只触发一次
         self.auto_send_timer.timeout.connect(self.trigger_auto_send)
         
+        # 监听时每秒检查一次欠载/溢出次数，有变化时在状态栏提示
+        self.monitor_timer = QTimer(self)
+        self.monitor_timer.setInterval(1000)
+        self.monitor_timer.timeout.connect(self.check_monitor_stats)
+        self._monitor_xruns = 0
+        self._restore_monitor = True   # 首次设备扫描完成后按配置打开监听
+        
         # 自动发送模式标志
         self.is_auto_sending_active = False
         
-        # 已发送的文本（用于自动发送时比较）
-        self.sent_text_content = ""
+        # 发送文本框中已交给发送的前缀长度，及其后尚未发送的字符队列
+        self.send_queue = SendQueue()
+        self._send_length = 0            # 发送文本框当前的字符数
+        self._fixing_send_text = False   # 正在修正插入的文本，忽略由此产生的变化
+        # 发送文本框允许输入的字符：可编码的字符、空白和程序信号的尖括号
+        self.sendable_chars = set(MorseUtils.MORSE_CODE) | set(' \n<>')
         
         # 创建主窗口部件
         main_widget = QWidget()
@@ -141,6 +230,10 @@ class AutoMorseMainWindow(QMainWindow):
         self.test_tone_btn = QPushButton("测试音频")
         self.test_tone_btn.clicked.connect(self.toggle_test_tone)
         test_layout.addWidget(self.test_tone_btn)
+        self.refresh_devices_btn = QPushButton("刷新设备")
+        self.refresh_devices_btn.setToolTip("重新扫描音频设备（插拔声卡后使用）")
+        self.refresh_devices_btn.clicked.connect(self.on_refresh_devices_clicked)
+        test_layout.addWidget(self.refresh_devices_btn)
         audio_layout.addLayout(test_layout)
         
         # 音频参数设置按钮
@@ -175,21 +268,26 @@ class AutoMorseMainWindow(QMainWindow):
         right_layout = QVBoxLayout()
         right_panel.setLayout(right_layout)
         
-        # 频谱图
+        # 频谱图和瀑布图先显示占位标签，收到第一帧频谱时再创建绘图控件
         spectrum_group = QGroupBox("频谱图")
-        spectrum_layout = QVBoxLayout()
-        self.spectrum_plot = pg.PlotWidget()
-        spectrum_layout.addWidget(self.spectrum_plot)
-        spectrum_group.setLayout(spectrum_layout)
-        right_layout.addWidget(spectrum_group)
+        self.spectrum_layout = QVBoxLayout()
+        self.spectrum_placeholder = QLabel("开始接收后显示频谱")
+        self.spectrum_placeholder.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.spectrum_layout.addWidget(self.spectrum_placeholder)
+        spectrum_group.setLayout(self.spectrum_layout)
+        right_layout.addWidget(spectrum_group, stretch=1)
+        self.spectrum_plot = None
         
         # 瀑布图
         waterfall_group = QGroupBox("瀑布图")
-        waterfall_layout = QVBoxLayout()
-        self.waterfall_plot = pg.PlotWidget()
-        waterfall_layout.addWidget(self.waterfall_plot)
-        waterfall_group.setLayout(waterfall_layout)
-        right_layout.addWidget(waterfall_group)
+        self.waterfall_layout = QVBoxLayout()
+        self.waterfall_placeholder = QLabel("开始接收后显示瀑布图")
+        self.waterfall_placeholder.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.waterfall_layout.addWidget(self.waterfall_placeholder)
+        waterfall_group.setLayout(self.waterfall_layout)
+        right_layout.addWidget(waterfall_group, stretch=1)
+        self.waterfall = None
+        self.waterfall_depth = 300  # 瀑布图历史行数，瀑布图创建前也可修改
         
         # CW信息显示区域
         cw_group = QGroupBox("CW信息")
@@ -232,8 +330,8 @@ class AutoMorseMainWindow(QMainWindow):
         send_label_layout.addStretch()
         send_layout.addLayout(send_label_layout)
         self.send_text = QTextEdit() # 这是待发送信息文本框
-        # 连接 textChanged 信号
-        self.send_text.textChanged.connect(self.on_send_text_changed)
+        # 只处理每次变化的区间
+        self.send_text.document().contentsChange.connect(self.on_send_contents_change)
         send_layout.addWidget(self.send_text)
         # 将发送信息布局添加到主CW布局
         cw_layout.addLayout(send_layout)
@@ -253,14 +351,20 @@ class AutoMorseMainWindow(QMainWindow):
         # 控制按钮
         control_layout = QHBoxLayout()
         self.start_receive_btn = QPushButton("开始接收")
+        self.decode_file_btn = QPushButton("解码文件")
+        self.decode_file_btn.setToolTip("离线解码WAV录音文件")
         self.send_btn = QPushButton("发送")
+        self.skimmer_cb = QCheckBox("多信号解码")
+        self.skimmer_cb.setToolTip("在整个音频采集带宽内自动发现并分别解码多个CW信号")
         self.auto_send_cb = QCheckBox("自动发送")
         self.local_log_cb = QCheckBox("本地日志")
         self.remote_log_cb = QCheckBox("远程日志")
         self.settings_btn = QPushButton("设置")
         
         control_layout.addWidget(self.start_receive_btn)
+        control_layout.addWidget(self.decode_file_btn)
         control_layout.addWidget(self.send_btn)
+        control_layout.addWidget(self.skimmer_cb)
         control_layout.addWidget(self.auto_send_cb)
         control_layout.addWidget(self.local_log_cb)
         control_layout.addWidget(self.remote_log_cb)
@@ -273,31 +377,77 @@ class AutoMorseMainWindow(QMainWindow):
         # 添加右侧面板到主布局
         layout.addWidget(right_panel, stretch=2)
         
-        # 初始化音频设备
-        self.init_audio_devices()
-        
-        # 加载配置
+        # 加载配置：修改在后台合并后写入
+        self.config_store = ConfigStore('config.json')
         self.load_config()
         
         # 连接信号
         self.connect_signals()
         
-    def init_audio_devices(self):
-        """初始化音频设备列表"""
-        input_devices, output_devices = self.audio_manager.get_audio_devices()
-        
-        # 清空并添加输入设备
-        self.input_device.clear()
+        # 音频设备在后台枚举，不阻塞窗口显示
+        self.statusBar().showMessage("正在扫描音频设备...")
+        self.audio_manager.scan_devices_async()
+        startup.mark('窗口创建')
+        
+    def on_devices_ready(self, input_devices, output_devices):
+        """后台设备扫描完成：填充设备列表并选中配置中的设备"""
+        combos = (self.input_device, self.output_device, self.monitor_device)
+        for combo in combos:
+            # 填充列表时不触发设备切换
+            combo.blockSignals(True)
+            combo.clear()
         for device in input_devices:
             self.input_device.addItem(device['name'], device['index'])
-            
-        # 清空并添加输出设备
-        self.output_device.clear()
-        self.monitor_device.clear()
         for device in output_devices:
             self.output_device.addItem(device['name'], device['index'])
             self.monitor_device.addItem(device['name'], device['index'])
-            
+        selected = (self.audio_manager.input_device, self.audio_manager.output_device,
+                    self.audio_manager.monitor_device)
+        for combo, device in zip(combos, selected):
+            if device is not None:
+                index = combo.findData(device)
+                if index >= 0:
+                    combo.setCurrentIndex(index)
+            combo.blockSignals(False)
+        self.statusBar().showMessage(f"找到 {len(input_devices)} 个输入设备，{len(output_devices)} 个输出设备", 3000)
+        if self._restore_monitor:
+            # 首次扫描完成：按配置打开接收监听
+            self._restore_monitor = False
+            if self.monitor_audio.isChecked():
+                self.on_monitor_audio_changed(Qt.CheckState.Checked.value)
+        startup.mark('设备扫描完成')
+        
+    def on_refresh_devices_clicked(self):
+        """手动重新扫描音频设备"""
+        try:
+            refreshed = self.audio_manager.refresh_devices()
+        except Exception as e:
+            trace.error("刷新音频设备失败: {}", e)
+            self.statusBar().showMessage(f"刷新音频设备失败: {e}")
+            return
+        if not refreshed:
+            self.statusBar().showMessage("正在使用音频设备，请停止接收、发送和测试后再刷新")
+        
+    def _ensure_plots(self):
+        """第一次需要时导入pyqtgraph并创建频谱图和瀑布图"""
+        if self.spectrum_plot is not None:
+            return
+        import pyqtgraph as pg
+        from waterfall import WaterfallView
+        self.spectrum_plot = pg.PlotWidget()
+        self.spectrum_plot.setLabel('bottom', "频率", units='Hz')
+        self.spectrum_plot.setLabel('left', "电平", units='dB')
+        self.spectrum_plot.setYRange(-120, 0)
+        self.spectrum_curve = self.spectrum_plot.plot(pen='y')
+        self.spectrum_layout.replaceWidget(self.spectrum_placeholder, self.spectrum_plot)
+        self.spectrum_placeholder.deleteLater()
+        self.waterfall_plot = pg.PlotWidget()
+        self.waterfall = WaterfallView(self.waterfall_plot, depth=self.waterfall_depth)
+        # 每帧FFT结果直接写入瀑布图循环缓冲区，界面按自己的刷新率显示
+        self.audio_manager.spectrum_engine.row_listeners.append(self.waterfall.buffer.push_row)
+        self.waterfall_layout.replaceWidget(self.waterfall_placeholder, self.waterfall_plot)
+        self.waterfall_placeholder.deleteLater()
+        
     def connect_signals(self):
         """连接信号和槽"""
         self.input_device.currentIndexChanged.connect(self.on_input_device_changed)
@@ -305,11 +455,23 @@ class AutoMorseMainWindow(QMainWindow):
         self.monitor_device.currentIndexChanged.connect(self.on_monitor_device_changed)
         self.monitor_audio.stateChanged.connect(self.on_monitor_audio_changed)
         self.receive_speed_auto_cb.stateChanged.connect(self.on_receive_speed_auto_changed)
+        self.receive_speed_spin.valueChanged.connect(self.on_receive_speed_changed)
+        self.start_receive_btn.clicked.connect(self.toggle_receive)
+        self.decode_file_btn.clicked.connect(self.on_decode_file_clicked)
+        self.skimmer_cb.stateChanged.connect(self.on_skimmer_mode_changed)
         self.send_btn.clicked.connect(self.on_send_btn_clicked)
+        self.send_speed_spin.valueChanged.connect(self.on_send_speed_changed)
         self.callsign_edit.textChanged.connect(self.save_config)
         self.grid_edit.textChanged.connect(self.save_config)
-        self.test_tone_btn.clicked.connect(self.toggle_test_tone)
         
+    def closeEvent(self, event):
+        """关闭窗口时停止接收并释放常驻音频流"""
+        self.audio_manager.stop_receiving()
+        self.audio_manager.close_output_streams()
+        # 写出尚未保存的配置
+        self.config_store.close()
+        super().closeEvent(event)
+
     def on_input_device_changed(self, index):
         """输入设备改变时的处理"""
         device_index = self.input_device.currentData()
@@ -330,86 +492,96 @@ class AutoMorseMainWindow(QMainWindow):
         
     def on_monitor_audio_changed(self, state):
         """监听音频状态改变时的处理"""
-        if state == Qt.CheckState.Checked.value:
-            # TODO: 实现音频监听功能
-            pass
+        enabled = state == Qt.CheckState.Checked.value
+        if not self.audio_manager.set_monitor_audio(enabled):
+            self.statusBar().showMessage("监听设备与输出设备相同，请选择其他监听设备", 5000)
+        if enabled:
+            self.monitor_timer.start()
         else:
-            # TODO: 停止音频监听
-            pass
+            self.monitor_timer.stop()
+        self.save_config()
+
+    def check_monitor_stats(self):
+        """监听欠载或溢出次数增加时在状态栏提示"""
+        stats = self.audio_manager.get_monitor_stats()
+        xruns = stats['underruns'] + stats['overruns']
+        if xruns != self._monitor_xruns and self.audio_manager.is_receiving:
+            self._monitor_xruns = xruns
+            self.statusBar().showMessage(
+                f"监听延迟 {stats['latency_ms']:.0f} ms，欠载 {stats['underruns']} 次，"
+                f"溢出 {stats['overruns']} 次", 3000)
             
     def toggle_test_tone(self):
         """切换测试音频的播放状态"""
-        print(f"toggle_test_tone: is_testing = {self.audio_manager.is_testing}")  # 调试信息
+        trace.debug("toggle_test_tone: is_testing = {}", self.audio_manager.is_testing)
         if not self.audio_manager.is_testing:
             # 开始测试
             wpm = self.send_speed_spin.value() # 测试音频使用发送速度
             freq = self.audio_manager.cw_frequency
-            print(f"开始测试音频: freq={freq}, wpm={wpm}")  # 调试信息
-            # 先更新按钮状态，再开始播放
-            self.update_test_button_state(True)
-            # 使用QTimer延迟调用play_test_tone，避免按钮状态更新和音频播放的竞争
-            QTimer.singleShot(50, lambda: self.audio_manager.play_test_tone(freq, wpm))
+            trace.debug("开始测试音频: freq={}, wpm={}", freq, wpm)
+            # play_test_tone只向音频引擎提交任务，立即返回；正在发送时不会开始测试
+            self.audio_manager.play_test_tone(freq, wpm)
+            self.update_test_button_state(self.audio_manager.is_testing)
         else:
             # 停止测试
-            print("停止测试音频")  # 调试信息
-            # 先更新按钮状态，再停止播放
+            trace.debug("停止测试音频")
+            self.audio_manager.stop_test_tone()
             self.update_test_button_state(False)
-            # 使用QTimer延迟调用stop_test_tone，确保按钮状态已更新
-            QTimer.singleShot(50, self.audio_manager.stop_test_tone)
 
     def show_audio_settings(self):
         """显示音频参数设置对话框"""
-        dialog = SettingsDialog(self.audio_manager, self)
+        dialog = SettingsDialog(self.audio_manager, self, self.waterfall_depth)
         if dialog.exec() == QDialog.DialogCode.Accepted:
             settings = dialog.get_settings()
             self.audio_manager.set_audio_bandwidth(settings['audio_bandwidth'])
             self.audio_manager.set_cw_frequency(settings['cw_frequency'])
             self.audio_manager.set_cw_bandwidth(settings['cw_bandwidth'])
+            self.audio_manager.set_low_cpu_mode(settings['low_cpu_mode'])
+            self.audio_manager.set_noise_reduction(settings['noise_reduction'])
+            self.audio_manager.set_monitor_latency(settings['monitor_latency'])
+            if settings['waterfall_depth'] != self.waterfall_depth:
+                self.set_waterfall_depth(settings['waterfall_depth'])
             self.save_config()
         
     def load_config(self):
         """加载配置"""
-        try:
-            with open('config.json', 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                self.audio_manager.load_settings(config)
-                # 设置设备选择
-                if config.get('input_device') is not None:
-                    index = self.input_device.findData(config['input_device'])
-                    if index >= 0:
-                        self.input_device.setCurrentIndex(index)
-                if config.get('output_device') is not None:
-                    index = self.output_device.findData(config['output_device'])
-                    if index >= 0:
-                        self.output_device.setCurrentIndex(index)
-                if config.get('monitor_device') is not None:
-                    index = self.monitor_device.findData(config['monitor_device'])
-                    if index >= 0:
-                        self.monitor_device.setCurrentIndex(index)
-                self.monitor_audio.setChecked(config.get('monitor_audio', False))
-                self.auto_send_cb.setChecked(config.get('auto_send', False))
-                self.local_log_cb.setChecked(config.get('local_log', False))
-                self.remote_log_cb.setChecked(config.get('remote_log', False))
-                # 加载速度设置
-                self.receive_speed_spin.setValue(config.get('receive_cw_speed', 26))
-                self.receive_speed_auto_cb.setChecked(config.get('receive_cw_speed_auto', True))
-                self.send_speed_spin.setValue(config.get('send_cw_speed', 26))
-                # 加载常规设置
-                self.callsign_edit.setText(config.get('callsign', ''))
-                self.grid_edit.setText(config.get('grid', ''))
-        except FileNotFoundError:
+        config = self.config_store.load()
+        if config is None:
             # 如果配置文件不存在，创建默认配置
             self.save_config()
+            return
+        # 设备选择在设备扫描完成后按audio_manager中的设置恢复
+        self.audio_manager.load_settings(config)
+        # 此时信号尚未连接、设备尚未解析，监听在首次设备扫描完成后应用（见on_devices_ready）
+        self.monitor_audio.setChecked(config.get('monitor_audio', False))
+        self.auto_send_cb.setChecked(config.get('auto_send', False))
+        self.local_log_cb.setChecked(config.get('local_log', False))
+        self.remote_log_cb.setChecked(config.get('remote_log', False))
+        self.skimmer_cb.setChecked(config.get('skimmer_mode', False))
+        # 加载速度设置
+        self.receive_speed_spin.setValue(config.get('receive_cw_speed', 26))
+        self.receive_speed_auto_cb.setChecked(config.get('receive_cw_speed_auto', True))
+        self.receive_speed_spin.setEnabled(not self.receive_speed_auto_cb.isChecked())
+        self.send_speed_spin.setValue(config.get('send_cw_speed', 26))
+        # 加载常规设置
+        self.callsign_edit.setText(config.get('callsign', ''))
+        self.grid_edit.setText(config.get('grid', ''))
+        # 加载瀑布图设置
+        self.set_waterfall_depth(config.get('waterfall_depth', 300))
     
     def save_config(self):
         """保存配置"""
         config = {
-            'input_device': self.audio_manager.input_device,
-            'output_device': self.audio_manager.output_device,
-            'monitor_device': self.audio_manager.monitor_device,
+            'input_device': self.audio_manager.device_identity('input'),
+            'output_device': self.audio_manager.device_identity('output'),
+            'monitor_device': self.audio_manager.device_identity('monitor'),
             'audio_bandwidth': self.audio_manager.audio_bandwidth,
             'cw_frequency': self.audio_manager.cw_frequency,
             'cw_bandwidth': self.audio_manager.cw_bandwidth,
+            'low_cpu_mode': self.audio_manager.low_cpu_mode,
+            'monitor_latency': self.audio_manager.monitor_latency,
+            'noise_reduction': self.audio_manager.noise_reduction,
+            'skimmer_mode': self.audio_manager.skimmer_mode,
             'monitor_audio': self.monitor_audio.isChecked(),
             'auto_send': self.auto_send_cb.isChecked(),
             'local_log': self.local_log_cb.isChecked(),
@@ -420,40 +592,143 @@ class AutoMorseMainWindow(QMainWindow):
             'send_cw_speed': self.send_speed_spin.value(),
             # 常规设置
             'callsign': self.callsign_edit.text(),
-            'grid': self.grid_edit.text()
+            'grid': self.grid_edit.text(),
+            # 瀑布图设置
+            'waterfall_depth': self.waterfall_depth
         }
         
-        with open('config.json', 'w', encoding='utf-8') as f:
-            json.dump(config, f, ensure_ascii=False, indent=4)
+        self.config_store.save(config)
+
+    def set_waterfall_depth(self, depth):
+        """修改瀑布图历史行数"""
+        self.waterfall_depth = depth
+        if self.waterfall is not None:
+            self.waterfall.set_depth(depth)
 
     def on_receive_speed_auto_changed(self, state):
         if state == Qt.CheckState.Checked.value:
             self.receive_speed_spin.setEnabled(False)
+            self.audio_manager.set_receive_speed_auto(True)
         else:
             self.receive_speed_spin.setEnabled(True)
+            self.audio_manager.set_receive_speed(self.receive_speed_spin.value())
+            self.audio_manager.set_receive_speed_auto(False)
+        self.save_config()
+
+    def on_receive_speed_changed(self, wpm):
+        """手动修改接收速度"""
+        if not self.receive_speed_auto_cb.isChecked():
+            self.audio_manager.set_receive_speed(wpm)
+            self.save_config()
+
+    def on_receive_speed_estimated(self, wpm):
+        """自动模式下显示估计的接收速度"""
+        if self.receive_speed_auto_cb.isChecked():
+            # 只更新显示，不触发手动修改的处理
+            self.receive_speed_spin.blockSignals(True)
+            self.receive_speed_spin.setValue(wpm)
+            self.receive_speed_spin.blockSignals(False)
+
+    def toggle_receive(self):
+        """切换接收状态"""
+        if not self.audio_manager.is_receiving:
+            try:
+                self.audio_manager.start_receiving()
+            except Exception as e:
+                trace.error("开始接收失败: {}", e)
+                self.statusBar().showMessage(f"开始接收失败: {e}")
+                return
+            self.start_receive_btn.setText("停止接收")
+            self.statusBar().showMessage("正在接收")
+        else:
+            self.audio_manager.stop_receiving()
+            self.start_receive_btn.setText("开始接收")
+            self.statusBar().showMessage("已停止接收")
+
+    def on_decode_file_clicked(self):
+        """选择WAV文件并在后台解码，结果追加到接收窗口"""
+        if self.audio_manager.is_decoding_file:
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "选择音频文件", "", "WAV文件 (*.wav)")
+        if not path:
+            return
+        self.decode_file_btn.setEnabled(False)
+        self.statusBar().showMessage(f"正在解码: {path}")
+        self.audio_manager.start_file_decode(path)
+
+    def on_file_decode_text(self, text):
+        self.receive_text.moveCursor(QTextCursor.MoveOperation.End)
+        self.receive_text.insertPlainText(text)
+
+    def on_file_decode_progress(self, progress):
+        self.statusBar().showMessage(f"正在解码音频文件: {progress:.0%}")
+
+    def on_file_decode_finished(self, speed):
+        self.decode_file_btn.setEnabled(True)
+        if speed > 0:
+            self.statusBar().showMessage(f"音频文件解码完成，速度为实时的 {speed:.1f} 倍")
+        else:
+            self.statusBar().showMessage("音频文件解码失败")
+
+    def on_receive_overrun(self, count):
+        """接收处理跟不上输入时在状态栏提示"""
+        self.statusBar().showMessage(f"接收缓冲区溢出 {count} 次，处理速度跟不上音频输入")
+
+    def on_text_received(self, text):
+        """在接收窗口追加CW频率上解码出的文本"""
+        if self.audio_manager.skimmer_mode:
+            return
+        self.receive_text.moveCursor(QTextCursor.MoveOperation.End)
+        self.receive_text.insertPlainText(text)
+
+    def on_skimmer_text(self, frequency, text):
+        """多信号解码：每个载波一行，分别显示"""
+        line = self.skimmer_lines.get(frequency, '') + text
+        self.skimmer_lines[frequency] = line[-80:]
+        self.receive_text.setPlainText('\n'.join(
+            f"{freq:6.0f} Hz: {self.skimmer_lines[freq]}" for freq in sorted(self.skimmer_lines)
+        ))
+
+    def on_skimmer_mode_changed(self, state):
+        """切换多信号解码模式"""
+        enabled = state == Qt.CheckState.Checked.value
+        self.skimmer_lines = {}
+        self.receive_text.clear()
+        self.audio_manager.set_skimmer_mode(enabled)
+        self.save_config()
+
+    def on_spectrum_ready(self, frequencies, power):
+        """绘制接收引擎送来的频谱帧"""
+        if self.spectrum_plot is None:
+            self._ensure_plots()
+            self.waterfall.buffer.push_row(power)
+        self.spectrum_curve.setData(frequencies, power)
+        self.waterfall.set_frequency_span(float(frequencies[-1]))
+
+    def on_send_speed_changed(self, wpm):
+        """发送速度改变时的处理"""
+        self.audio_manager.set_send_cw_speed(wpm)
         self.save_config()
 
     def on_send_btn_clicked(self):
         """点击发送按钮，根据状态切换发送/停止"""
-        print(f"on_send_btn_clicked: is_sending = {self.audio_manager.is_sending}, is_auto_sending_active = {self.is_auto_sending_active}") # 调试信息
-        
         if not self.audio_manager.is_sending and not self.is_auto_sending_active:
             # 如果当前不在发送状态且不在自动发送模式，则开始新的发送并进入自动发送模式
-            print("开始手动发送并进入自动发送模式") # 调试信息
             self.is_auto_sending_active = True
             self.update_send_button_state(True)
             # 清空已发信息文本框
             self.sent_text.clear()
-            self.sent_text_content = "" # 清空已发送文本记录
             text = self.send_text.toPlainText()
+            # 整段文本交给发送（末尾未输入完整的程序信号除外），此后新输入的字符进入待发送队列
+            send, count = self.audio_manager.morse_utils.prepare_send(text)
+            self.send_queue.reset(count, text[count:])
             wpm = self.send_speed_spin.value()
             freq = self.audio_manager.cw_frequency
             # 直接调用send_cw，它会按字符发送并发出信号
-            self.audio_manager.send_cw(text, freq, wpm)
+            self.audio_manager.send_cw(send, freq, wpm)
             
         elif self.audio_manager.is_sending or self.is_auto_sending_active:
              # 如果当前正在发送或在自动发送模式，则停止发送并退出自动发送模式
-             print("停止发送并退出自动发送模式") # 调试信息
              self.is_auto_sending_active = False
              self.auto_send_timer.stop() # 停止自动发送定时器
              self.audio_manager.stop_sending_cw()
@@ -461,7 +736,7 @@ class AutoMorseMainWindow(QMainWindow):
 
     def update_send_button_state(self, is_sending):
         """更新发送按钮的状态和颜色"""
-        print(f"update_send_button_state: is_sending = {is_sending}") # 调试信息
+        trace.debug("update_send_button_state: is_sending = {}", is_sending)
         if is_sending:
             self.send_btn.setText("停止发送")
             # 设置按钮样式，包括hover状态
@@ -475,12 +750,12 @@ class AutoMorseMainWindow(QMainWindow):
                 }
             """)
             self.send_btn.setEnabled(True) # 确保按钮是启用的
-            print("按钮已更新为停止发送状态") # 调试信息
+            trace.debug("按钮已更新为停止发送状态")
         else:
             self.send_btn.setText("发送")
             self.send_btn.setStyleSheet("") # 恢复默认样式
             self.send_btn.setEnabled(True) # 确保按钮是启用的
-            print("按钮已更新为发送状态") # 调试信息
+            trace.debug("按钮已更新为发送状态")
 
         # 同时检查测试音频按钮的状态，避免两个按钮都是红色
         if not is_sending and not self.audio_manager.is_testing:
@@ -489,7 +764,7 @@ class AutoMorseMainWindow(QMainWindow):
 
     def update_test_button_state(self, is_testing):
         """更新测试音频按钮的状态和颜色"""
-        print(f"update_test_button_state: is_testing = {is_testing}")  # 调试信息
+        trace.debug("update_test_button_state: is_testing = {}", is_testing)
         if is_testing:
             self.test_tone_btn.setText("停止测试")
             # 设置按钮样式，包括hover状态，使用更具体的选择器和!important
@@ -503,12 +778,12 @@ class AutoMorseMainWindow(QMainWindow):
                 }
             """)
             self.test_tone_btn.setEnabled(True) # 确保按钮是启用的
-            print("按钮已更新为停止测试状态")  # 调试信息
+            trace.debug("按钮已更新为停止测试状态")
         else:
             self.test_tone_btn.setText("测试音频")
             self.test_tone_btn.setStyleSheet("") # 恢复默认样式
             self.test_tone_btn.setEnabled(True) # 确保按钮是启用的
-            print("按钮已更新为测试音频状态")  # 调试信息
+            trace.debug("按钮已更新为测试音频状态")
         # 同时检查发送按钮的状态，避免两个按钮都是红色
         if not is_testing and not self.audio_manager.is_sending:
             self.send_btn.setStyleSheet("")
@@ -516,103 +791,87 @@ class AutoMorseMainWindow(QMainWindow):
 
     def on_send_completed(self):
         """发送音频播放完成的处理函数"""
-        print("收到发送完成信号")  # 调试信息
-        print(f"on_send_completed: before check is_auto_sending_active={self.is_auto_sending_active}") # 新增调试信息
-        # 发送完成后，如果自动发送模式仍然开启，则等待新的文本输入触发自动发送
-        if self.is_auto_sending_active:
-            print("发送完成，自动发送模式开启，等待新的文本") # 调试信息
-        else:
-            # 如果自动发送模式已关闭（用户点击了停止按钮），则不做额外操作，按钮状态已更新
-            print("发送完成，自动发送模式已关闭") # 调试信息
-        print(f"on_send_completed: after check is_auto_sending_active={self.is_auto_sending_active}") # 新增调试信息
+        # 发送期间输入的字符留在队列中，发送完成后继续发送；
+        # 自动发送模式已关闭（用户点击了停止按钮）时不做额外操作，按钮状态已更新
+        if self.is_auto_sending_active and self.send_queue:
+            self.auto_send_timer.start()
 
     def on_test_completed(self):
         """测试音频播放完成的处理函数"""
-        print("收到测试完成信号")  # 调试信息
+        trace.debug("收到测试完成信号")
         self.update_test_button_state(False)
 
-    def on_send_text_changed(self):
-        """发送文本框内容改变时的处理"""
-        print("on_send_text_changed triggered") # 调试信息
-        try:
-            print("Getting cursor") # 调试信息
-            cursor = self.send_text.textCursor()
-            print("Moving cursor to end") # 调试信息
-            cursor.movePosition(PyQt6.QtGui.QTextCursor.MoveMode.End)
-            self.send_text.setTextCursor(cursor) # 立即设置光标位置
-            print("Getting plain text") # 调试信息
-            text = self.send_text.toPlainText()
-            print(f"Original text: {text}") # 调试信息
-            
-            print("Starting filtering loop") # 调试信息
-            filtered_chars = []
-            for c in text:
-                if c.isalnum() or c.isspace():
-                    filtered_chars.append(c.upper())
-            filtered_text = "".join(filtered_chars)
-            print("Filtering loop finished") # 调试信息
-            print(f"Filtered text: {filtered_text}") # 调试信息
-            
-            if filtered_text != text:
-                print("Text needs update") # 调试信息
-                self.send_text.blockSignals(True) # 阻止信号，避免无限循环
-                self.send_text.setText(filtered_text)
-                # 恢复光标位置
-                new_cursor = self.send_text.textCursor()
-                new_cursor.movePosition(PyQt6.QtGui.QTextCursor.MoveMode.End)
-                self.send_text.setTextCursor(new_cursor)
-                self.send_text.blockSignals(False)
-            else:
-                print("Text is already correct") # 调试信息
-            
-            # 如果自动发送模式开启且有新内容需要发送，则启动延迟发送
-            # 判断新内容：当前文本框内容长度 > 已发送文本记录长度
-            if self.is_auto_sending_active and len(filtered_text) > len(self.sent_text_content):
-                 print("文本改变，自动发送模式开启，有新内容，启动定时器") # 调试信息
-                 self.auto_send_timer.start() # 启动或重置定时器
-            elif not filtered_text.strip():
-                # 如果文本清空，停止定时器并退出自动发送模式（如果开启）
-                if self.is_auto_sending_active:
-                     print("文本清空，退出自动发送模式") # 调试信息
-                     self.is_auto_sending_active = False
-                     self.auto_send_timer.stop()
-                     if self.send_btn.text() == "停止发送":
-                          self.update_send_button_state(False)
-        except Exception as e:
-            print(f"Error in on_send_text_changed: {e}") # 捕获并打印异常
+    def on_send_contents_change(self, position, removed, added):
+        """发送文本框内容变化：只校验插入的部分，并同步待发送队列
+
+        每次只处理变化的区间，代价与文档长度无关；非法字符就地删除、字母转为大写，
+        不改写整个文档，也不移动用户的光标。
+        """
+        if self._fixing_send_text:
+            return
+        document = self.send_text.document()
+        length = document.characterCount() - 1
+        # Qt报告的增删数可能包含段落结束符，按文档长度的实际变化校正
+        added = max(0, min(added, length - position))
+        removed = min(max(0, self._send_length - length + added), self._send_length - position)
+        inserted = ''
+        if added:
+            cursor = QTextCursor(document)
+            cursor.setPosition(position)
+            cursor.setPosition(position + added, QTextCursor.MoveMode.KeepAnchor)
+            # selectedText用U+2029表示段落分隔
+            text = cursor.selectedText().replace('\u2029', '\n')
+            inserted = ''.join(c for c in text.upper() if c in self.sendable_chars)
+            if inserted != text:
+                self._fixing_send_text = True
+                cursor.insertText(inserted)
+                self._fixing_send_text = False
+        self._send_length = document.characterCount() - 1
+        self.send_queue.edit(position, removed, inserted)
+
+        if self._send_length == 0:
+            # 文本清空时退出自动发送模式
+            self.send_queue.reset()
+            if self.is_auto_sending_active:
+                self.is_auto_sending_active = False
+                self.auto_send_timer.stop()
+                if self.send_btn.text() == "停止发送":
+                    self.update_send_button_state(False)
+        elif self.is_auto_sending_active and self.send_queue:
+            self.auto_send_timer.start() # 启动或重置定时器
 
     def trigger_auto_send(self):
-        """触发自动发送，发送新增的字符"""
-        print("触发自动发送") # 调试信息
-        # 只有在自动发送模式开启且当前没有发送时才进行自动发送
-        if self.is_auto_sending_active and not self.audio_manager.is_sending:
-             print("执行自动发送，查找新内容") # 调试信息
-             current_text = self.send_text.toPlainText()
-             # 找到需要发送的新字符
-             new_chars = current_text[len(self.sent_text_content):]
-
-             if new_chars:
-                  print(f"发送新字符: {new_chars}") # 调试信息
-                  wpm = self.send_speed_spin.value()
-                  freq = self.audio_manager.cw_frequency
-                  # 调用 send_cw 发送新字符，send_cw现在会处理按字符发送和信号
-                  self.audio_manager.send_cw(new_chars, freq, wpm)
-                  # send_cw 发送完毕后会发出 character_sent 信号，在on_character_sent中更新sent_text_content
-             else:
-                  print("没有新字符需要发送") # 调试信息
-        else:
-             print(f"不执行自动发送：is_auto_sending_active={self.is_auto_sending_active}, is_sending={self.audio_manager.is_sending}") # 调试信息
+        """触发自动发送，发送队列中的新字符"""
+        # 只有在自动发送模式开启且当前没有发送时才进行自动发送，否则在发送完成后再触发
+        if not self.is_auto_sending_active or self.audio_manager.is_sending or not self.send_queue:
+            return
+        # 尚未输入完整的程序信号（如"<A"）留到下次发送
+        new_chars, count = self.audio_manager.morse_utils.prepare_send(self.send_queue.text())
+        if count == 0:
+            return
+        self.send_queue.take(count)
+        wpm = self.send_speed_spin.value()
+        freq = self.audio_manager.cw_frequency
+        # send_cw 按字符发送，每个字符播放完成时发出 character_sent 信号
+        self.audio_manager.send_cw(new_chars, freq, wpm)
 
     def on_character_sent(self, char):
         """接收到单个字符发送完成信号，更新已发信息文本框"""
-        print(f"收到字符发送完成信号: {char}") # 调试信息
         self.sent_text.append(char) # 在已发信息文本框中添加字符
-        self.sent_text_content += char # 更新已发送文本记录
 
 def main():
     app = QApplication(sys.argv)
+    # --startup-time：输出各启动阶段的耗时后退出
+    startup.enabled = '--startup-time' in sys.argv[1:]
+    # --trace：把调试跟踪事件实时输出到标准错误
+    if '--trace' in sys.argv[1:]:
+        trace.configure(level='debug', echo_level='debug')
     window = AutoMorseMainWindow()
+    # 非窗口关闭方式退出时也写出尚未保存的配置
+    app.aboutToQuit.connect(window.config_store.close)
     window.show()
+    # 窗口显示后事件循环处理完第一轮绘制事件时记录首次绘制
+    QTimer.singleShot(0, lambda: startup.mark('首次绘制'))
     sys.exit(app.exec())
 
 if __name__ == '__main__':
@@ -0,0 +1,141 @@
+import numpy as np
+from ring_buffer import RingBuffer
+
+class AudioMonitor:
+    """接收监听：把接收链中滤波后的CW音频送到监听设备
+
+    生产端是接收处理级(process)，把工作采样率的音频写入无锁环形缓冲区；
+    消费端是监听设备输出流的回调(render)，按输出采样率做三次插值重采样后叠加到输出。
+    输入声卡和监听声卡的时钟存在偏差，缓冲量会慢慢增加或减少，render按缓冲量与
+    目标延迟的偏差微调重采样比（最多±1%），使延迟稳定在目标附近而不会越积越多。
+    缓冲区取空时计一次欠载并重新预缓冲，缓冲量超过上限时丢弃多余样本并计一次溢出。
+    """
+
+    MAX_CORRECTION = 0.01   # 重采样比的最大修正量
+    KP = 0.01               # 比例系数：缓冲量偏差100%时修正1%
+    KI = 0.002              # 积分系数(每秒)，消除时钟偏差造成的稳态误差
+    AVERAGE = 0.05          # 缓冲量平滑系数，滤掉按块写入造成的锯齿
+
+    def __init__(self, input_rate, latency=0.02, gain=1.0, buffer_seconds=1.0):
+        self.input_rate = input_rate
+        self.latency = latency       # 目标延迟(秒)，即缓冲区中保持的音频时长
+        self.gain = gain
+        self.buffer_seconds = buffer_seconds
+        self.ring = RingBuffer(int(input_rate * buffer_seconds))
+        self._pending_ring = None    # 采样率改变后待换上的缓冲区
+        self.underruns = 0           # 缓冲区取空的次数
+        self.overruns = 0            # 缓冲区已满或超过上限、样本被丢弃的次数
+        self.correction = 0.0        # 当前重采样比修正量，反映两块声卡的时钟偏差
+        self._reset_pending = True
+        self._output_rate = None
+        self._fill = 0.0              # 平滑后的缓冲样本数
+
+    def configure(self, input_rate=None, latency=None):
+        """修改工作采样率（在未接收时调用）或目标延迟，缓冲区在下一个输出回调块重置
+
+        输出回调可能正在读取缓冲区，新的缓冲区只在这里准备好，由消费端在重置时换上。
+        """
+        if input_rate is not None and input_rate != self.input_rate:
+            self.input_rate = input_rate
+            self._pending_ring = RingBuffer(int(input_rate * self.buffer_seconds))
+        if latency is not None:
+            self.latency = latency
+        self._reset_pending = True
+
+    def reset(self):
+        """在下一个输出回调块丢弃缓冲的音频并重新预缓冲"""
+        self._reset_pending = True
+
+    @property
+    def buffered(self):
+        """平滑后的缓冲音频时长(秒)，即监听路径在输出流之前的延迟"""
+        return self._fill / self.input_rate if self._output_rate is not None else 0.0
+
+    def stats(self):
+        """监听状态：延迟(毫秒)、欠载次数、溢出次数、时钟修正(ppm)"""
+        return {
+            'latency_ms': self.buffered * 1000,
+            'underruns': self.underruns,
+            'overruns': self.overruns,
+            'correction_ppm': self.correction * 1e6,
+        }
+
+    def process(self, block):
+        """接收处理级：把工作块写入缓冲区，不改变接收链的数据"""
+        if self.ring.write(block) < len(block):
+            self.overruns += 1
+        return None
+
+    def _restart(self, output_rate):
+        # 只在消费端（输出回调）中调用
+        ring = self._pending_ring
+        if ring is not None:
+            self.ring = ring
+            self._pending_ring = None
+        self.ring.skip(self.ring.available)
+        self._output_rate = output_rate
+        self._history = np.zeros(1)   # 插值需要的前一个样本和未用完的样本
+        self._phase = 0.0             # 下一个输出样本在_history中的小数位置（相对第1个样本）
+        self._fill = 0.0
+        self._integral = 0.0
+        self.correction = 0.0
+        self._prebuffering = True
+        self._reset_pending = False
+
+    def render(self, out, frames, output_rate):
+        """输出回调：重采样frames个样本叠加到out，只做数组运算，不阻塞"""
+        if self._reset_pending or output_rate != self._output_rate:
+            self._restart(output_rate)
+        target = self.latency * self.input_rate
+        buffered = self.ring.available + len(self._history) - 1 - self._phase
+        if self._prebuffering:
+            if buffered < target:
+                return
+            self._prebuffering = False
+            self._fill = buffered
+        # 缓冲量超过上限（如监听设备停顿过）时丢弃多余部分，保证延迟有界
+        limit = 3 * target + frames * self.input_rate / output_rate
+        if buffered > limit:
+            self.ring.skip(int(buffered - target))
+            self.overruns += 1
+            buffered = self.ring.available + len(self._history) - 1 - self._phase
+            self._fill = buffered
+        self._fill += self.AVERAGE * (buffered - self._fill)
+
+        # PI控制：缓冲量高于目标时加快消耗，低于目标时放慢
+        error = (self._fill - target) / target
+        block_seconds = frames / output_rate
+        self._integral = np.clip(self._integral + error * block_seconds,
+                                 -self.MAX_CORRECTION / self.KI, self.MAX_CORRECTION / self.KI)
+        self.correction = float(np.clip(self.KP * error + self.KI * self._integral,
+                                        -self.MAX_CORRECTION, self.MAX_CORRECTION))
+        step = self.input_rate / output_rate * (1 + self.correction)
+
+        positions = self._phase + step * np.arange(frames)
+        # 位置p的插值需要_history[p] ~ _history[p+3]（_history[0]是p之前的一个样本）
+        needed = int(positions[-1]) + 4
+        history = self._history
+        if len(history) < needed:
+            count = min(needed - len(history), self.ring.available)
+            fresh = np.empty(count)
+            self.ring.read_into(fresh, count)
+            history = np.concatenate([history, fresh])
+        if len(history) < needed:
+            # 欠载：本块静音，保留已读出的样本，重新预缓冲
+            self._history = history
+            self.underruns += 1
+            self._prebuffering = True
+            return
+
+        # Catmull-Rom三次插值
+        index = positions.astype(np.int64)
+        t = positions - index
+        p0, p1, p2, p3 = history[index], history[index + 1], history[index + 2], history[index + 3]
+        samples = p1 + 0.5 * t * (p2 - p0 + t * (2 * p0 - 5 * p1 + 4 * p2 - p3
+                                                 + t * (3 * (p1 - p2) + p3 - p0)))
+        out[:frames] += self.gain * samples
+
+        end = self._phase + step * frames
+        used = int(end)
+        self._history = history[used:]
+        self._phase = end - used
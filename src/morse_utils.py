@@ -1,4 +1,6 @@
 import numpy as np
+import re
+from collections import OrderedDict
 
 class MorseUtils:
     # 摩尔斯码定义
@@ -9,27 +11,124 @@ class MorseUtils:
         'S': '...', 'T': '-', 'U': '..-', 'V': '...-', 'W': '.--', 'X': '-..-',
         'Y': '-.--', 'Z': '--..', '1': '.----', '2': '..---', '3': '...--',
         '4': '....-', '5': '.....', '6': '-....', '7': '--...', '8': '---..',
-        '9': '----.', '0': '-----', ' ': ' '
+        '9': '----.', '0': '-----', ' ': ' ',
+        # 标点符号
+        '.': '.-.-.-', ',': '--..--', '?': '..--..', "'": '.----.', '!': '-.-.--',
+        '/': '-..-.', '(': '-.--.', ')': '-.--.-', '&': '.-...', ':': '---...',
+        ';': '-.-.-.', '=': '-...-', '+': '.-.-.', '-': '-....-', '_': '..--.-',
+        '"': '.-..-.', '$': '...-..-', '@': '.--.-.'
     }
 
-    def __init__(self, sample_rate=44100):
+    # 程序信号（连写发送，无字符间隔），文本中写作<AR>等
+    PROSIGNS = {
+        '<AR>': '.-.-.',   # 报文结束
+        '<SK>': '...-.-',  # 通联结束
+        '<BT>': '-...-',   # 分隔
+        '<KN>': '-.--.',   # 只请指定电台回答
+    }
+
+    # 解码二叉树（堆式数组）：节点i收到点走到2i，收到划走到2i+1，根节点为1
+    DECODE_TREE = None
+
+    # 元素模板缓存的最大条目数（按频率、速度、采样率区分）
+    TEMPLATE_CACHE_SIZE = 16
+
+    def __init__(self, sample_rate=44100, rise_time=0.005):
         self.sample_rate = sample_rate
         # 摩尔斯码时间单位（秒）
         self.dot_duration = 0.1  # 点的时间
         self.dash_duration = 0.3  # 划的时间
         self.space_duration = 0.1  # 字符内间隔
         self.word_space_duration = 0.3  # 词间隔
+        # 键控包络上升/下降时间（秒），0表示不加包络
+        self.rise_time = rise_time
+        # 元素模板缓存：(频率, wpm, 采样率, 包络时间) -> 模板
+        self._templates = {}
+        # 单字符波形缓存
+        self.char_cache = CharacterAudioCache(self)
 
-    def text_to_morse(self, text):
-        """将文本转换为摩尔斯码"""
-        morse = []
-        for char in text.upper():
-            if char in self.MORSE_CODE:
-                morse.append(self.MORSE_CODE[char])
+    def tokenize(self, text):
+        """把文本拆分为发送单元：单个字符、空格或<AR>等程序信号"""
+        tokens = []
+        text = text.upper()
+        i = 0
+        while i < len(text):
+            if text[i] == '<' and text[i:i + 4] in self.PROSIGNS:
+                tokens.append(text[i:i + 4])
+                i += 4
             else:
-                morse.append(' ')
+                tokens.append(text[i])
+                i += 1
+        return tokens
+
+    def prepare_send(self, text):
+        """整理待发送的文本，返回(可发送的文本, 用掉的输入字符数)
+
+        换行转为词间隔；尖括号只作为完整的程序信号（如<AR>）的一部分保留，其余丢弃，
+        发送时不会遇到无法编码的字符。末尾尚未输入完整的程序信号（如"<A"）不计入，留到下次发送。
+        """
+        text = text.upper()
+        result = []
+        i = 0
+        while i < len(text):
+            char = text[i]
+            if char == '<':
+                token = text[i:i + 4]
+                if token in self.PROSIGNS:
+                    result.append(token)
+                    i += 4
+                    continue
+                if len(token) < 4 and any(prosign.startswith(token) for prosign in self.PROSIGNS):
+                    break
+            elif char == '\n':
+                result.append(' ')
+            elif char != '>':
+                result.append(char)
+            i += 1
+        return ''.join(result), i
+
+    def encode_token(self, token):
+        """返回单个发送单元的摩尔斯码，无法编码时返回None"""
+        return self.PROSIGNS.get(token) or self.MORSE_CODE.get(token)
+
+    def text_to_morse(self, text, skip_unknown=False):
+        """将文本转换为摩尔斯码
+
+        遇到无法编码的字符时抛出ValueError；skip_unknown为True时跳过这些字符。
+        """
+        morse = []
+        for token in self.tokenize(text):
+            code = self.encode_token(token)
+            if code is None:
+                if skip_unknown:
+                    continue
+                raise ValueError(f"无法编码为摩尔斯码的字符: {token!r}")
+            morse.append(code)
         return ' '.join(morse)
 
+    def morse_to_text(self, morse):
+        """将摩尔斯码（text_to_morse的格式）解码为文本"""
+        decoder = MorseDecoder()
+        text = []
+        spaces = 0
+        for symbol in morse:
+            if symbol == ' ':
+                spaces += 1
+                continue
+            if spaces:
+                # 一个空格分隔字符，连续多个空格为词间隔（可出现在开头）
+                if decoder.pending:
+                    text.append(decoder.end_char())
+                if spaces > 1:
+                    text.append(' ')
+                spaces = 0
+            decoder.push(symbol == '-')
+        if decoder.pending:
+            text.append(decoder.end_char())
+        if spaces > 1:
+            text.append(' ')
+        return ''.join(text)
+
     def wpm_to_durations(self, wpm):
         # 国际摩尔斯码标准：1 WPM = 50单位/分钟 = 1.2s/字母 = 60/(50*wpm)秒/单位
         unit = 60 / (50 * wpm)
@@ -39,30 +138,219 @@ class MorseUtils:
         word_space = 7 * unit
         return dot, dash, space, word_space
 
+    def set_rise_time(self, rise_time):
+        """设置键控包络的上升/下降时间（秒）"""
+        if rise_time != self.rise_time:
+            self.rise_time = rise_time
+            self._templates.clear()
+            self.char_cache.clear()
+
+    def _ramp_samples(self, dot_duration):
+        """键控沿的样本数：取偶数，使50%点正好落在沿的中点；不超过一个点长"""
+        ramp = min(int(self.rise_time * self.sample_rate), int(dot_duration * self.sample_rate))
+        return ramp - ramp % 2
+
+    def _keying_envelope(self, samples, ramp):
+        """生成升余弦键控包络，避免按键瞬间的咔嗒声
+
+        上升和下降沿各占ramp个样本，沿的中点（50%处）距两端各ramp/2个样本。
+        """
+        envelope = np.ones(samples, dtype=np.float32)
+        if ramp > 0:
+            rise = 0.5 - 0.5 * np.cos(np.pi * np.arange(ramp, dtype=np.float32) / ramp)
+            envelope[:ramp] = rise
+            envelope[samples - ramp:] = rise[::-1]
+        return envelope
+
+    def _render_tone(self, duration, frequency, ramp):
+        """渲染单个带包络的音调元素
+
+        键控沿以标称的按下/抬起时刻为中心：波形比标称时长多ramp个样本，
+        从标称起点之前ramp/2个样本开始，到标称终点之后ramp/2个样本结束，
+        50%点之间的长度正好等于标称时长。
+        """
+        samples = int(duration * self.sample_rate) + ramp
+        t = np.arange(samples, dtype=np.float32) / np.float32(self.sample_rate)
+        tone = np.sin(np.float32(2 * np.pi * frequency) * t, dtype=np.float32)
+        tone *= self._keying_envelope(samples, ramp)
+        return tone
+
+    def get_element_templates(self, frequency, wpm):
+        """获取点、划音调模板及各间隔长度，每组(频率, wpm, 采样率)只渲染一次"""
+        key = (frequency, wpm, self.sample_rate, self.rise_time)
+        templates = self._templates.get(key)
+        if templates is None:
+            dot_duration, dash_duration, space_duration, word_space_duration = self.wpm_to_durations(wpm)
+            ramp = self._ramp_samples(dot_duration)
+            dot = self._render_tone(dot_duration, frequency, ramp)
+            dash = self._render_tone(dash_duration, frequency, ramp)
+            # 模板在多处共享，设为只读防止被意外修改
+            dot.flags.writeable = False
+            dash.flags.writeable = False
+            templates = {
+                '.': dot,
+                '-': dash,
+                'space': int(space_duration * self.sample_rate),
+                'char_space': int(3 * space_duration * self.sample_rate),
+                'word_space': int(word_space_duration * self.sample_rate),
+                'ramp': ramp,
+            }
+            if len(self._templates) >= self.TEMPLATE_CACHE_SIZE:
+                # 淘汰最早加入的模板
+                self._templates.pop(next(iter(self._templates)))
+            self._templates[key] = templates
+        return templates
+
     def morse_to_audio(self, morse, frequency, wpm=26):
-        """将摩尔斯码转换为音频信号，支持速度wpm"""
-        dot_duration, dash_duration, space_duration, word_space_duration = self.wpm_to_durations(wpm)
-        audio = []
+        """将摩尔斯码（text_to_morse的格式）转换为音频信号，支持速度wpm
+
+        每个点划后跟1单位的元素间隔；单个空格为字符间隔(3单位)，连续多个空格为词间隔(7单位)，
+        两者都包含前一字符末尾的元素间隔。
+        整段音频比标称时间轴整体推迟ramp/2个样本（第一个上升沿的前半段），
+        末尾的间隔相应缩短，长度与标称时长相同，因此逐字符拼接时间隔不变。
+        """
+        templates = self.get_element_templates(frequency, wpm)
+        dot = templates['.']
+        dash = templates['-']
+        ramp = templates['ramp']
+        space_samples = templates['space']
+        # 模板含两端各半个沿，标称长度要减去ramp
+        dot_step = len(dot) - ramp + space_samples
+        dash_step = len(dash) - ramp + space_samples
+        char_gap = templates['char_space'] - space_samples
+        word_gap = templates['word_space'] - space_samples
+
+        # 先计算总长度，一次性分配输出缓冲区
+        char_gaps = len(re.findall(' +', morse))
+        word_gaps = len(re.findall('  +', morse))
+        total = (morse.count('.') * dot_step + morse.count('-') * dash_step
+                 + char_gaps * char_gap + word_gaps * (word_gap - char_gap))
+        audio = np.zeros(total, dtype=np.float32)
+
+        # 将模板依次写入缓冲区，间隔部分保持为零；下降沿的后半段落在其后的元素间隔中
+        pos = 0
+        spaces = 0
         for char in morse:
             if char == '.':
-                dot_samples = int(dot_duration * self.sample_rate)
-                t = np.linspace(0, dot_duration, dot_samples, False, dtype=np.float32)
-                audio.extend(np.sin(2 * np.pi * frequency * t, dtype=np.float32))
-                space_samples = int(space_duration * self.sample_rate)
-                audio.extend(np.zeros(space_samples, dtype=np.float32))
+                audio[pos:pos + len(dot)] = dot
+                pos += dot_step
+                spaces = 0
             elif char == '-':
-                dash_samples = int(dash_duration * self.sample_rate)
-                t = np.linspace(0, dash_duration, dash_samples, False, dtype=np.float32)
-                audio.extend(np.sin(2 * np.pi * frequency * t, dtype=np.float32))
-                space_samples = int(space_duration * self.sample_rate)
-                audio.extend(np.zeros(space_samples, dtype=np.float32))
+                audio[pos:pos + len(dash)] = dash
+                pos += dash_step
+                spaces = 0
             elif char == ' ':
-                space_samples = int(word_space_duration * self.sample_rate)
-                audio.extend(np.zeros(space_samples, dtype=np.float32))
-        return np.array(audio, dtype=np.float32)
+                # 第一个空格补足字符间隔，第二个空格再补足到词间隔
+                spaces += 1
+                if spaces == 1:
+                    pos += char_gap
+                elif spaces == 2:
+                    pos += word_gap - char_gap
+        return audio
 
     def generate_cq_audio(self, frequency, wpm=26):
         """生成CQ CQ CQ的摩尔斯码音频，支持速度wpm"""
         text = "CQ CQ CQ"
         morse = self.text_to_morse(text)
-        return self.morse_to_audio(morse, frequency, wpm) 
\ No newline at end of file
+        return self.morse_to_audio(morse, frequency, wpm)
+
+
+def _build_decode_tree():
+    """由编码表生成解码二叉树；与标点同码的程序信号优先解码为程序信号"""
+    codes = {code: char for char, code in MorseUtils.MORSE_CODE.items() if char != ' '}
+    codes.update({code: prosign for prosign, code in MorseUtils.PROSIGNS.items()})
+    depth = max(len(code) for code in codes)
+    tree = [None] * (2 ** (depth + 1))
+    for code, char in codes.items():
+        node = 1
+        for element in code:
+            node = 2 * node + (element == '-')
+        tree[node] = char
+    return tree
+
+MorseUtils.DECODE_TREE = _build_decode_tree()
+
+
+class MorseDecoder:
+    """逐元素的流式摩尔斯解码状态机
+
+    每收到一个点或划只在解码二叉树上走一步，字符间隔到来时直接取当前节点的字符，
+    每个元素的代价为常数，与已接收文本的长度无关。
+    """
+
+    def __init__(self):
+        self._tree = MorseUtils.DECODE_TREE
+        self.node = 1   # 当前节点，0表示已超出编码表
+
+    @property
+    def pending(self):
+        """当前字符是否已收到元素"""
+        return self.node != 1
+
+    def push(self, dash):
+        """收到一个元素：dash为True表示划"""
+        if self.node == 0:
+            # 已超出编码表，保持到字符结束
+            return
+        node = 2 * self.node + dash
+        self.node = node if 0 < node < len(self._tree) else 0
+
+    def revise(self, dash):
+        """把当前字符中最近的一个元素改判为点或划"""
+        if self.node > 1:
+            node = self.node // 2 * 2 + dash
+            self.node = node if node < len(self._tree) else 0
+
+    def end_char(self):
+        """字符间隔到来：返回解码出的字符（无法识别时为'*'）并回到根节点"""
+        char = self._tree[self.node] if self.node else None
+        self.node = 1
+        return char or '*'
+
+
+class CharacterAudioCache:
+    """单字符波形的LRU缓存，键为(字符, 频率, wpm, 采样率)"""
+
+    def __init__(self, morse_utils, max_size=128):
+        self.morse_utils = morse_utils
+        self.max_size = max_size
+        self._cache = OrderedDict()
+        self.hits = 0    # 命中次数
+        self.misses = 0  # 未命中（实际合成）次数
+
+    def get(self, char, frequency, wpm):
+        """获取单个字符的音频（末尾带1单位的元素间隔），未缓存时合成并加入缓存"""
+        char = char.upper()
+        key = (char, frequency, wpm, self.morse_utils.sample_rate)
+        audio = self._cache.get(key)
+        if audio is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return audio
+        self.misses += 1
+        morse_code = self.morse_utils.text_to_morse(char)
+        audio = self.morse_utils.morse_to_audio(morse_code, frequency, wpm)
+        # 缓存的波形会被重复使用，设为只读
+        audio.flags.writeable = False
+        self._cache[key] = audio
+        if len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+        return audio
+
+    def clear(self):
+        """清空缓存（频率或速度改变时调用）"""
+        self._cache.clear()
+
+    def reset_stats(self):
+        """清零命中统计"""
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """返回缓存统计信息"""
+        return {
+            'size': len(self._cache),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
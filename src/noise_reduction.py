@@ -0,0 +1,142 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+def _fft_supports_out():
+    """numpy 2.0起rfft/irfft支持out参数，可直接写入预分配的缓冲区"""
+    try:
+        np.fft.rfft(np.zeros(4), out=np.zeros(3, dtype=np.complex128))
+        return True
+    except TypeError:
+        return False
+
+_FFT_OUT = _fft_supports_out()
+
+
+class NoiseReducer:
+    """弱信号增强处理级：短时谱减法降噪
+
+    输入按跳步(hop，半帧)分帧，加平方根汉宁窗后做FFT，各频点的增益由平滑功率与噪声底之比决定：
+    只有噪声的频点压低到floor，CW载波所在的频点基本保持原幅度，再IFFT、加窗后重叠相加。
+    分析窗与合成窗之积在50%重叠下恒为1，增益为1时输出与输入完全相同。
+    噪声底按频点跟踪平滑功率的最小值：下降时立即跟随，上升速度受限，按键期间不会被当成噪声。
+    一块中的所有帧一次向量化计算，帧、频谱和输出缓冲区按块长预先分配，每块的开销固定。
+    输出与输入等长，比输入固定延迟fft_size个样本。
+    """
+
+    def __init__(self, sample_rate, frame_time=0.032, floor=0.1, oversubtraction=2.0,
+                 smoothing=0.7, noise_rise=6.0):
+        self.sample_rate = sample_rate
+        self.floor = floor                      # 最小增益，保留少量背景噪声，避免"音乐噪声"
+        # 过减因子：最小值跟踪得到的噪声底约为噪声平均功率的一半，默认值补偿这一偏差
+        self.oversubtraction = oversubtraction
+        self.smoothing = smoothing              # 频点功率的帧间平滑系数
+        self.fft_size = 2 ** int(round(np.log2(sample_rate * frame_time)))
+        self.hop = self.fft_size // 2
+        self.delay = self.fft_size
+        # 周期汉宁窗开平方，分析和合成各用一次
+        self._window = np.sqrt(np.hanning(self.fft_size + 1)[:-1])
+        # 噪声底每帧最多上升的倍数（noise_rise为dB/秒）
+        self._rise = 10 ** (noise_rise * self.hop / sample_rate / 10)
+        bins = self.fft_size // 2 + 1
+        self._power = np.zeros(bins)
+        self._gain = np.zeros(bins)
+        self.reset()
+
+    def reset(self):
+        """清空噪声估计和缓冲的音频"""
+        self._noise = None
+        self._power[:] = 0
+        self._input = np.zeros(self.fft_size)   # 尚未组成完整帧的输入，初始为半帧静音
+        self._input_length = self.hop
+        # 输出FIFO：预先放入hop个静音样本，保证每块都能输出与输入等长的数据
+        self._output = np.zeros(self.hop)
+        self._output_length = self.hop
+        self._tail = np.zeros(self.hop)         # 上一帧合成结果的后半帧
+        self._block_size = 0
+
+    def _prepare(self, block_size):
+        """按块长分配帧、频谱和输出缓冲区"""
+        self._block_size = block_size
+        max_frames = block_size // self.hop + 1
+        # 保留已缓冲的输入和输出，块长改变时不丢样本
+        carry = self._input[:self._input_length].copy()
+        self._input = np.zeros(self.fft_size + block_size)
+        self._input[:len(carry)] = carry
+        pending = self._output[:self._output_length].copy()
+        self._output = np.zeros(self.hop + block_size + max_frames * self.hop)
+        self._output[:len(pending)] = pending
+        self._frames = np.zeros((max_frames, self.fft_size))
+        self._spectra = np.zeros((max_frames, self.fft_size // 2 + 1), dtype=np.complex128)
+        self._synthesis = np.zeros((max_frames, self.fft_size))
+        self._result = np.zeros(block_size, dtype=np.float32)
+
+    def process(self, block):
+        """接收引擎处理级接口：返回降噪后的数据"""
+        length = len(block)
+        if length != self._block_size:
+            self._prepare(length)
+        hop = self.hop
+        size = self.fft_size
+        data = self._input
+        data[self._input_length:self._input_length + length] = block
+        available = self._input_length + length
+        count = (available - size) // hop + 1 if available >= size else 0
+        if count:
+            frames = self._frames[:count]
+            # 相邻帧重叠半帧：帧i = data[i*hop : i*hop+size]
+            np.multiply(sliding_window_view(data[:available], size)[::hop][:count], self._window, out=frames)
+            spectra = self._spectra[:count]
+            if _FFT_OUT:
+                np.fft.rfft(frames, axis=1, out=spectra)
+            else:
+                spectra[:] = np.fft.rfft(frames, axis=1)
+            self._apply_gains(spectra)
+            synthesis = self._synthesis[:count]
+            if _FFT_OUT:
+                np.fft.irfft(spectra, n=size, axis=1, out=synthesis)
+            else:
+                synthesis[:] = np.fft.irfft(spectra, n=size, axis=1)
+            synthesis *= self._window
+            # 重叠相加：每帧的前半与上一帧的后半相加得到hop个完成的样本
+            output = self._output
+            start = self._output_length
+            done = output[start:start + count * hop].reshape(count, hop)
+            done[:] = synthesis[:, :hop]
+            done[0] += self._tail
+            done[1:] += synthesis[:-1, hop:]
+            self._tail[:] = synthesis[-1, hop:]
+            self._output_length += count * hop
+            consumed = count * hop
+            data[:available - consumed] = data[consumed:available]
+            available -= consumed
+        self._input_length = available
+
+        result = self._result
+        output = self._output
+        result[:] = output[:length]
+        remaining = self._output_length - length
+        output[:remaining] = output[length:self._output_length]
+        self._output_length = remaining
+        return result
+
+    def _apply_gains(self, spectra):
+        """逐帧更新平滑功率和噪声底，按谱减法计算增益并作用于频谱"""
+        power = self._power
+        gain = self._gain
+        for spectrum in spectra:
+            magnitude = np.abs(spectrum)
+            if self._noise is None:
+                power[:] = magnitude * magnitude
+                self._noise = power.copy()
+            else:
+                power *= self.smoothing
+                power += (1 - self.smoothing) * magnitude * magnitude
+                # 噪声底跟踪最小值：不高于当前平滑功率，上升速度受限
+                self._noise *= self._rise
+                np.minimum(self._noise, power, out=self._noise)
+            np.divide(self._noise, np.maximum(power, 1e-20), out=gain)
+            gain *= -self.oversubtraction
+            gain += 1.0
+            np.maximum(gain, self.floor * self.floor, out=gain)
+            np.sqrt(gain, out=gain)
+            spectrum *= gain
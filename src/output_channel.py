@@ -0,0 +1,116 @@
+import time
+import numpy as np
+import audio_backend
+from ring_buffer import RingBuffer
+from tracing import trace
+
+class OutputChannel:
+    """回调驱动的输出通道
+
+    声卡回调从环形缓冲区取出预先渲染好的样本，缓冲区为空时输出静音，
+    因此流可以在整条报文期间保持打开，字符之间不会出现额外的空隙。
+    回调同时记录播放时钟，用于判断某个样本实际从声卡播出的时刻。
+    设置了monitor（接收监听音频源）时，回调把监听音频叠加到输出上。
+    """
+
+    def __init__(self, device, sample_rate, blocksize=256, buffer_seconds=2.0):
+        self.device = device
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        self.ring = RingBuffer(int(sample_rate * buffer_seconds))
+        self.stream = None
+        self.underflows = 0           # 声卡报告的输出欠载次数
+        self.monitor = None           # 叠加到输出的监听音频源(AudioMonitor)
+        self._latency = 0.0
+        self._flush_to = 0            # 回调需丢弃到的样本位置
+        # 播放时钟：(块起始样本位置, 该块开始从DAC播出的单调时钟时间)
+        self._clock = None
+
+    @property
+    def active(self):
+        return self.stream is not None and self.stream.active
+
+    @property
+    def written(self):
+        """已写入的样本总数（即下一个写入样本的位置）"""
+        return self.ring.write_pos
+
+    def open(self):
+        """打开并启动输出流"""
+        self.stream = audio_backend.get().OutputStream(
+            samplerate=self.sample_rate,
+            channels=1,
+            device=self.device,
+            dtype=np.float32,
+            blocksize=self.blocksize,
+            latency='low',
+            callback=self._callback
+        )
+        self._latency = self.stream.latency
+        self.stream.start()
+
+    def close(self):
+        """立即停止并关闭输出流"""
+        stream = self.stream
+        self.stream = None
+        if stream is not None:
+            try:
+                # abort()失败时仍要关闭流，否则声卡设备一直被占用
+                try:
+                    stream.abort()
+                finally:
+                    stream.close()
+            except Exception as e:
+                trace.error("关闭输出流失败: {}", e)
+
+    def write(self, samples):
+        """写入样本，返回实际写入的数量（缓冲区满时可能小于输入长度）"""
+        return self.ring.write(samples)
+
+    def write_zeros(self, count):
+        """写入静音样本，返回实际写入的数量"""
+        return self.ring.write_zeros(count)
+
+    def flush(self):
+        """丢弃目前已写入、尚未播放的样本，在下一个回调块生效，不会阻塞调用者
+
+        只丢弃到调用时的写入位置，之后写入的样本（如紧接着开始的新任务）照常播放。
+        """
+        self._flush_to = self.ring.write_pos
+
+    def playback_time(self, position):
+        """估计指定样本位置从DAC播出的单调时钟时间，流尚未回调时返回None"""
+        clock = self._clock
+        if clock is None:
+            return None
+        start, start_time = clock
+        return start_time + (position - start) / self.sample_rate
+
+    def reached(self, position):
+        """判断指定样本位置之前的音频是否已经实际播出"""
+        if self.ring.read_pos < position:
+            return False
+        play_time = self.playback_time(position)
+        return play_time is not None and time.monotonic() >= play_time
+
+    def _callback(self, outdata, frames, time_info, status):
+        """声卡回调：只做缓冲区拷贝，不做任何阻塞操作"""
+        if status.output_underflow:
+            self.underflows += 1
+        if self._flush_to > self.ring.read_pos:
+            self.ring.skip(self._flush_to - self.ring.read_pos)
+        start = self.ring.read_pos
+        out = outdata[:, 0]
+        n = self.ring.read_into(out, frames)
+        if n < frames:
+            out[n:] = 0
+        if n > 0:
+            # 只在本块包含数据时更新时钟，静音块不对应任何样本位置
+            # 部分主机API不提供DAC时间，此时用流的输出延迟代替
+            delay = time_info.outputBufferDacTime - time_info.currentTime
+            if delay <= 0 or delay > 1.0:
+                delay = self._latency
+            self._clock = (start, time.monotonic() + delay)
+        monitor = self.monitor
+        if monitor is not None:
+            monitor.render(out, frames, self.sample_rate)
@@ -0,0 +1,31 @@
+from PyQt6.QtCore import QObject, pyqtSignal
+from events import Signal
+
+_signal_classes = {}
+
+def _signal_class(source_class):
+    """按引擎类中声明的Signal生成带同名pyqtSignal的QObject子类"""
+    cls = _signal_classes.get(source_class)
+    if cls is None:
+        members = {}
+        for base in reversed(source_class.__mro__):
+            for name, value in vars(base).items():
+                if isinstance(value, Signal):
+                    members[name] = pyqtSignal(*value.types)
+        cls = type(source_class.__name__ + 'QtSignals', (QObject,), members)
+        _signal_classes[source_class] = cls
+    return cls
+
+
+def qt_signals(source, parent=None):
+    """为引擎对象创建Qt信号适配器
+
+    引擎的每个Signal都转发到适配器上的同名pyqtSignal，界面连接适配器的信号，
+    引擎工作线程中发出的事件由Qt排队到界面线程执行。
+    """
+    adapter = _signal_class(type(source))(parent)
+    for name in dir(adapter):
+        signal = getattr(type(source), name, None)
+        if isinstance(signal, Signal):
+            getattr(source, name).connect(getattr(adapter, name).emit)
+    return adapter
@@ -0,0 +1,136 @@
+import threading
+import numpy as np
+import audio_backend
+from ring_buffer import RingBuffer
+from dsp import WorkBlocker
+from tracing import trace
+
+class ReceiveEngine:
+    """流式接收引擎
+
+    输入流回调只把音频块拷贝进预分配的无锁环形缓冲区，从不阻塞；
+    工作线程按固定块大小取出数据，先经多相抽取降到工作采样率，
+    再按固定的工作块大小依次交给各处理级（滤波、检测、解码）。
+    处理级为带process(block)方法的对象，返回新的数组时作为下一级的输入，
+    返回None时下一级继续使用原输入。
+    """
+
+    def __init__(self, sample_rate=44100, block_size=1024, buffer_seconds=2.0):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.ring = RingBuffer(int(sample_rate * buffer_seconds))
+        self._block = np.zeros(block_size, dtype=np.float32)
+        self.set_working_rate(sample_rate)
+        self.stages = []
+        self.stream = None
+        self.overruns = 0          # 环形缓冲区已满、输入被丢弃的次数
+        self.input_overflows = 0   # 声卡报告的输入溢出次数
+        self.on_overrun = None     # 溢出计数变化时的回调，参数为累计次数
+        self._reported_overruns = 0
+        self._stop_event = threading.Event()
+        self._worker_thread = None
+
+    @property
+    def running(self):
+        return self._worker_thread is not None
+
+    def set_block_size(self, block_size):
+        """设置输入块长度（在未接收时调用）：块越短延迟越低，每块的固定开销占比越高"""
+        self.block_size = block_size
+        self._block = np.zeros(block_size, dtype=np.float32)
+        self.set_working_rate(self.working_rate)
+
+    def set_working_rate(self, working_rate):
+        """设置处理级使用的工作采样率（在未接收时调用）"""
+        self.working_rate = working_rate
+        self.blocker = WorkBlocker(self.sample_rate, working_rate, self.block_size)
+        self.work_block_size = self.blocker.block_size
+
+    def set_stages(self, stages):
+        """设置处理级列表（整体替换，工作线程在下一块生效）"""
+        self.stages = list(stages)
+
+    def start(self, device):
+        """打开输入流并启动工作线程"""
+        if self.running:
+            return
+        self.ring.skip(self.ring.available)
+        self.blocker.reset()
+        self._stop_event.clear()
+        self.stream = audio_backend.get().InputStream(
+            samplerate=self.sample_rate,
+            channels=1,
+            device=device,
+            dtype=np.float32,
+            blocksize=0,
+            latency='low',
+            callback=self._callback
+        )
+        self._worker_thread = threading.Thread(target=self._worker, daemon=True)
+        self._worker_thread.start()
+        self.stream.start()
+
+    def stop(self):
+        """停止输入流和工作线程"""
+        stream = self.stream
+        self.stream = None
+        if stream is not None:
+            try:
+                # abort()失败时仍要关闭流，否则声卡设备一直被占用
+                try:
+                    stream.abort()
+                finally:
+                    stream.close()
+            except Exception as e:
+                trace.error("关闭输入流失败: {}", e)
+        self._stop_event.set()
+        if self._worker_thread is not None:
+            self._worker_thread.join(timeout=1.0)
+            self._worker_thread = None
+
+    def process_pending(self):
+        """处理缓冲区中所有完整的数据块，返回处理的块数"""
+        count = 0
+        while self.ring.available >= self.block_size:
+            self.ring.read_into(self._block)
+            for block in self.blocker.feed(self._block):
+                self._run_stages(block)
+            count += 1
+            self._report_overruns()
+        self._report_overruns()
+        return count
+
+    def _run_stages(self, data):
+        """把一个工作块依次交给各处理级"""
+        for stage in self.stages:
+            result = stage.process(data)
+            if result is not None:
+                data = result
+
+    def _report_overruns(self):
+        """溢出计数变化时通知上层"""
+        total = self.overruns + self.input_overflows
+        if total != self._reported_overruns:
+            self._reported_overruns = total
+            trace.info("接收缓冲区溢出，累计 {} 次", total)
+            if self.on_overrun is not None:
+                self.on_overrun(total)
+
+    def _worker(self):
+        """工作线程：数据不足一块时短暂等待，不与回调竞争任何锁"""
+        wait = self.block_size / self.sample_rate / 2
+        while not self._stop_event.is_set():
+            try:
+                processed = self.process_pending()
+            except Exception as e:
+                trace.exception("接收处理出错: {}", e)
+                processed = 0
+            if not processed:
+                self._stop_event.wait(wait)
+
+    def _callback(self, indata, frames, time_info, status):
+        """输入回调：只做拷贝，缓冲区不足时丢弃并计数"""
+        if status.input_overflow:
+            self.input_overflows += 1
+        if self.ring.write(indata[:, 0]) < frames:
+            self.overruns += 1
@@ -0,0 +1,72 @@
+import numpy as np
+
+class RingBuffer:
+    """单生产者/单消费者环形缓冲区
+
+    生产者只修改write_pos，消费者只修改read_pos，两端无需加锁，
+    可以安全地在声卡回调中使用。位置均为单调递增的样本计数。
+    """
+
+    def __init__(self, capacity, dtype=np.float32):
+        self.capacity = int(capacity)
+        self._buf = np.zeros(self.capacity, dtype=dtype)
+        self.write_pos = 0  # 已写入的样本总数
+        self.read_pos = 0   # 已读出的样本总数
+
+    @property
+    def available(self):
+        """可读取的样本数"""
+        return self.write_pos - self.read_pos
+
+    @property
+    def free(self):
+        """可写入的空闲样本数"""
+        return self.capacity - (self.write_pos - self.read_pos)
+
+    def write(self, data):
+        """写入样本（生产者端），空间不足时只写入能容纳的部分，返回写入数量"""
+        n = min(len(data), self.free)
+        if n <= 0:
+            return 0
+        start = self.write_pos % self.capacity
+        first = min(n, self.capacity - start)
+        self._buf[start:start + first] = data[:first]
+        if n > first:
+            self._buf[:n - first] = data[first:n]
+        # 最后再更新位置，保证消费者看到的数据已经写完
+        self.write_pos += n
+        return n
+
+    def write_zeros(self, count):
+        """写入静音样本（生产者端），返回写入数量"""
+        n = min(count, self.free)
+        if n <= 0:
+            return 0
+        start = self.write_pos % self.capacity
+        first = min(n, self.capacity - start)
+        self._buf[start:start + first] = 0
+        if n > first:
+            self._buf[:n - first] = 0
+        self.write_pos += n
+        return n
+
+    def read_into(self, out, count=None):
+        """读出样本到out（消费者端），返回实际读出的数量"""
+        n = len(out) if count is None else count
+        n = min(n, self.available)
+        if n <= 0:
+            return 0
+        start = self.read_pos % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self._buf[start:start + first]
+        if n > first:
+            out[first:n] = self._buf[:n - first]
+        self.read_pos += n
+        return n
+
+    def skip(self, count):
+        """丢弃样本（消费者端），返回实际丢弃的数量"""
+        n = min(count, self.available)
+        if n > 0:
+            self.read_pos += n
+        return max(n, 0)
@@ -0,0 +1,41 @@
+class SendQueue:
+    """发送文本框的待发送队列
+
+    文本框中已交给发送的前缀长度为offset，其后的字符即待发送队列pending。
+    编辑只按变化的区间调整两者，代价与文档长度无关；不依赖Qt，便于单独测试。
+    """
+
+    def __init__(self):
+        self.offset = 0     # 已交给发送的前缀长度
+        self.pending = []   # 尚未发送的字符
+
+    def __bool__(self):
+        return bool(self.pending)
+
+    def text(self):
+        """待发送的文本"""
+        return ''.join(self.pending)
+
+    def reset(self, offset=0, text=''):
+        """重新开始：前offset个字符视为已发送，text为其后的待发送文本"""
+        self.offset = offset
+        self.pending = list(text)
+
+    def take(self, count):
+        """队列开头的count个字符已交给发送"""
+        del self.pending[:count]
+        self.offset += count
+
+    def edit(self, position, removed, inserted):
+        """文本框在position处删除removed个字符后插入inserted"""
+        # 删除的部分：落在已发送前缀内的只调整前缀长度，其余从队列中删除
+        offset = self.offset
+        removed_sent = max(0, min(position + removed, offset) - position)
+        tail_start = max(position, offset) - offset
+        del self.pending[tail_start:tail_start + removed - removed_sent]
+        self.offset = offset = offset - removed_sent
+        # 插入的部分：在已发送前缀之内的视为修改历史，不再发送；其余加入队列
+        if position < offset:
+            self.offset += len(inserted)
+        else:
+            self.pending[position - offset:position - offset] = list(inserted)
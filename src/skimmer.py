@@ -0,0 +1,237 @@
+import multiprocessing
+import queue
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from cw_decoder import CwDecoder
+from dsp import lowpass_fir
+
+class PolyphaseChannelizer:
+    """WOLA多相滤波器组信道化器
+
+    每跳取最近 M*P 个样本乘以原型低通滤波器，按 P 段折叠为 M 点后做FFT，
+    得到 M/2+1 个均匀分布的信道输出，跳长小于 M 即为过采样滤波器组，
+    保证各信道包络有足够的时间分辨率。
+    """
+
+    def __init__(self, sample_rate, channel_spacing=50.0, hop_time=0.004, taps_per_channel=4):
+        self.sample_rate = sample_rate
+        self.channels = 2 ** int(round(np.log2(sample_rate / channel_spacing)))
+        self.channel_spacing = sample_rate / self.channels
+        self.taps_per_channel = taps_per_channel
+        self.length = self.channels * taps_per_channel
+        self.hop = max(1, min(self.channels, int(sample_rate * hop_time)))
+        self.output_rate = sample_rate / self.hop
+        self.frequencies = np.arange(self.channels // 2 + 1) * self.channel_spacing
+        self._prototype = lowpass_fir(self.length, 1.0 / self.channels, 9.0).astype(np.float32)
+        self._history = np.zeros(self.length - 1, dtype=np.float32)
+        self._next_end = self.hop
+        self._buffer = np.zeros(0, dtype=np.float32)
+
+    def process(self, block):
+        """处理一块样本，返回各信道幅度，形状为(跳数, 信道数)"""
+        length = len(block)
+        history = len(self._history)
+        if len(self._buffer) != history + length:
+            self._buffer = np.zeros(history + length, dtype=np.float32)
+        data = self._buffer
+        data[:history] = self._history
+        data[history:] = block
+        self._history[:] = data[length:]
+
+        positions = np.arange(self._next_end, length + 1, self.hop)
+        if not len(positions):
+            self._next_end -= length
+            return np.zeros((0, len(self.frequencies)), dtype=np.float32)
+        self._next_end = positions[-1] + self.hop - length
+        # 每个输出时刻对应以该时刻结束、长度为M*P的一帧
+        frames = sliding_window_view(data, self.length)[positions - 1]
+        folded = (frames * self._prototype).reshape(len(positions), self.taps_per_channel, self.channels).sum(axis=1)
+        return np.abs(np.fft.rfft(folded, axis=1)).astype(np.float32)
+
+
+class CarrierTracker:
+    """在信道幅度中自动发现活动载波，带保持时间，避免信号间歇时频繁增删"""
+
+    def __init__(self, frequencies, update_rate, min_frequency=200.0, max_frequency=3000.0,
+                 snr=10.0, hold_time=15.0, decay_time=2.0, separation=2):
+        self.frequencies = frequencies
+        self.separation = separation  # 载波之间的最小间隔（信道数），更近的视为同一信号的边带
+        self.update_rate = update_rate
+        self.snr = snr
+        self._band = (frequencies >= min_frequency) & (frequencies <= max_frequency)
+        self._decay_time = decay_time
+        self._hold = int(hold_time * update_rate)
+        # 各信道的峰值保持电平：按键期间保持，键间隔中缓慢衰减
+        self._level = np.zeros(len(frequencies), dtype=np.float32)
+        # 各信道的平均电平，其中位数作为噪声底
+        self._mean = np.zeros(len(frequencies), dtype=np.float32)
+        self._idle = np.zeros(len(frequencies), dtype=np.int64)
+        self._rows = 0
+        self.active = set()
+
+    def update(self, magnitudes):
+        """根据一批信道幅度更新活动信道，返回(新增信道, 移除信道)"""
+        decay = np.float32(0.5 ** (len(magnitudes) / self.update_rate / self._decay_time))
+        level = self._level
+        level *= decay
+        np.maximum(level, magnitudes.max(axis=0), out=level)
+        if self._rows == 0:
+            self._mean[:] = magnitudes.mean(axis=0)
+        else:
+            self._mean += (1 - decay) * (magnitudes.mean(axis=0) - self._mean)
+        self._rows += len(magnitudes)
+        if self._rows < self._decay_time * self.update_rate:
+            # 噪声底估计稳定之前不判定载波
+            return set(), set()
+        floor = max(float(np.median(self._mean[self._band])), 1e-9)
+        # 高于噪声底且在相邻若干信道内为最大值的信道视为载波
+        padded = np.pad(level, self.separation)
+        neighborhood = sliding_window_view(padded, 2 * self.separation + 1).max(axis=1)
+        present = self._band & (level >= neighborhood) & (level > floor * self.snr)
+        self._idle[present] = 0
+        self._idle[~present] += len(magnitudes)
+        removed = {c for c in self.active if self._idle[c] > self._hold}
+        active = self.active - removed
+        # 与已有载波相邻的信道是同一信号的边带：明显更强时替换原载波，否则忽略
+        added = set()
+        for channel in np.flatnonzero(present).tolist():
+            if channel in active:
+                continue
+            nearby = [c for c in range(channel - self.separation, channel + self.separation + 1)
+                      if c in active]
+            if nearby:
+                if level[channel] < 2 * max(level[c] for c in nearby):
+                    continue
+                active.difference_update(nearby)
+                added.difference_update(nearby)
+                removed.update(c for c in nearby if c in self.active)
+            active.add(channel)
+            added.add(channel)
+        self.active = active
+        return added, removed
+
+
+def _decoder_worker(inbox, outbox, envelope_rate):
+    """解码进程：为分配到本进程的每个信道维护独立的解码器"""
+    decoders = {}
+    while True:
+        batch = inbox.get()
+        if batch is None:
+            break
+        for channel, envelope in batch.items():
+            if envelope is None:
+                decoders.pop(channel, None)
+                continue
+            decoder = decoders.get(channel)
+            if decoder is None:
+                decoder = decoders[channel] = CwDecoder(envelope_rate)
+            chars = decoder.process(envelope)
+            if chars:
+                outbox.put((channel, ''.join(char for _, char in chars)))
+
+
+class CwSkimmer:
+    """多信号CW解码器
+
+    用多相滤波器组把整个音频采集带宽划分为窄信道，自动发现活动载波，
+    每个载波由独立的解码器解码。解码器分布在多个进程中，
+    同一信道总是由同一进程处理，各信道的文本分别上报。
+    """
+
+    def __init__(self, sample_rate, bandwidth=3000, workers=None, batch_time=0.1):
+        self.channelizer = PolyphaseChannelizer(sample_rate)
+        self.tracker = CarrierTracker(self.channelizer.frequencies, self.channelizer.output_rate,
+                                      max_frequency=bandwidth)
+        self.on_text = None  # 解码文本回调(频率Hz, 文本)
+        self._batch_rows = max(1, int(batch_time * self.channelizer.output_rate))
+        self._pending = []
+        self._removed = set()
+        if workers is None:
+            workers = max(1, multiprocessing.cpu_count() - 1)
+        self.workers = workers
+        self._inboxes = []
+        self._processes = []
+        self._decoders = {}
+        if workers > 0:
+            self._outbox = multiprocessing.Queue()
+            for _ in range(workers):
+                inbox = multiprocessing.Queue()
+                process = multiprocessing.Process(
+                    target=_decoder_worker,
+                    args=(inbox, self._outbox, self.channelizer.output_rate),
+                    daemon=True
+                )
+                process.start()
+                self._inboxes.append(inbox)
+                self._processes.append(process)
+        else:
+            # 不使用进程池时在当前线程解码
+            self._outbox = queue.Queue()
+
+    @property
+    def active_frequencies(self):
+        """当前活动载波的频率列表"""
+        return sorted(float(self.channelizer.frequencies[c]) for c in self.tracker.active)
+
+    def process(self, block):
+        """接收引擎处理级接口"""
+        magnitudes = self.channelizer.process(block)
+        if len(magnitudes):
+            added, removed = self.tracker.update(magnitudes)
+            self._removed |= removed
+            self._pending.append(magnitudes)
+            if sum(len(m) for m in self._pending) >= self._batch_rows:
+                self._dispatch()
+        self._collect()
+        return None
+
+    def _dispatch(self):
+        """把累积的各活动信道包络按信道分派给解码进程"""
+        magnitudes = np.concatenate(self._pending)
+        self._pending = []
+        batches = [{} for _ in range(max(1, self.workers))]
+        for channel in self.tracker.active:
+            batches[channel % len(batches)][channel] = np.ascontiguousarray(magnitudes[:, channel])
+        for channel in self._removed:
+            batches[channel % len(batches)][channel] = None
+        self._removed = set()
+        for index, batch in enumerate(batches):
+            if not batch:
+                continue
+            if self.workers > 0:
+                self._inboxes[index].put(batch)
+            else:
+                self._decode_locally(batch)
+
+    def _decode_locally(self, batch):
+        for channel, envelope in batch.items():
+            if envelope is None:
+                self._decoders.pop(channel, None)
+                continue
+            decoder = self._decoders.get(channel)
+            if decoder is None:
+                decoder = self._decoders[channel] = CwDecoder(self.channelizer.output_rate)
+            chars = decoder.process(envelope)
+            if chars:
+                self._outbox.put((channel, ''.join(char for _, char in chars)))
+
+    def _collect(self):
+        """取回解码结果并上报"""
+        while True:
+            try:
+                channel, text = self._outbox.get_nowait()
+            except queue.Empty:
+                break
+            if self.on_text is not None:
+                self.on_text(float(self.channelizer.frequencies[channel]), text)
+
+    def close(self):
+        """结束解码进程"""
+        for inbox in self._inboxes:
+            inbox.put(None)
+        for process in self._processes:
+            process.join(timeout=1.0)
+            if process.is_alive():
+                process.terminate()
+        self._inboxes = []
+        self._processes = []
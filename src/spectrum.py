@@ -0,0 +1,111 @@
+import time
+import numpy as np
+
+class SpectrumEngine:
+    """流式FFT频谱引擎
+
+    作为接收引擎的处理级在工作线程中运行：输入样本按跳步(hop)累积，
+    每跳做一次加窗FFT，只计算音频采集带宽内的频点并做指数平均。
+    所有窗口和输出缓冲区预先分配，结果以限定帧率交给界面绘制。
+    """
+
+    def __init__(self, sample_rate, fft_size=2048, overlap=0.5, averaging=0.5,
+                 bandwidth=3000, max_fps=20, frame_pool=4):
+        self.sample_rate = sample_rate
+        self.averaging = averaging   # 指数平均系数，0为不平均
+        self.max_fps = max_fps
+        self.frame_pool = frame_pool
+        self.on_frame = None         # 限帧率回调(频率数组, 功率数组)，供界面绘制
+        self.row_listeners = []      # 每次FFT都会调用的回调(功率数组)，如瀑布图
+        self._pending_config = None
+        self._last_emit = 0.0
+        self._apply_config(fft_size, overlap, bandwidth)
+
+    def configure(self, fft_size=None, overlap=None, bandwidth=None, sample_rate=None):
+        """修改FFT参数，在工作线程处理下一块时生效
+
+        只修改采样率时按比例调整FFT点数（取2的幂），保持每帧时长和刷新率不变。
+        """
+        # 在尚未生效的修改基础上合并
+        current = self._pending_config or (self.fft_size, self.overlap, self.bandwidth, self.sample_rate)
+        if sample_rate and not fft_size and sample_rate != current[3]:
+            fft_size = 2 ** int(round(np.log2(current[0] * sample_rate / current[3])))
+        self._pending_config = (
+            fft_size or current[0],
+            current[1] if overlap is None else overlap,
+            bandwidth or current[2],
+            sample_rate or current[3],
+        )
+
+    def _apply_config(self, fft_size, overlap, bandwidth, sample_rate=None):
+        """按参数分配窗口、历史和输出缓冲区"""
+        if sample_rate:
+            self.sample_rate = sample_rate
+        self.fft_size = int(fft_size)
+        self.overlap = overlap
+        self.bandwidth = bandwidth
+        self.hop = max(1, int(self.fft_size * (1 - overlap)))
+        self._window = np.hanning(self.fft_size).astype(np.float32)
+        # 幅度归一化到满量程正弦波为0 dB
+        self._scale = np.float32(2.0 / self._window.sum())
+        self._history = np.zeros(self.fft_size, dtype=np.float32)
+        self._windowed = np.zeros(self.fft_size, dtype=np.float32)
+        self._since_fft = 0
+        resolution = self.sample_rate / self.fft_size
+        self.bin_count = min(int(bandwidth / resolution) + 1, self.fft_size // 2 + 1)
+        self.frequencies = (np.arange(self.bin_count) * resolution).astype(np.float32)
+        self._power = np.zeros(self.bin_count, dtype=np.float32)
+        self._average = np.full(self.bin_count, -120.0, dtype=np.float32)
+        self._frames = [np.zeros(self.bin_count, dtype=np.float32) for _ in range(self.frame_pool)]
+        self._frame_index = 0
+
+    def process(self, block):
+        """接收引擎处理级接口：累积样本，满一跳即计算一帧频谱"""
+        if self._pending_config is not None:
+            config = self._pending_config
+            self._pending_config = None
+            self._apply_config(*config)
+        offset = 0
+        length = len(block)
+        while offset < length:
+            take = min(self.hop - self._since_fft, length - offset)
+            # 历史缓冲区左移并追加新样本
+            self._history[:-take] = self._history[take:]
+            self._history[-take:] = block[offset:offset + take]
+            offset += take
+            self._since_fft += take
+            if self._since_fft >= self.hop:
+                self._since_fft = 0
+                self._compute()
+        return None
+
+    def _compute(self):
+        """计算一帧频谱并做指数平均"""
+        np.multiply(self._history, self._window, out=self._windowed)
+        spectrum = np.fft.rfft(self._windowed)[:self.bin_count]
+        np.abs(spectrum, out=self._power, casting='same_kind')
+        self._power *= self._scale
+        np.maximum(self._power, 1e-7, out=self._power)
+        np.log10(self._power, out=self._power)
+        self._power *= 20.0
+        if self.averaging > 0:
+            self._average *= self.averaging
+            self._average += (1 - self.averaging) * self._power
+        else:
+            self._average[:] = self._power
+        for listener in self.row_listeners:
+            listener(self._power)
+        self._publish()
+
+    def _publish(self):
+        """按最大帧率把平均后的频谱拷贝到轮换的输出缓冲区并通知界面"""
+        if self.on_frame is None:
+            return
+        now = time.monotonic()
+        if now - self._last_emit < 1.0 / self.max_fps:
+            return
+        self._last_emit = now
+        frame = self._frames[self._frame_index]
+        self._frame_index = (self._frame_index + 1) % len(self._frames)
+        np.copyto(frame, self._average)
+        self.on_frame(self.frequencies, frame)
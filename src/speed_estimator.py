@@ -0,0 +1,129 @@
+import math
+
+class SpeedEstimator:
+    """在线自适应CW速度估计器
+
+    按键（通）分为点、划两类，间隔（断）分为元素间隔、字符间隔、词间隔三类，
+    做在线k均值聚类：每类的中心为 基本单位 × 该类比例。
+    基本单位按"按键 + 其后的间隔"这一对更新（快速，跟踪速度变化）：门限判决和键控沿
+    使按键偏长多少、间隔就偏短多少，两者之和不受影响，只用按键估计会高估速度。
+    点和元素间隔的比例之和固定为2（点周期为2个单位），偏差只体现在这两个比例上。
+    各类比例只做缓慢修正（适应不同手法和Farnsworth间隔），
+    因此速度变化时所有中心同时移动，不会出现长期收不到事件而停滞的类别。
+    每个事件的代价为O(1)，不保存也不回看历史事件。
+    时长单位由调用方决定（如包络样本数），门限使用同一单位。
+    """
+
+    def __init__(self, dot, learning_rate=0.3, ratio_rate=0.05, auto=True):
+        self.learning_rate = learning_rate  # 基本单位的更新系数
+        self.ratio_rate = ratio_rate        # 各类比例的更新系数
+        self.auto = auto       # 关闭时保持固定速度，不再更新
+        self.marks = 0         # 已统计的按键数
+        self.revised = None    # 最近一次add_mark把上一个按键改判后的类别（True为划），未改判为None
+        self.reset(dot)
+
+    def reset(self, dot):
+        """按给定点长度重新初始化（点:划 = 1:3，间隔 1:3:7）"""
+        self.unit = dot
+        self.dash_ratio = 3.0
+        self.element_ratio = 1.0
+        self.char_ratio = 3.0
+        self.word_ratio = 7.0
+        self.interrupt()
+
+    def interrupt(self):
+        """信号中断（如静噪关闭）：之后的按键和间隔不与之前的按键配对"""
+        self._last_mark = None      # 上一个按键的时长和类别，用于发现速度突变
+        self._last_dash = False
+        self._pair_mark = None      # 等待其后间隔配对的按键
+
+    @property
+    def dot(self):
+        return self.unit
+
+    @property
+    def dot_ratio(self):
+        return 2.0 - self.element_ratio
+
+    @property
+    def dash(self):
+        return self.unit * self.dash_ratio
+
+    @property
+    def element_space(self):
+        return self.unit * self.element_ratio
+
+    @property
+    def char_space(self):
+        return self.unit * self.char_ratio
+
+    @property
+    def word_space(self):
+        return self.unit * self.word_ratio
+
+    def add_mark(self, duration):
+        """记录一个按键时长，返回是否为划"""
+        is_dash = duration > self.dash_threshold
+        self.revised = None
+        if not self.auto:
+            return is_dash
+        self.marks += 1
+        last = self._last_mark
+        self._last_mark = duration
+        self._pair_mark = duration
+        if last is not None and is_dash == self._last_dash and \
+                max(last, duration) > 2 * min(last, duration):
+            # 相邻两个按键被归为同一类却相差一倍以上，说明速度已明显变化：
+            # 短者为点、长者为划，直接按这一对重新定位基本单位，上一个按键随之改判
+            is_dash = duration > last
+            if (last > duration) != self._last_dash:
+                self.revised = last > duration
+            self.unit = (min(last, duration) / self.dot_ratio + max(last, duration) / self.dash_ratio) / 2
+            self._last_dash = is_dash
+            return is_dash
+        self._last_dash = is_dash
+        if is_dash:
+            ratio = duration / self.unit
+            self.dash_ratio = min(max(self.dash_ratio + self.ratio_rate * (ratio - self.dash_ratio), 2.0), 4.5)
+        return is_dash
+
+    def add_space(self, duration):
+        """记录一个完整间隔的时长，与之前的按键一起更新基本单位，并修正各类间隔的比例"""
+        if not self.auto:
+            return
+        mark = self._pair_mark
+        self._pair_mark = None
+        if duration > 2 * self.word_space:
+            # 远长于词间隔的停顿不代表速度
+            return
+        if duration < self.char_threshold:
+            kind = 'element_ratio'
+        elif duration < self.word_threshold:
+            kind = 'char_ratio'
+        else:
+            kind = 'word_ratio'
+        space_ratio = getattr(self, kind)
+        if mark is not None:
+            mark_ratio = self.dash_ratio if self._last_dash else self.dot_ratio
+            estimate = (mark + duration) / (mark_ratio + space_ratio)
+            self.unit += self.learning_rate * (estimate - self.unit)
+        setattr(self, kind, space_ratio + self.ratio_rate * (duration / self.unit - space_ratio))
+        # 保持三类间隔的比例关系
+        self.element_ratio = min(max(self.element_ratio, 0.6), 1.4)
+        self.char_ratio = min(max(self.char_ratio, 2 * self.element_ratio), 6.0)
+        self.word_ratio = min(max(self.word_ratio, 1.6 * self.char_ratio), 14.0)
+
+    @property
+    def dash_threshold(self):
+        """长于此值的按键判为划"""
+        return self.unit * math.sqrt(self.dot_ratio * self.dash_ratio)
+
+    @property
+    def char_threshold(self):
+        """长于此值的间隔判为字符结束"""
+        return self.unit * math.sqrt(self.element_ratio * self.char_ratio)
+
+    @property
+    def word_threshold(self):
+        """长于此值的间隔判为词结束"""
+        return self.unit * math.sqrt(self.char_ratio * self.word_ratio)
@@ -0,0 +1,94 @@
+import numpy as np
+
+class ToneDetector:
+    """围绕CW频率的滑动DFT(Goertzel)检测器组
+
+    在cw_bandwidth范围内放置少量检测频点，对每个输入块向量化地完成
+    混频和滑动求和，按毫秒级分辨率输出音调包络（取各频点中的最大幅度）。
+    不需要计算完整频谱，适合低性能电脑上的解码。
+    """
+
+    def __init__(self, sample_rate, frequency=700, bandwidth=150, bins=3, resolution=0.001):
+        self.sample_rate = sample_rate
+        self.bins = bins
+        self.resolution = resolution   # 包络时间分辨率（秒）
+        self.hop = max(1, int(round(sample_rate * resolution)))
+        self.envelope_rate = sample_rate / self.hop
+        self.on_envelope = None        # 每块的包络输出回调(包络数组)
+        self._pending_tuning = None
+        self._block_size = 0
+        self._tune(frequency, bandwidth)
+
+    def retune(self, frequency=None, bandwidth=None):
+        """修改中心频率或带宽，在下一块处理时生效"""
+        self._pending_tuning = (
+            frequency if frequency is not None else self.frequency,
+            bandwidth if bandwidth is not None else self.bandwidth,
+        )
+
+    def _tune(self, frequency, bandwidth):
+        """计算检测频点和窗口长度，并重置滑动状态"""
+        self.frequency = frequency
+        self.bandwidth = bandwidth
+        # 窗口长度决定频率分辨率：主瓣宽度约为 sample_rate / window
+        self.window = max(self.hop, int(self.sample_rate / bandwidth))
+        if self.bins > 1:
+            offsets = np.linspace(-0.5, 0.5, self.bins) * (bandwidth - self.sample_rate / self.window)
+        else:
+            offsets = np.zeros(1)
+        self.bin_frequencies = frequency + offsets
+        self._omega = 2 * np.pi * self.bin_frequencies / self.sample_rate
+        self._phase = np.zeros(self.bins)
+        # 前一块末尾的混频结果，保证滑动求和跨块连续
+        self._tail = np.zeros((self.bins, self.window), dtype=np.complex64)
+        # 下一个输出点相对当前块起点的位置，保证输出时刻跨块等间隔
+        self._next_end = self.hop
+        self._block_size = 0
+        self._scale = np.float32(2.0 / self.window)
+
+    def _prepare(self, block_size):
+        """按块长预计算各频点的本振序列"""
+        self._block_size = block_size
+        n = np.arange(block_size)
+        self._oscillator = np.exp(-1j * np.outer(self._omega, n)).astype(np.complex64)
+        self._mixed = np.zeros((self.bins, self.window + block_size), dtype=np.complex64)
+        self._cumulative = np.zeros((self.bins, self.window + block_size + 1), dtype=np.complex64)
+
+    def process(self, block):
+        """接收引擎处理级接口：输出本块的包络，不改变音频数据"""
+        envelope = self.detect(block)
+        if self.on_envelope is not None and len(envelope):
+            self.on_envelope(envelope)
+        return None
+
+    def detect(self, block):
+        """计算一块音频的音调包络，返回按hop间隔采样的幅度数组"""
+        if self._pending_tuning is not None:
+            tuning = self._pending_tuning
+            self._pending_tuning = None
+            self._tune(*tuning)
+        length = len(block)
+        if length != self._block_size:
+            self._prepare(length)
+        window = self.window
+        mixed = self._mixed
+        # 拼接上一块的尾部，再写入本块的混频结果（带连续相位）
+        mixed[:, :window] = self._tail
+        rotation = np.exp(-1j * self._phase).astype(np.complex64)
+        np.multiply(self._oscillator, block, out=mixed[:, window:])
+        mixed[:, window:] *= rotation[:, None]
+        self._phase = (self._phase + self._omega * length) % (2 * np.pi)
+        self._tail[:] = mixed[:, length:]
+
+        # 在hop对齐的位置取窗口长度内的滑动和
+        positions = np.arange(self._next_end, length + 1, self.hop)
+        if not len(positions):
+            self._next_end -= length
+            return np.zeros(0, dtype=np.float32)
+        self._next_end = positions[-1] + self.hop - length
+        ends = positions + window
+        cumulative = self._cumulative
+        np.cumsum(mixed, axis=1, out=cumulative[:, 1:])
+        sums = cumulative[:, ends] - cumulative[:, ends - window]
+        magnitude = np.abs(sums).max(axis=0)
+        return (magnitude * self._scale).astype(np.float32)
@@ -0,0 +1,133 @@
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+OFF = 100
+
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR', OFF: 'OFF'}
+
+
+def parse_level(name):
+    """把级别名（debug/info/warning/error/off）或数字转换为级别值"""
+    if isinstance(name, int):
+        return name
+    name = str(name).strip().upper()
+    if name.isdigit():
+        return int(name)
+    for level, level_name in LEVEL_NAMES.items():
+        if level_name == name:
+            return level
+    raise ValueError(f"未知的跟踪级别: {name}")
+
+
+class Tracer:
+    """低开销的结构化跟踪
+
+    每个事件记录为(时间戳, 线程名, 级别, 消息模板, 参数元组)，写入固定容量的环形缓冲区，
+    记录时不做任何字符串格式化，只有输出或导出时才按模板格式化。
+    低于当前级别的调用在方法入口的一次整数比较后直接返回；
+    循环中可先判断 `trace.level <= DEBUG`，连参数元组也不必构造。
+
+    默认级别为WARNING：调试和一般事件不记录，警告和错误照常输出到标准错误。
+    级别低于echo_level的事件只保存在缓冲区中，出现异常时随错误一起导出最近的记录。
+    """
+
+    def __init__(self, level=WARNING, capacity=4096, echo_level=WARNING, stream=None):
+        self.level = level
+        self.echo_level = echo_level   # 不低于此级别的事件立即输出
+        self.stream = stream           # 输出目标，None表示sys.stderr
+        self._events = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def configure(self, level=None, capacity=None, echo_level=None):
+        """修改级别、缓冲区容量或立即输出的级别"""
+        if level is not None:
+            self.level = parse_level(level)
+        if echo_level is not None:
+            self.echo_level = parse_level(echo_level)
+        if capacity is not None and capacity != self._events.maxlen:
+            with self._lock:
+                self._events = deque(self._events, maxlen=capacity)
+
+    def debug(self, message, *args):
+        if self.level <= DEBUG:
+            self._record(DEBUG, message, args)
+
+    def info(self, message, *args):
+        if self.level <= INFO:
+            self._record(INFO, message, args)
+
+    def warning(self, message, *args):
+        if self.level <= WARNING:
+            self._record(WARNING, message, args)
+
+    def error(self, message, *args):
+        if self.level <= ERROR:
+            self._record(ERROR, message, args)
+
+    def exception(self, message, *args):
+        """记录错误和当前异常的调用栈；有未输出的事件时同时导出最近的记录"""
+        if self.level > ERROR:
+            return
+        if self.level < self.echo_level:
+            self._write("最近的跟踪记录:")
+            self.dump(last=200)
+        self._record(ERROR, message + '\n{}', args + (traceback.format_exc().rstrip(),))
+
+    def _record(self, level, message, args):
+        event = (time.perf_counter(), threading.current_thread().name, level, message, args)
+        # deque.append在CPython中是原子操作，不需要加锁
+        self._events.append(event)
+        if level >= self.echo_level:
+            self._write(self.format(event))
+
+    @staticmethod
+    def format(event):
+        """格式化一条事件记录"""
+        timestamp, thread, level, message, args = event
+        try:
+            text = message.format(*args)
+        except (IndexError, KeyError, ValueError):
+            text = f"{message} {args!r}"
+        return f"{timestamp:12.6f} {LEVEL_NAMES.get(level, level):7} [{thread}] {text}"
+
+    def events(self):
+        """返回缓冲区中的事件记录（从旧到新）"""
+        with self._lock:
+            return list(self._events)
+
+    def dump(self, stream=None, last=None):
+        """把最近的事件格式化输出（默认输出到标准错误）"""
+        events = self.events()
+        if last is not None:
+            events = events[-last:]
+        self._write('\n'.join(self.format(event) for event in events), stream)
+
+    def clear(self):
+        self._events.clear()
+
+    def _write(self, text, stream=None):
+        stream = stream or self.stream or sys.stderr
+        try:
+            stream.write(text + '\n')
+            stream.flush()
+        except (OSError, ValueError):
+            pass
+
+
+# 全局跟踪器，默认只记录警告和错误。
+# 环境变量AUTOMORSE_TRACE设置记录级别（如debug）：事件只保存在缓冲区中，出错时导出；
+# 程序的--trace参数则同时把事件实时输出到标准错误。
+trace = Tracer()
+if os.environ.get('AUTOMORSE_TRACE'):
+    try:
+        trace.configure(level=os.environ['AUTOMORSE_TRACE'])
+    except ValueError as e:
+        print(e, file=sys.stderr)
@@ -0,0 +1,275 @@
+import threading
+import time
+import types
+import numpy as np
+from morse_utils import MorseUtils
+
+OUTPUT_DEVICE = 0   # 虚拟输出设备号
+INPUT_DEVICE = 1    # 虚拟输入设备号
+
+
+class FrequencyShifter:
+    """流式频移：Hilbert FIR求解析信号，再与复振荡器相乘取实部
+
+    offset为固定频移(Hz)，drift为频移随时间的变化率(Hz/秒)，用于模拟发信机的频率漂移。
+    不频移时直接返回输入，不引入延迟；频移时延迟为(taps-1)/2个样本。
+    """
+
+    def __init__(self, sample_rate, offset=0.0, drift=0.0, taps=127):
+        self.sample_rate = sample_rate
+        self.offset = offset
+        self.drift = drift
+        n = np.arange(taps) - (taps - 1) // 2
+        h = np.zeros(taps)
+        odd = n % 2 != 0
+        h[odd] = 2.0 / (np.pi * n[odd])
+        self._taps = h * np.blackman(taps)
+        self._delay = (taps - 1) // 2
+        self._history = np.zeros(taps - 1)
+        self._phase = 0.0
+        self._position = 0
+
+    @property
+    def active(self):
+        return self.offset != 0 or self.drift != 0
+
+    def process(self, block):
+        if not self.active:
+            self._position += len(block)
+            return block
+        count = len(block)
+        x = np.concatenate([self._history, block])
+        imag = np.convolve(x, self._taps, 'valid')[:count]
+        real = x[len(self._history) - self._delay:len(self._history) - self._delay + count]
+        self._history = x[count:]
+        t = (self._position + np.arange(count)) / self.sample_rate
+        phase = self._phase + 2 * np.pi * np.cumsum(self.offset + self.drift * t) / self.sample_rate
+        self._phase = phase[-1] % (2 * np.pi)
+        self._position += count
+        return real * np.cos(phase) - imag * np.sin(phase)
+
+
+class ChannelModel:
+    """信道模型：增益、频移/频率漂移和QSB衰落
+
+    QSB按正弦规律衰落，depth为衰落深度（0~1，1表示周期性完全消失），rate为衰落频率(Hz)。
+    """
+
+    def __init__(self, sample_rate, gain=1.0, offset=0.0, drift=0.0, qsb_depth=0.0, qsb_rate=0.2):
+        self.sample_rate = sample_rate
+        self.gain = gain
+        self.qsb_depth = qsb_depth
+        self.qsb_rate = qsb_rate
+        self.shifter = FrequencyShifter(sample_rate, offset, drift)
+
+    def process(self, block, position):
+        """处理从绝对样本位置position开始的一块信号"""
+        output = self.shifter.process(block) * self.gain
+        if self.qsb_depth > 0:
+            t = (position + np.arange(len(block))) / self.sample_rate
+            output = output * (1 - self.qsb_depth * 0.5 * (1 - np.cos(2 * np.pi * self.qsb_rate * t)))
+        return output
+
+
+class VirtualSender:
+    """虚拟电台：从start秒开始发出一段CW报文，repeat为True时循环发送
+
+    channel可指定该电台单独的信道模型（频率漂移、QSB）。
+    """
+
+    def __init__(self, sample_rate, text, frequency=700, wpm=20, amplitude=0.5, start=0.0,
+                 repeat=False, channel=None):
+        morse = MorseUtils(sample_rate)
+        # 与发送相同的标准间隔（字符间3单位、词间7单位）；循环发送时末尾补一个词间隔
+        audio = morse.morse_to_audio(morse.text_to_morse(text + (' ' if repeat else '')), frequency, wpm)
+        self.text = text
+        self.audio = amplitude * audio
+        self.start = int(start * sample_rate)
+        self.repeat = repeat
+        self.channel = channel
+
+    def render(self, position, count):
+        """返回绝对样本位置[position, position+count)的信号"""
+        output = np.zeros(count)
+        offsets = np.arange(position, position + count) - self.start
+        if self.repeat:
+            valid = offsets >= 0
+            output[valid] = self.audio[offsets[valid] % len(self.audio)]
+        else:
+            valid = (offsets >= 0) & (offsets < len(self.audio))
+            output[valid] = self.audio[offsets[valid]]
+        if self.channel is not None:
+            output = self.channel.process(output, position)
+        return output
+
+
+class VirtualStream:
+    """虚拟音频流，接口与sounddevice的流相同"""
+
+    def __init__(self, backend, kind, samplerate=None, blocksize=0, device=None, channels=1,
+                 dtype=None, latency=None, callback=None):
+        expected = OUTPUT_DEVICE if kind == 'output' else INPUT_DEVICE
+        if device not in (None, expected):
+            raise ValueError(f"虚拟声卡没有设备 {device}")
+        if samplerate not in (None, backend.sample_rate):
+            raise ValueError(f"虚拟声卡只支持 {backend.sample_rate} Hz")
+        self.backend = backend
+        self.kind = kind
+        self.samplerate = backend.sample_rate
+        self.blocksize = blocksize or backend.quantum
+        self.channels = channels
+        self.callback = callback
+        self.latency = self.blocksize / self.samplerate
+        self.active = False
+        self.closed = False
+        self.started_at = None   # 流开始时的虚拟时钟（样本数）
+        self._fifo = np.zeros(0, dtype=np.float32)
+        self._status = types.SimpleNamespace(output_underflow=False, input_overflow=False)
+
+    def start(self):
+        self.started_at = self.backend.clock
+        self.active = True
+        self.backend._attach(self)
+
+    def stop(self):
+        self.active = False
+        self.backend._detach(self)
+
+    abort = stop
+
+    def close(self):
+        self.stop()
+        self.closed = True
+
+    def _pull(self, count):
+        """输出流：向回调取出count个样本"""
+        while len(self._fifo) < count:
+            outdata = np.zeros((self.blocksize, self.channels), dtype=np.float32)
+            now = self.backend.clock / self.samplerate
+            time_info = types.SimpleNamespace(currentTime=now, outputBufferDacTime=now + self.latency)
+            self.callback(outdata, self.blocksize, time_info, self._status)
+            self._fifo = np.concatenate([self._fifo, outdata[:, 0]])
+        samples, self._fifo = self._fifo[:count], self._fifo[count:]
+        return samples
+
+    def _push(self, samples):
+        """输入流：送入样本，凑满一块时调用回调"""
+        self._fifo = np.concatenate([self._fifo, samples.astype(np.float32)])
+        while len(self._fifo) >= self.blocksize:
+            block, self._fifo = self._fifo[:self.blocksize], self._fifo[self.blocksize:]
+            now = self.backend.clock / self.samplerate
+            time_info = types.SimpleNamespace(currentTime=now, inputBufferAdcTime=now - self.latency)
+            self.callback(block.reshape(-1, 1), self.blocksize, time_info, self._status)
+
+
+class VirtualAudio:
+    """进程内的虚拟声卡，接口与sounddevice相同，用 audio_backend.use() 安装
+
+    设备0为虚拟输出、设备1为虚拟输入。输出流的声音经信道模型（频移和漂移、QSB）
+    与虚拟电台的信号、高斯噪声混合后送入输入流，形成发射到接收的环回。
+    时钟以样本计数：speed为实时倍数时由后台线程按该速度推进；
+    speed为None时只在调用advance()时推进。噪声使用固定种子，相同参数得到相同的信号。
+    record为True时保存所有输出流混合后的信号（transmitted()），用于测量发射时序。
+    """
+
+    def __init__(self, sample_rate=44100, quantum=256, speed=1.0, noise=0.0, channel=None,
+                 seed=0, record=False):
+        self.sample_rate = sample_rate
+        self.quantum = quantum
+        self.speed = speed
+        self.noise = noise
+        self.channel = channel or ChannelModel(sample_rate)
+        self.senders = []
+        self.clock = 0            # 虚拟时钟（样本数）
+        self.record = record
+        self._recording = []
+        self._rng = np.random.default_rng(seed)
+        self._streams = []
+        self._lock = threading.RLock()
+        self._thread = None
+
+    # sounddevice接口
+
+    def query_devices(self):
+        return [
+            {'name': 'Virtual Loopback Output', 'hostapi': 0, 'max_input_channels': 0,
+             'max_output_channels': 1, 'default_samplerate': float(self.sample_rate)},
+            {'name': 'Virtual Loopback Input', 'hostapi': 0, 'max_input_channels': 1,
+             'max_output_channels': 0, 'default_samplerate': float(self.sample_rate)},
+        ]
+
+    def query_hostapis(self):
+        return [{'name': 'Virtual', 'devices': [OUTPUT_DEVICE, INPUT_DEVICE]}]
+
+    def _terminate(self):
+        pass
+
+    def _initialize(self):
+        pass
+
+    def OutputStream(self, **kwargs):
+        return VirtualStream(self, 'output', **kwargs)
+
+    def InputStream(self, **kwargs):
+        return VirtualStream(self, 'input', **kwargs)
+
+    # 虚拟信道
+
+    def add_sender(self, sender):
+        """加入一个虚拟电台"""
+        with self._lock:
+            self.senders.append(sender)
+
+    def advance(self, frames):
+        """推进虚拟时钟frames个样本（按quantum取整），在调用线程中执行各流的回调"""
+        with self._lock:
+            for _ in range(max(1, int(np.ceil(frames / self.quantum)))):
+                self._tick()
+
+    def transmitted(self):
+        """record为True时，返回从时钟0开始所有输出流混合后的信号"""
+        with self._lock:
+            return np.concatenate(self._recording) if self._recording else np.zeros(0)
+
+    def _tick(self):
+        count = self.quantum
+        position = self.clock
+        output = np.zeros(count)
+        for stream in list(self._streams):
+            if stream.kind == 'output':
+                output += stream._pull(count)
+        if self.record:
+            self._recording.append(output.astype(np.float32))
+        air = self.channel.process(output, position)
+        for sender in self.senders:
+            air = air + sender.render(position, count)
+        if self.noise > 0:
+            air = air + self._rng.normal(0, self.noise, count)
+        for stream in list(self._streams):
+            if stream.kind == 'input':
+                stream._push(air)
+        self.clock += count
+
+    def _attach(self, stream):
+        with self._lock:
+            if stream not in self._streams:
+                self._streams.append(stream)
+            if self.speed is not None and self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='virtual-audio', daemon=True)
+                self._thread.start()
+
+    def _detach(self, stream):
+        with self._lock:
+            if stream in self._streams:
+                self._streams.remove(stream)
+
+    def _run(self):
+        """按speed倍实时推进时钟，模拟声卡的回调节奏"""
+        started = time.monotonic()
+        start_clock = self.clock
+        interval = self.quantum / self.sample_rate / self.speed
+        while True:
+            target = start_clock + (time.monotonic() - started) * self.speed * self.sample_rate
+            while self.clock + self.quantum <= target:
+                self.advance(self.quantum)
+            time.sleep(interval)
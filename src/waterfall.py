@@ -0,0 +1,112 @@
+import numpy as np
+import pyqtgraph as pg
+from PyQt6.QtCore import QTimer, QRectF
+
+class WaterfallBuffer:
+    """固定大小的循环瀑布图缓冲区
+
+    图像按两倍历史深度分配，每行同时写入head和head+depth两处，
+    因此任意时刻最近depth行都是一段连续切片，显示时不需要np.roll或整体拷贝。
+    数据量化为uint8色阶索引，内存占用与运行时长无关。
+    """
+
+    def __init__(self, width, depth=300, min_db=-120.0, max_db=0.0):
+        self.depth = depth
+        self.min_db = min_db
+        self.max_db = max_db
+        self.rows_written = 0  # 累计写入行数，界面据此判断是否需要刷新
+        self._pending_depth = None  # 界面请求的新深度，由写入端在下一行时生效
+        self._allocate(width, depth)
+
+    def _allocate(self, width, depth):
+        """按宽度和深度分配图像缓冲区（只在构造和写入端调用）"""
+        image = np.zeros((2 * depth, width), dtype=np.uint8)
+        self._scaled = np.zeros(width, dtype=np.float32)
+        self.width = width
+        self.head = 0
+        self._image = image
+        self.depth = depth
+
+    def set_depth(self, depth):
+        """修改历史深度（清空已有内容），在界面线程中调用
+
+        缓冲区由写入端（接收工作线程）在写入下一行前重新分配，两个线程不会同时分配。
+        """
+        self._pending_depth = depth
+
+    def push_row(self, power_db):
+        """写入一行频谱（dB），在接收工作线程中调用"""
+        depth = self._pending_depth
+        if depth is not None:
+            self._pending_depth = None
+            self._allocate(len(power_db), depth)
+        elif len(power_db) != self.width:
+            self._allocate(len(power_db), self.depth)
+        scaled = self._scaled
+        np.subtract(power_db, self.min_db, out=scaled)
+        scaled *= 255.0 / (self.max_db - self.min_db)
+        np.clip(scaled, 0, 255, out=scaled)
+        row = self.head
+        self._image[row] = scaled
+        self._image[row + self.depth] = self._image[row]
+        self.head = (row + 1) % self.depth
+        self.rows_written += 1
+
+    def view(self):
+        """返回按时间从旧到新排列的最近depth行（零拷贝切片）"""
+        image = self._image
+        depth = len(image) // 2
+        # 写入端可能刚重新分配过缓冲区，head按取到的图像限定范围
+        start = min(self.head, depth)
+        return image[start:start + depth]
+
+
+class WaterfallView:
+    """基于pg.ImageItem的瀑布图显示，刷新率独立于FFT帧率"""
+
+    def __init__(self, plot_widget, width=1, depth=300, refresh_hz=15, colormap='inferno'):
+        self.plot_widget = plot_widget
+        self.buffer = WaterfallBuffer(width, depth)
+        self.frequency_span = None
+        self._last_rows = 0
+        self.image = pg.ImageItem(axisOrder='row-major')
+        # 预先计算256级色阶查找表，绘制时只做索引查表
+        lut = pg.colormap.get(colormap).getLookupTable(0.0, 1.0, 256)
+        self.image.setLookupTable(lut)
+        self.image.setLevels([0, 255])
+        plot_widget.addItem(self.image)
+        plot_widget.setLabel('bottom', "频率", units='Hz')
+        plot_widget.setLabel('left', "时间")
+        self.timer = QTimer(plot_widget)
+        self.timer.setInterval(int(1000 / refresh_hz))
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start()
+
+    def set_refresh_rate(self, refresh_hz):
+        """修改刷新率"""
+        self.timer.setInterval(int(1000 / refresh_hz))
+
+    def set_depth(self, depth):
+        """修改历史深度"""
+        self.buffer.set_depth(depth)
+        self._update_rect()
+
+    def set_frequency_span(self, frequency_span):
+        """设置横轴对应的频率范围(Hz)"""
+        if frequency_span != self.frequency_span:
+            self.frequency_span = frequency_span
+            self._update_rect()
+
+    def _update_rect(self):
+        """将图像映射到频率-时间坐标"""
+        if self.frequency_span:
+            self.image.setRect(QRectF(0, 0, self.frequency_span, self.buffer.depth))
+
+    def refresh(self):
+        """定时刷新：有新数据时才重新设置图像"""
+        rows = self.buffer.rows_written
+        if rows == self._last_rows:
+            return
+        self._last_rows = rows
+        self.image.setImage(self.buffer.view(), autoLevels=False)
+        self._update_rect()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 与程序运行时相同，直接按模块名导入src下的模块
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
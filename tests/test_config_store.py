@@ -0,0 +1,64 @@
+import json
+import os
+from config_store import ConfigStore
+
+CONFIG = {'callsign': 'BG7XYZ', 'wpm': 20, 'monitor_audio': True}
+
+
+def test_save_writes_once_after_last_change(tmp_path):
+    path = str(tmp_path / 'config.json')
+    store = ConfigStore(path, delay=60)
+    # 连续修改只保留最新的配置，close()时写出一次
+    for wpm in range(15, 25):
+        store.save(dict(CONFIG, wpm=wpm))
+    store.close()
+    assert store.writes == 1
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f)['wpm'] == 24
+
+
+def test_unchanged_config_is_not_rewritten(tmp_path):
+    path = str(tmp_path / 'config.json')
+    store = ConfigStore(path, delay=60)
+    store.save(CONFIG)
+    store.flush()
+    mtime = os.stat(path).st_mtime_ns
+    store.save(dict(CONFIG))
+    store.close()
+    assert store.writes == 1
+    assert os.stat(path).st_mtime_ns == mtime
+
+    # 重新启动后保存与文件内容相同的配置同样不写
+    store = ConfigStore(path, delay=60)
+    assert store.load() == CONFIG
+    store.save(CONFIG)
+    store.close()
+    assert store.writes == 0
+
+
+def test_write_replaces_file_atomically(tmp_path, monkeypatch):
+    path = str(tmp_path / 'config.json')
+    store = ConfigStore(path, delay=60)
+    store.save(CONFIG)
+    store.flush()
+    assert sorted(os.listdir(tmp_path)) == ['config.json']
+
+    # 替换失败（如写到一半崩溃）时原文件保持完整
+    def fail_replace(src, dst):
+        raise OSError("disk full")
+    monkeypatch.setattr(os, 'replace', fail_replace)
+    store.save(dict(CONFIG, wpm=30))
+    store.close()
+    assert store.writes == 1
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f) == CONFIG
+
+
+def test_corrupt_file_is_backed_up(tmp_path):
+    path = tmp_path / 'config.json'
+    path.write_text('{"wpm": 2', encoding='utf-8')
+    store = ConfigStore(str(path), delay=60)
+    assert store.load() is None
+    store.close()
+    assert not path.exists()
+    assert (tmp_path / 'config.json.bad').read_text(encoding='utf-8') == '{"wpm": 2'
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from cw_decoder import CwDecoder
+from dsp import BandpassFilter
+from morse_utils import MorseUtils
+from noise_reduction import NoiseReducer
+from tone_detector import ToneDetector
+
+SAMPLE_RATE = 8000
+FREQUENCY = 700
+BLOCK = 186
+TEXT = "CQ CQ DE BG7XYZ K"
+
+
+def _decode(audio, wpm=20, denoise=False):
+    """按实时接收链（带通、降噪、音调检测）逐块解码，返回(文本, 解码器)"""
+    bandpass = BandpassFilter(SAMPLE_RATE, FREQUENCY, 150)
+    reducer = NoiseReducer(SAMPLE_RATE) if denoise else None
+    detector = ToneDetector(SAMPLE_RATE, FREQUENCY, 150)
+    decoder = CwDecoder(detector.envelope_rate, wpm=wpm)
+    chars = []
+    for start in range(0, len(audio) - BLOCK + 1, BLOCK):
+        block = bandpass.process(audio[start:start + BLOCK])
+        if reducer is not None:
+            block = reducer.process(block)
+        envelope = detector.detect(block)
+        if len(envelope):
+            chars += decoder.process(envelope)
+    return ''.join(char for _, char in chars), decoder
+
+
+def _cw(text, wpm, amplitude=0.5):
+    """CW音频，末尾带一个词间隔"""
+    morse = MorseUtils(SAMPLE_RATE)
+    return amplitude * morse.morse_to_audio(morse.text_to_morse(text + ' '), FREQUENCY, wpm)
+
+
+@pytest.mark.parametrize('denoise', [False, True])
+def test_noise_only_emits_nothing(denoise):
+    noise = np.random.default_rng(0).normal(0, 0.3, SAMPLE_RATE * 30).astype(np.float32)
+    text, decoder = _decode(noise, denoise=denoise)
+    assert text == ''
+    assert decoder.squelched
+
+
+@pytest.mark.parametrize('denoise', [False, True])
+def test_signal_in_noise_decodes_from_first_character(denoise):
+    rng = np.random.default_rng(1)
+    audio = np.concatenate([np.zeros(SAMPLE_RATE * 2), _cw(TEXT, 20), np.zeros(SAMPLE_RATE * 5)])
+    audio += rng.normal(0, 0.3, len(audio))
+    text, decoder = _decode(audio.astype(np.float32), denoise=denoise)
+    # 信号结束后的噪声不输出字符，静噪随后关闭
+    assert text.split() == TEXT.split()
+    assert decoder.squelched
+
+
+@pytest.mark.parametrize('wpm, start', [(5, 20), (10, 20), (40, 20), (60, 20), (60, 5)])
+def test_sender_speed_is_tracked_from_initial_estimate(wpm, start):
+    audio = np.concatenate([np.zeros(SAMPLE_RATE), _cw(TEXT, wpm), np.zeros(SAMPLE_RATE * 3)])
+    text, decoder = _decode(audio.astype(np.float32), wpm=start)
+    # 第一个字符可能在测速完成前被拆开，从第二个词起必须完全正确
+    assert text.split()[1:] == TEXT.split()[1:]
+    assert decoder.wpm == pytest.approx(wpm, rel=0.05)
+
+
+def test_speed_change_mid_transmission():
+    audio = np.concatenate([np.zeros(SAMPLE_RATE), _cw(TEXT, 20), _cw(TEXT, 40), np.zeros(SAMPLE_RATE * 2)])
+    text, decoder = _decode(audio.astype(np.float32), wpm=20)
+    assert text.split() == TEXT.split() * 2
+    assert decoder.wpm == pytest.approx(40, rel=0.05)
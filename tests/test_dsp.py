@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from dsp import Decimator, choose_working_rate
+
+
+def _gain_db(input_rate, output_rate, frequency, duration=0.3):
+    """单音经抽取后的增益(dB)，跳过起始瞬态"""
+    decimator = Decimator(input_rate, output_rate)
+    t = np.arange(int(duration * input_rate)) / input_rate
+    output = decimator.process(np.sin(2 * np.pi * frequency * t).astype(np.float32))
+    output = output[len(output) // 3:].astype(np.float64)
+    return 20 * np.log10(np.sqrt(2 * np.mean(output ** 2)) + 1e-12)
+
+
+@pytest.mark.parametrize('input_rate, bandwidth', [(44100, 3000), (48000, 3000), (48000, 6000)])
+def test_decimator_keeps_band_and_rejects_aliases(input_rate, bandwidth):
+    working_rate = choose_working_rate(bandwidth, input_rate)
+    assert working_rate < input_rate
+    assert abs(_gain_db(input_rate, working_rate, bandwidth)) < 0.1
+    # 从 工作采样率-采集带宽 起的信号会折叠进采集带宽，至少衰减60 dB
+    stopband = np.linspace(working_rate - bandwidth, input_rate / 2 - 100, 25)
+    assert max(_gain_db(input_rate, working_rate, f) for f in stopband) < -60
+
+
+def test_decimator_blocks_match_whole_signal():
+    signal = np.random.default_rng(0).normal(0, 1, 44100).astype(np.float32)
+    whole = Decimator(44100, 8000).process(signal)
+    decimator = Decimator(44100, 8000)
+    blocks = np.concatenate([decimator.process(signal[i:i + 1024]) for i in range(0, len(signal), 1024)])
+    assert np.allclose(blocks, whole, atol=1e-5)
@@ -0,0 +1,31 @@
+import os
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+QtWidgets = pytest.importorskip('PyQt6.QtWidgets')
+
+import audio_backend
+from virtual_audio import VirtualAudio
+
+
+@pytest.fixture
+def window(tmp_path, monkeypatch):
+    """在虚拟声卡上创建主窗口，配置文件写到临时目录"""
+    monkeypatch.chdir(tmp_path)
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    audio_backend.use(VirtualAudio())
+    import main
+    window = main.AutoMorseMainWindow()
+    app.processEvents()
+    yield window
+    window.close()
+    audio_backend.use(None)
+
+
+def test_test_tone_button_toggles_once_per_click(window):
+    window.test_tone_btn.click()
+    assert window.audio_manager.is_testing
+    assert window.test_tone_btn.text() == "停止测试"
+    window.test_tone_btn.click()
+    assert not window.audio_manager.is_testing
+    assert window.test_tone_btn.text() == "测试音频"
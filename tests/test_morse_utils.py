@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+from morse_utils import MorseUtils, MorseDecoder
+
+SAMPLE_RATE = 8000
+
+
+def _edges(audio):
+    """在包络50%处判定按下和抬起位置（样本）"""
+    # 解析信号的模即包络：去掉负频率、正频率加倍
+    spectrum = np.fft.fft(audio)
+    weights = np.zeros(len(audio))
+    weights[0] = 1
+    weights[1:(len(audio) + 1) // 2] = 2
+    if len(audio) % 2 == 0:
+        weights[len(audio) // 2] = 1
+    envelope = np.abs(np.fft.ifft(spectrum * weights))
+    key = envelope > 0.5
+    changes = np.diff(key.astype(np.int8))
+    return np.flatnonzero(changes == 1) + 1, np.flatnonzero(changes == -1) + 1
+
+
+@pytest.mark.parametrize('wpm', [20, 60])
+def test_keying_edges_are_centred_on_nominal_timing(wpm):
+    morse = MorseUtils(SAMPLE_RATE, rise_time=0.005)
+    audio = morse.morse_to_audio('.-', 1000, wpm)
+    unit = 60 / (50 * wpm) * SAMPLE_RATE
+    downs, ups = _edges(audio)
+    marks = (ups - downs) / unit
+    assert marks == pytest.approx([1, 3], abs=0.02)
+    assert (downs[1] - ups[0]) / unit == pytest.approx(1, abs=0.02)
+
+
+def test_character_audio_keeps_nominal_length():
+    morse = MorseUtils(SAMPLE_RATE, rise_time=0.005)
+    # 点 + 元素间隔 + 划 + 元素间隔 = 6单位，逐字符拼接时间隔不变
+    unit = int(60 / (50 * 20) * SAMPLE_RATE)
+    assert len(morse.morse_to_audio('.-', 700, 20)) == 6 * unit
+
+
+def test_no_ramp_renders_square_keying():
+    morse = MorseUtils(SAMPLE_RATE, rise_time=0)
+    audio = morse.morse_to_audio('.', 1000, 20)
+    unit = int(60 / (50 * 20) * SAMPLE_RATE)
+    assert np.abs(audio[:unit]).max() > 0.99
+    assert not audio[unit:].any()
+
+
+@pytest.mark.parametrize('wpm', [20, 60])
+def test_text_gaps_are_three_and_seven_units(wpm):
+    morse = MorseUtils(SAMPLE_RATE, rise_time=0.005)
+    audio = morse.morse_to_audio(morse.text_to_morse('EE E'), 1000, wpm)
+    unit = 60 / (50 * wpm) * SAMPLE_RATE
+    downs, ups = _edges(audio)
+    # 字符间隔3单位、词间隔7单位，末尾的词间隔之后长度按标称计算
+    assert (downs[1:] - ups[:-1]) / unit == pytest.approx([3, 7], abs=0.02)
+    assert len(morse.morse_to_audio(morse.text_to_morse('E '), 1000, wpm)) == int(unit) * 8
+
+
+def test_cq_audio_uses_character_and_word_gaps():
+    morse = MorseUtils(SAMPLE_RATE, rise_time=0.005)
+    audio = morse.generate_cq_audio(1000, 20)
+    unit = 60 / (50 * 20) * SAMPLE_RATE
+    downs, ups = _edges(audio)
+    gaps = np.round((downs[1:] - ups[:-1]) / unit)
+    # C和Q之间3单位，CQ之间7单位，其余为1单位的元素间隔
+    assert [gap for gap in gaps if gap > 1] == [3, 7, 3, 7, 3]
+    assert set(gaps) == {1, 3, 7}
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('CQ\nDE', ('CQ DE', 5)),
+    ('a<ar>', ('A<AR>', 5)),
+    ('X <AB> K', ('X AB K', 8)),
+    ('TU <S', ('TU ', 3)),
+    ('<<KN>', ('<KN>', 5)),
+])
+def test_prepare_send_keeps_only_encodable_text(text, expected):
+    morse = MorseUtils(SAMPLE_RATE)
+    assert morse.prepare_send(text) == expected
+    send, _ = morse.prepare_send(text)
+    assert all(token == ' ' or morse.encode_token(token) for token in morse.tokenize(send))
+
+
+@pytest.mark.parametrize('text', [
+    'CQ CQ DE BG7XYZ K',
+    'HELLO, WORLD? 73 <AR>',
+    ' A B',
+    'A B ',
+])
+def test_morse_to_text_round_trip(text):
+    morse = MorseUtils(SAMPLE_RATE)
+    assert morse.morse_to_text(morse.text_to_morse(text)) == text
+
+
+def test_decoder_stays_overflowed_until_character_ends():
+    decoder = MorseDecoder()
+    # 8个点已超出编码表，其后的划不能回到根节点重新开始
+    for dash in [False] * 8 + [True, False]:
+        decoder.push(dash)
+    assert decoder.pending
+    assert decoder.end_char() == '*'
+    assert not decoder.pending
+    for dash in (True, False):
+        decoder.push(dash)
+    assert decoder.end_char() == 'N'
+    assert MorseUtils(SAMPLE_RATE).morse_to_text('........-. -.') == '*N'
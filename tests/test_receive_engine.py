@@ -0,0 +1,36 @@
+import pytest
+import audio_backend
+from output_channel import OutputChannel
+from receive_engine import ReceiveEngine
+from virtual_audio import VirtualAudio, INPUT_DEVICE, OUTPUT_DEVICE
+
+
+@pytest.fixture
+def backend():
+    backend = VirtualAudio(speed=None)
+    audio_backend.use(backend)
+    yield backend
+    audio_backend.use(None)
+
+
+def _failing_abort():
+    raise RuntimeError("abort failed")
+
+
+def test_input_stream_closed_when_abort_fails(backend):
+    engine = ReceiveEngine(backend.sample_rate)
+    engine.start(INPUT_DEVICE)
+    stream = engine.stream
+    stream.abort = _failing_abort
+    engine.stop()
+    assert stream.closed
+    assert engine.stream is None and not engine.running
+
+
+def test_output_stream_closed_when_abort_fails(backend):
+    channel = OutputChannel(OUTPUT_DEVICE, backend.sample_rate)
+    channel.open()
+    stream = channel.stream
+    stream.abort = _failing_abort
+    channel.close()
+    assert stream.closed
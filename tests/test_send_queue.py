@@ -0,0 +1,55 @@
+import random
+from send_queue import SendQueue
+
+
+def _apply(doc, queue, position, removed, inserted):
+    """在文档上执行编辑并同步队列，返回新文档"""
+    queue.edit(position, removed, inserted)
+    return doc[:position] + inserted + doc[position + removed:]
+
+
+def test_typing_after_sent_prefix_is_queued():
+    queue = SendQueue()
+    queue.reset(3, '')
+    doc = _apply('CQ ', queue, 3, 0, 'DE')
+    assert queue.offset == 3
+    assert queue.text() == 'DE'
+    queue.take(2)
+    assert queue.offset == 5 and not queue
+    doc = _apply(doc, queue, 5, 0, ' K')
+    assert queue.text() == doc[queue.offset:] == ' K'
+
+
+def test_edit_inside_sent_prefix_only_moves_offset():
+    queue = SendQueue()
+    queue.reset(5, 'XY')
+    # 在已发送部分插入和删除：不重新发送，只调整前缀长度
+    doc = _apply('CQ DEXY', queue, 2, 0, 'CQ')
+    assert (queue.offset, queue.text()) == (7, 'XY')
+    doc = _apply(doc, queue, 0, 4, '')
+    assert (queue.offset, queue.text()) == (3, 'XY')
+    assert doc[queue.offset:] == 'XY'
+
+
+def test_removal_spanning_offset_splits_between_prefix_and_queue():
+    queue = SendQueue()
+    queue.reset(4, 'ABCD')
+    doc = _apply('CQ DABCD', queue, 2, 4, 'Z')
+    # 删除的" D"属于已发送前缀，"AB"从队列中删除；替换的文本位于前缀之后，加入队列
+    assert doc == 'CQZCD'
+    assert (queue.offset, queue.text()) == (2, 'ZCD')
+
+
+def test_random_edits_keep_queue_in_sync():
+    rng = random.Random(0)
+    doc = ''
+    queue = SendQueue()
+    for _ in range(2000):
+        if doc and rng.random() < 0.2:
+            queue.take(rng.randint(0, len(queue.pending)))
+        position = rng.randint(0, len(doc))
+        removed = rng.randint(0, min(3, len(doc) - position))
+        inserted = ''.join(rng.choice('AB1 ') for _ in range(rng.randint(0, 3)))
+        doc = _apply(doc, queue, position, removed, inserted)
+        assert 0 <= queue.offset <= len(doc)
+        assert queue.text() == doc[queue.offset:]
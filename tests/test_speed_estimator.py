@@ -0,0 +1,65 @@
+import pytest
+from morse_utils import MorseUtils
+from speed_estimator import SpeedEstimator
+
+TEXT = "CQ CQ DE BG7XYZ BG7XYZ PSE K"
+
+
+def _events(text, unit, bias=0.0):
+    """报文的按键/间隔时长序列[(是否按键, 时长)]；bias使按键偏长、间隔等量偏短"""
+    events = []
+    for word in text.split():
+        for char in word:
+            for element in MorseUtils.MORSE_CODE[char]:
+                events.append((True, (1 if element == '.' else 3) * unit + bias))
+                events.append((False, unit - bias))
+            events[-1] = (False, 3 * unit - bias)
+        events[-1] = (False, 7 * unit - bias)
+    return events
+
+
+def _feed(estimator, events):
+    """按解码器的顺序送入事件，返回判为划的按键序列"""
+    dashes = []
+    for is_mark, duration in events:
+        if is_mark:
+            dashes.append(estimator.add_mark(duration))
+        else:
+            estimator.add_space(duration)
+    return dashes
+
+
+def _expected_dashes(text):
+    return [element == '-' for char in text.replace(' ', '') for element in MorseUtils.MORSE_CODE[char]]
+
+
+def test_keying_bias_does_not_change_unit():
+    # 门限判决使按键长出0.3个单位、间隔短0.3个单位，点周期不变
+    estimator = SpeedEstimator(60)
+    _feed(estimator, _events(TEXT * 2, 60, bias=18))
+    assert estimator.unit == pytest.approx(60, rel=0.03)
+    assert estimator.dash_threshold > 60 + 18
+
+
+@pytest.mark.parametrize('start', [20, 180])
+def test_tracks_speed_change(start):
+    # 从3倍快或3倍慢的初始估计出发，第二遍报文起判决全部正确
+    estimator = SpeedEstimator(start)
+    _feed(estimator, _events(TEXT, 60))
+    assert _feed(estimator, _events(TEXT, 60)) == _expected_dashes(TEXT)
+    assert estimator.unit == pytest.approx(60, rel=0.03)
+
+
+def test_interrupt_does_not_pair_across_gap():
+    estimator = SpeedEstimator(60)
+    estimator.add_mark(60)
+    estimator.interrupt()
+    # 中断后的间隔不与中断前的按键配对，基本单位保持不变
+    estimator.add_space(60)
+    assert estimator.unit == 60
+
+
+def test_fixed_speed_does_not_adapt():
+    estimator = SpeedEstimator(60, auto=False)
+    _feed(estimator, _events(TEXT, 30))
+    assert estimator.unit == 60